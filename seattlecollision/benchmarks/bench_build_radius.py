@@ -0,0 +1,58 @@
+"""
+COLLIDIUM
+Build Radius Benchmark
+
+Times process_data.create_collidium_table on the bundled sample data tiled
+to each scale, for a range of pair radii (in feet) with the default 12 month
+window and a 24 month window. Reports the time and pairs/sec of the grid
+pair engine, and at 1x of the brute engine (which compares every building
+with every collision) for comparison, to show how the build time grows with
+the radius. Distances are measured with the vectorized 'vincenty' distance mode
+(see geo_distance), since geopy's per-pair geodesic distance would dominate
+the time of larger radii.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_build_radius.py [scale ...]
+"""
+import sys
+import time
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+from process_data import create_collidium_table
+from sample_data import load_sample, scale_sample
+
+RADII = [500, 1000, 1500, 2500, 4000]
+WINDOWS = [12, 24]
+ENGINES = ['grid', 'brute']
+DISTANCE_MODE = 'vincenty'
+
+def run(scales):
+    """
+    Runs the benchmark at each scale and prints one line per radius, window
+    and engine.
+
+    Args:
+        scales: list of int scale factors
+    """
+    collisions, buildings = load_sample()
+    for scale in scales:
+        colls, builds = scale_sample(collisions, buildings, scale)
+        print("scale %dx, %d buildings, %d collisions" %
+              (scale, builds.shape[0], colls.shape[0]))
+        for radius in RADII:
+            for window in WINDOWS:
+                for engine in ENGINES if scale == 1 else ENGINES[:1]:
+                    start = time.perf_counter()
+                    pairs = create_collidium_table(colls, builds, engine=engine,
+                                                   distance_mode=DISTANCE_MODE,
+                                                   radius=radius, window=window)
+                    elapsed = time.perf_counter() - start
+                    print("  radius %5d ft  window %2d months  engine %-5s  pairs %8d  "
+                          "%8.2f s  %10.0f pairs/sec" %
+                          (radius, window, engine, pairs.shape[0], elapsed,
+                           pairs.shape[0]/elapsed))
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1, 10, 100])
@@ -0,0 +1,89 @@
+"""
+COLLIDIUM
+Category Code Benchmark
+
+Reports, for the bundled sample data tiled to each scale:
+ - the memory used by the processed collisions and buildings dataframes
+   with their repeated string columns as strings and as the Categoricals
+   the cleaning functions return (see process_data._categorize), and by
+   the collidium table with its b_category, c_type and c_severity columns
+   as strings and as the Categoricals create_collidium_table returns
+ - the size of a flat collidium_data table with its covering index (see
+   bench_star_schema) with the categorical columns stored as text labels
+   and as the integer codes the table builder stores, and the median and
+   mean time per query of the same random widget queries on each (with the
+   filters bound as labels or codes), checked to return the same results;
+   the size of the star schema tables, which store the codes, is given too
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_category_codes.py [scale ...]
+"""
+import os
+import sys
+import tempfile
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+#pylint: disable=protected-access
+import table_builder
+import process_data
+from bench_star_schema import (widget_queries, flat_statement, copy_flat_layout, object_sizes,
+                               timed, FLAT_OBJECTS, STAR_OBJECTS)
+from sample_data import load_sample, scale_sample
+
+def frame_memory(label, frame, columns):
+    """Prints the memory of a dataframe with columns as strings and as Categoricals."""
+    strings = frame.astype({column: str for column in columns})
+    categorical = process_data._categorize(frame.copy(), columns)
+    print("  %-12s strings %8.2f MB  categoricals %8.2f MB" % (
+        label, strings.memory_usage(deep=True).sum()/2**20,
+        categorical.memory_usage(deep=True).sum()/2**20))
+
+def label_statement(query):
+    """Returns a query's flat table statement with its category filters bound as labels."""
+    statement, params = query.get_statement()
+    labels = []
+    # get_statement binds the codes of each filter in code order
+    for name in ['b_category', 'c_severity', 'c_type']:
+        value = getattr(query, name)
+        values = set(value if isinstance(value, list) else [value]) - {'All'}
+        labels += sorted(values, key=table_builder.CATEGORY_LABELS[name].index)
+    return flat_statement(statement), params[:len(params) - len(labels)] + tuple(labels)
+
+def run(scales):
+    """
+    Runs the benchmark at each scale.
+
+    Args:
+        scales: list of int scale factors
+    """
+    collisions, buildings = load_sample()
+    queries = widget_queries()
+    for scale in scales:
+        colls, builds = scale_sample(collisions, buildings, scale)
+        pairs = process_data.create_collidium_table(colls, builds, distance_mode='vincenty')
+        print("scale %dx, %d pairs, %d queries" % (scale, pairs.shape[0], len(queries)))
+        frame_memory("collisions", colls, process_data.COLLISIONS_CATEGORICAL)
+        frame_memory("buildings", builds, process_data.BUILDINGS_CATEGORICAL)
+        frame_memory("collidium", pairs, list(table_builder.CATEGORY_LABELS))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, "Collidium")
+            labelled = os.path.join(tmp_dir, "Collidium_labels")
+            coded = os.path.join(tmp_dir, "Collidium_codes")
+            table_builder.update_table(database, colls, builds)
+            copy_flat_layout(database, labelled, labels=True)
+            copy_flat_layout(database, coded)
+            before = timed("labels", labelled, [label_statement(query) for query in queries],
+                           FLAT_OBJECTS)
+            after = timed("codes", coded, [(flat_statement(statement), params) for
+                                           statement, params in (query.get_statement()
+                                                                 for query in queries)],
+                          FLAT_OBJECTS)
+            assert before == after
+            print("  star schema (codes) total %8.2f MB" % (
+                sum(object_sizes(database, STAR_OBJECTS).values())/2**20))
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1, 10, 50])
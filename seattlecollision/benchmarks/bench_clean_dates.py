@@ -0,0 +1,82 @@
+"""
+COLLIDIUM
+Date Parsing Benchmark
+
+Compares the per-row datetime.strptime loops that collisions_clean and
+buildings_clean used to parse dates with the vectorized
+process_data._parse_dates helper, on raw tables rebuilt from the bundled
+sample data. Reports rows/sec for both, and checks that they produce
+identical columns.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_clean_dates.py [scale ...]
+"""
+from datetime import datetime
+import sys
+import time
+import pandas as pd
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+#pylint: disable=protected-access
+import process_data
+from sample_data import load_sample, raw_collisions, raw_buildings
+
+def loop_collision_dates(collisions):
+    """Original collisions_clean date loop."""
+    date_time = []
+    for i in range(0, len(collisions)):
+        if len(collisions['incdttm'][i]) > 10:
+            obj = datetime.strptime(collisions["incdttm"][i], '%m/%d/%Y %I:%M:%S %p')
+            date_time.append(obj.replace(hour=0, minute=0, second=0))
+        else:
+            obj = datetime.strptime(collisions["incdttm"][i], '%m/%d/%Y')
+            date_time.append(obj.replace(hour=0, minute=0, second=0))
+    return pd.Series(date_time, index=collisions.index, dtype='datetime64[ns]')
+
+def loop_building_dates(buildings, column):
+    """Original buildings_clean date loop."""
+    dates = []
+    for i in range(0, len(buildings)):
+        if pd.notnull(buildings[column][i]):
+            dates.append(datetime.strptime(buildings[column][i], '%Y-%m-%d'))
+        else:
+            dates.append(float('NaN'))
+    return pd.Series(dates, index=buildings.index, dtype='datetime64[ns]')
+
+def timed(label, rows, func):
+    """Runs func, prints its rows/sec and returns its result."""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print("%-32s rows %8d  %8.3f s  %12.0f rows/sec" % (label, rows, elapsed, rows/elapsed))
+    return result
+
+def run(scales):
+    """
+    Runs the benchmark at each scale.
+
+    Args:
+        scales: list of int scale factors
+    """
+    collisions, buildings = load_sample()
+    for scale in scales:
+        colls = raw_collisions(collisions, scale)
+        builds = raw_buildings(buildings, scale)
+        print("scale %dx" % scale)
+        before = timed("  collisions loop", len(colls), lambda: loop_collision_dates(colls))
+        after = timed("  collisions vectorized", len(colls), lambda: process_data._parse_dates(
+            colls["incdttm"], ['%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y']).dt.normalize())
+        pd.testing.assert_series_equal(before, after, check_names=False)
+        before = timed("  buildings loop", 2*len(builds), lambda: pd.concat(
+            [loop_building_dates(builds, "Issue Date"),
+             loop_building_dates(builds, "Final Date")]))
+        after = timed("  buildings vectorized", 2*len(builds), lambda: pd.concat(
+            [process_data._parse_dates(builds["Issue Date"], ['%Y-%m-%d']),
+             process_data._parse_dates(builds["Final Date"], ['%Y-%m-%d'])]))
+        pd.testing.assert_series_equal(before, after, check_names=False)
+        print("  identical output: yes")
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1, 10, 100])
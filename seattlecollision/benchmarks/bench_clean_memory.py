@@ -0,0 +1,83 @@
+"""
+COLLIDIUM
+Raw Data Ingestion Memory Benchmark
+
+Writes raw collisions and building permit files (rebuilt from the bundled
+sample data at the given scale) to a temporary folder, then runs
+collisions_clean and buildings_clean on them in a fresh python process for
+each chunk size, reporting the process's peak RSS and run time. Reading the
+whole file (chunk size 'all') is the original behaviour.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_clean_memory.py [scale [chunksize ...]]
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import process_data
+from sample_data import load_sample, raw_collisions, raw_buildings
+
+def peak_rss_mb():
+    """
+    Returns this process's peak resident set size in MB. On Linux this is read
+    from /proc (VmHWM), since ru_maxrss also counts memory held by the parent
+    process before it started this one.
+    """
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])/1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+def child(colls_path, builds_path, chunksize):
+    """
+    Cleans both raw files in this process and prints peak RSS (MB) and seconds.
+    """
+    chunksize = None if chunksize == 'all' else int(chunksize)
+    start = time.perf_counter()
+    colls = process_data.collisions_clean(colls_path, chunksize=chunksize)
+    builds = process_data.buildings_clean(builds_path, chunksize=chunksize)
+    elapsed = time.perf_counter() - start
+    peak_mb = peak_rss_mb()
+    print("RESULT %d %d %.1f %.2f" % (colls.shape[0], builds.shape[0], peak_mb, elapsed))
+
+def run(scale, chunksizes):
+    """
+    Runs the benchmark for each chunk size at the given scale.
+
+    Args:
+        scale: (int) scale factor of the raw files
+        chunksizes: list of chunk sizes ('all' reads the whole file)
+    """
+    collisions, buildings = load_sample()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        colls_path = os.path.join(tmp_dir, "raw_collisions_input.csv")
+        builds_path = os.path.join(tmp_dir, "raw_buildings_input.csv")
+        raw_collisions(collisions, scale).to_csv(colls_path, index=False)
+        raw_buildings(buildings, scale).to_csv(builds_path)
+        print("scale %dx: collisions file %.1f MB, buildings file %.1f MB" %
+              (scale, os.path.getsize(colls_path)/2**20, os.path.getsize(builds_path)/2**20))
+        for chunksize in chunksizes:
+            output = subprocess.run([sys.executable, __file__, '--child', colls_path,
+                                     builds_path, str(chunksize)],
+                                    stdout=subprocess.PIPE, universal_newlines=True,
+                                    check=True).stdout
+            result = [line for line in output.splitlines() if line.startswith('RESULT')][0]
+            n_colls, n_builds, peak_mb, elapsed = result.split()[1:]
+            print("  chunksize %-8s collisions %8s  buildings %7s  peak RSS %8s MB  %6s s" %
+                  (chunksize, n_colls, n_builds, peak_mb, elapsed))
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        child(*sys.argv[2:5])
+    else:
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+            sys.argv[2:] or ['all', 100000, 20000])
@@ -0,0 +1,46 @@
+"""
+COLLIDIUM
+Collidium Table Benchmark
+
+Times process_data.create_collidium_table on the bundled sample data tiled
+to 1x, 10x and 100x scale, and reports pairs/sec for each pair engine and
+distance mode. The original nested loop is only timed at 1x, since it grows
+with buildings x collisions.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_collidium_table.py [scale ...]
+"""
+import sys
+import time
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+from process_data import create_collidium_table
+from geo_distance import DISTANCE_MODES
+from sample_data import load_sample, scale_sample
+
+def run(scales):
+    """
+    Runs the benchmark at each scale and prints one line per engine.
+
+    Args:
+        scales: list of int scale factors
+    """
+    collisions, buildings = load_sample()
+    for scale in scales:
+        colls, builds = scale_sample(collisions, buildings, scale)
+        runs = [('grid', mode) for mode in DISTANCE_MODES]
+        if scale == 1:
+            runs.append(('loop', 'geodesic'))
+        for engine, mode in runs:
+            start = time.perf_counter()
+            pairs = create_collidium_table(colls, builds, engine=engine, distance_mode=mode)
+            elapsed = time.perf_counter() - start
+            print("scale %4dx  engine %-5s  mode %-15s  buildings %7d  collisions %8d  "
+                  "pairs %8d  %8.2f s  %10.0f pairs/sec" %
+                  (scale, engine, mode, builds.shape[0], colls.shape[0], pairs.shape[0],
+                   elapsed, pairs.shape[0]/elapsed))
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1, 10, 100])
@@ -0,0 +1,51 @@
+"""
+COLLIDIUM
+Parallel Collidium Table Benchmark
+
+Times process_data.create_collidium_table with 1 to N worker processes on the
+bundled sample data tiled to the given scale, checks that every run returns
+the same table as the serial run, and reports the speedup.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_collidium_workers.py [scale [mode [max_workers]]]
+"""
+import os
+import sys
+import time
+import pandas as pd
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+from process_data import create_collidium_table
+from sample_data import load_sample, scale_sample
+
+def run(scale, distance_mode, max_workers):
+    """
+    Runs the benchmark for 1 to max_workers worker processes.
+
+    Args:
+        scale: (int) scale factor of the sample data
+        distance_mode: (str) distance mode passed to create_collidium_table
+        max_workers: (int) largest number of worker processes
+    """
+    collisions, buildings = load_sample()
+    colls, builds = scale_sample(collisions, buildings, scale)
+    print("scale %dx  mode %s  buildings %d  collisions %d" %
+          (scale, distance_mode, builds.shape[0], colls.shape[0]))
+    serial = None
+    for workers in range(1, max_workers + 1):
+        start = time.perf_counter()
+        pairs = create_collidium_table(colls, builds, distance_mode=distance_mode,
+                                       workers=workers)
+        elapsed = time.perf_counter() - start
+        if serial is None:
+            serial = (pairs, elapsed)
+        pd.testing.assert_frame_equal(serial[0], pairs)
+        print("  workers %2d  pairs %8d  %8.2f s  speedup %5.2fx  identical to serial" %
+              (workers, pairs.shape[0], elapsed, serial[1]/elapsed))
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10,
+        sys.argv[2] if len(sys.argv) > 2 else 'geodesic',
+        int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count())
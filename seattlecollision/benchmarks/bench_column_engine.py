@@ -0,0 +1,99 @@
+"""
+COLLIDIUM
+Column Query Engine Benchmark
+
+Builds a Collidium database from the bundled sample data tiled to each
+scale and exports its columns, then answers the same queries, drawn at
+random (with a fixed seed) from the widget values of the notebook, with:
+ - sqlite: generate_table of the CollidiumQuery.get_statement statements,
+   on the collidium_data table
+ - sqlite rollup: the same on the rollup table, as the *_interact functions
+   do by default
+ - columns: ColumnEngine.query on the memory mapped column arrays
+Reports the time to load the engine, the median and mean time per query
+(including building the result dataframe), and checks that every backend
+returns the same results.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_column_engine.py [scale ...]
+"""
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import table_builder
+import column_engine
+import interactions_functionality as int_func
+from query_class import CollidiumQuery
+from sample_data import load_sample, scale_sample
+
+QUERIES = 300
+
+def widget_queries():
+    """Returns QUERIES random CollidiumQuery objects of the widget values."""
+    filters = list(itertools.product(int_func.BUILDING_CATEGORIES, range(1500, 700, -100),
+                                     int_func.BUILDING_YEARS, range(12, 5, -1),
+                                     int_func.COLLISION_SEVERITY, int_func.COLLISION_TYPE))
+    rng = random.Random(0)
+    return [CollidiumQuery(*args) for args in rng.choices(filters, k=QUERIES)]
+
+def timed(label, function, queries):
+    """Runs function on each query, prints timings and returns the results."""
+    times = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(function(query))
+        times.append(time.perf_counter() - start)
+    print("  %-14s median %8.3f ms  mean %8.3f ms" %
+          (label, 1000*np.median(times), 1000*np.mean(times)))
+    return results
+
+def run_statement(query, database):
+    """Returns generate_table of a query's statement on the database."""
+    statement, params = query.get_statement()
+    return int_func.generate_table(statement, database, params)
+
+def run(scales):
+    """
+    Runs the benchmark at each scale.
+
+    Args:
+        scales: list of int scale factors
+    """
+    collisions, buildings = load_sample()
+    queries = widget_queries()
+    for scale in scales:
+        colls, builds = scale_sample(collisions, buildings, scale)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, "Collidium")
+            table_builder.update_table(database, colls, builds)
+            start = time.perf_counter()
+            path = column_engine.export_columns(database)
+            exported = time.perf_counter()
+            engine = column_engine.get_engine(path)
+            loaded = time.perf_counter()
+            print("scale %dx, %d queries, export %.3f s, load %.3f s" %
+                  (scale, len(queries), exported - start, loaded - exported))
+            expected = timed("sqlite", lambda query: run_statement(query, database), queries)
+            for query in queries:
+                query.rollup = True
+            rollup = timed("sqlite rollup", lambda query: run_statement(query, database),
+                           queries)
+            results = timed("columns", engine.query, queries)
+            for frames in zip(expected, rollup, results):
+                for frame in frames[1:]:
+                    pd.testing.assert_frame_equal(frame, frames[0], check_exact=False)
+            int_func.close_connections(database)
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1, 10])
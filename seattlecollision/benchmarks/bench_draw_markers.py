@@ -0,0 +1,100 @@
+"""
+COLLIDIUM
+Map Marker Benchmark
+
+Times draw_markers.place_maps on data/Test_Data_For_Draw_Markers.csv,
+building the three maps and then rendering them to html, with:
+ - marker loop: the original create_map code, which adds one folium
+   CircleMarker per building per period in an iterrows loop
+ - three passes: three create_map calls, each validating, binning and
+   styling the data again (place_maps before the shared data pass)
+ - shared pass: the current place_maps, which prepares the marker data of
+   all three maps once with marker_data
+Reports the build and render times and the size of the generated html.
+
+Above 800 buildings (the original create_map limit) the marker loop is not
+timed; the sample is tiled to the requested size, and the buildings are
+binned into at most MAX_MARKERS grid cells below DETAIL_ZOOM (and drawn
+one by one from DETAIL_ZOOM on).
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_draw_markers.py [rows ...]
+"""
+import sys
+import time
+import branca
+import folium
+import numpy as np
+import pandas as pd
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import draw_markers
+
+MARKERS_SAMPLE = 'seattlecollision/data/Test_Data_For_Draw_Markers.csv'
+
+def loop_create_map(data, period, map_detail='Low'):
+    """Original create_map: one folium.CircleMarker per row."""
+    tile = draw_markers.LOW_DETAIL_TILE if map_detail == 'Low' else draw_markers.HIGH_DETAIL_TILE
+    location = [np.mean(data['b_lat']), np.mean(data['b_long'])]
+    my_map = folium.Map(location=location, zoom_start=draw_markers.ZOOM_START, tiles=tile)
+    for index, row in data.iterrows(): #pylint: disable=unused-variable
+        if row[str(period)] < row['before']:
+            fill_color = draw_markers.GREEN
+        elif row[str(period)] > row['before']:
+            fill_color = draw_markers.RED
+        else:
+            fill_color = draw_markers.BLUE
+        folium.CircleMarker(
+            location=[row['b_lat'], row['b_long']],
+            radius=row[str(period)]/draw_markers.RADIUS_ADJUSTMENT,
+            fill=True,
+            popup=str('Number of collisions: '+ str(round(row[str(period)], 0))),
+            color=fill_color,
+            control_scale=True,
+            fill_color=fill_color).add_to(my_map)
+    return my_map
+
+def figure_of_maps(create_map, data, map_detail='Low'):
+    """place_maps without titles: one create_map call per period."""
+    map_grid = branca.element.Figure()
+    for column, period in enumerate(draw_markers.PERIODS, 1):
+        map_grid.add_subplot(1, 3, column).add_child(create_map(data, period, map_detail))
+    return map_grid
+
+def timed(label, place_maps, data):
+    """Builds and renders the three maps, and prints times and html size."""
+    start = time.perf_counter()
+    map_grid = place_maps(data)
+    built = time.perf_counter()
+    html = map_grid.render()
+    rendered = time.perf_counter()
+    print("  %-14s build %8.3f s  render %8.3f s  html %8.1f KB" %
+          (label, built - start, rendered - built, len(html)/1024))
+
+def tiled(data, rows):
+    """Returns the first rows buildings of copies of data shifted by 0.3 degrees."""
+    copies = int(np.ceil(rows/len(data)))
+    frames = [data.assign(b_id=data['b_id'] + copy*10**8, b_lat=data['b_lat'] + 0.3*copy)
+              for copy in range(copies)]
+    return pd.concat(frames, ignore_index=True).head(rows)
+
+def run(rows_list):
+    """
+    Runs the benchmark for each number of rows.
+
+    Args:
+        rows_list: list of int numbers of buildings
+    """
+    data = pd.read_csv(MARKERS_SAMPLE, encoding='ascii', encoding_errors='ignore')
+    for rows in rows_list:
+        sample = tiled(data, rows)
+        print("rows %d" % rows)
+        if rows <= 800:
+            timed("marker loop", lambda frame: figure_of_maps(loop_create_map, frame), sample)
+        timed("three passes", lambda frame: figure_of_maps(draw_markers.create_map, frame),
+              sample)
+        timed("shared pass", draw_markers.place_maps, sample)
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [100, 800, 5000, 50000])
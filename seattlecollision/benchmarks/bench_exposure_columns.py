@@ -0,0 +1,114 @@
+"""
+COLLIDIUM
+Exposure Column Benchmark
+
+Builds a Collidium database from the bundled sample data tiled to each
+scale, and two copies of its collidium_data view as a flat table with its
+covering index (see bench_star_schema): one as it is stored now, and one in
+the previous layout, with the during indicator stored as a float normalized
+to one year of exposure (365/building period days) instead of a 0/1 integer
+and b_build_days. Reports the size of each table and its covering index
+(from sqlite's dbstat table), and the median and mean time per query of the
+same random widget queries on each layout:
+ - float during: SUM(coll_during)*duration/12, as queries were written for
+   the previous layout
+ - integer during: SUM(coll_during)*window days/MAX(b_build_days), as
+   CollidiumQuery.get_statement writes them now
+The before and after counts are checked to be equal, and the during counts
+to differ by the ratio of the duration's whole number of days to
+duration/12 of 365 days.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_exposure_columns.py [scale ...]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import table_builder
+import interactions_functionality as int_func
+from bench_star_schema import (widget_queries, flat_statement, flat_schema, copy_flat_layout,
+                               FLAT_INDEX)
+from sample_data import load_sample, scale_sample
+
+# The previous during expression of get_statement
+FLOAT_DURING = "SUM(coll_during)*? AS during"
+
+def float_statement(query):
+    """Returns a query's flat table statement and parameters for the float during layout."""
+    statement, params = query.get_statement()
+    statement = flat_statement(statement).replace(
+        "SUM(coll_during)*?/MAX(b_build_days) AS during", FLOAT_DURING)
+    return statement, (round(query.duration/12, 6),) + params[1:]
+
+def copy_float_layout(database, legacy):
+    """Copies collidium_data to a new database with the float during layout."""
+    copy_flat_layout(database, legacy,
+                     [(column, 'REAL' if column == 'coll_during' else sql_type)
+                      for column, sql_type in flat_schema() if column != 'b_build_days'],
+                     {'coll_during': 'CASE WHEN coll_during = 1 THEN 365.0/b_build_days '
+                                     'ELSE 0.0 END'},
+                     [column for column in FLAT_INDEX if column != 'b_build_days'])
+
+def table_sizes(database):
+    """Returns the sizes in bytes of collidium_data and its covering index."""
+    conn = sqlite3.connect(database)
+    sizes = dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat WHERE name IN "
+                              "('collidium_data', 'collidium_query_idx') GROUP BY name"))
+    conn.close()
+    return sizes['collidium_data'], sizes['collidium_query_idx']
+
+def timed(label, database, statements):
+    """Runs each (statement, params) pair, prints timings and returns the rows."""
+    conn = sqlite3.connect(database, cached_statements=int_func.STATEMENT_CACHE_SIZE)
+    table, index = table_sizes(database)
+    times = []
+    rows = []
+    for statement, params in statements:
+        start = time.perf_counter()
+        rows.append(sorted(conn.execute(statement, params).fetchall()))
+        times.append(time.perf_counter() - start)
+    conn.close()
+    print("  %-16s table %8.2f MB  index %8.2f MB  median %7.3f ms  mean %7.3f ms" %
+          (label, table/2**20, index/2**20, 1000*np.median(times), 1000*np.mean(times)))
+    return rows
+
+def run(scales):
+    """
+    Runs the benchmark at each scale.
+
+    Args:
+        scales: list of int scale factors
+    """
+    collisions, buildings = load_sample()
+    queries = widget_queries()
+    for scale in scales:
+        colls, builds = scale_sample(collisions, buildings, scale)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, "Collidium")
+            current = os.path.join(tmp_dir, "Collidium_flat")
+            legacy = os.path.join(tmp_dir, "Collidium_float")
+            table_builder.update_table(database, colls, builds)
+            copy_flat_layout(database, current)
+            copy_float_layout(database, legacy)
+            print("scale %dx, %d queries" % (scale, len(queries)))
+            before = timed("float during", legacy, [float_statement(query)
+                                                    for query in queries])
+            after = timed("integer during", current, [
+                (flat_statement(statement), params)
+                for statement, params in (query.get_statement() for query in queries)])
+            for query, old, new in zip(queries, before, after):
+                assert [row[:4] + row[5:] for row in old] == [row[:4] + row[5:] for row in new]
+                ratio = query.window_days()/(365*round(query.duration/12, 6))
+                np.testing.assert_allclose([row[4] for row in new],
+                                           [row[4]*ratio for row in old], rtol=1e-9)
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1, 10, 50])
@@ -0,0 +1,81 @@
+"""
+COLLIDIUM
+Query Result Fetch Benchmark
+
+Builds a Collidium database from the bundled sample data tiled to each
+scale, then fetches the results of a CollidiumQuery query covering every
+building with the original generate_table code (fetchall into row tuples,
+then a dataframe) and with the columnar fetch of
+interactions_functionality.generate_table. Reports the result rows, median
+latency and peak memory allocated (tracemalloc) for both, and checks that
+they return the same dataframe.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_generate_table.py [scale ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import table_builder
+import interactions_functionality as int_func
+from query_class import CollidiumQuery
+from sample_data import load_sample, scale_sample
+
+def tuples_table(query, data_directory):
+    """Original generate_table: fetchall into tuples, then a dataframe."""
+    sql_cursor = int_func.generate_connection(data_directory)
+    sql_cursor.execute(query)
+    temp = pd.DataFrame(sql_cursor.fetchall())
+    if temp.size == 0:
+        temp = pd.DataFrame({'A' : []})
+    else:
+        temp.columns = list(map(lambda x: x[0], sql_cursor.description))
+    return temp
+
+def measure(label, func, query, database):
+    """Prints the median latency of 5 runs and peak allocation of one run."""
+    times = []
+    for _ in range(5):
+        start = time.perf_counter()
+        table = func(query, database)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(query, database)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("  %-8s rows %8d  median %8.2f ms  peak allocated %8.2f MB" %
+          (label, table.shape[0], 1000*np.median(times), peak/2**20))
+    return table
+
+def run(scales):
+    """
+    Runs the benchmark at each scale.
+
+    Args:
+        scales: list of int scale factors
+    """
+    collisions, buildings = load_sample()
+    for scale in scales:
+        colls, builds = scale_sample(collisions, buildings, scale)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, "Collidium")
+            table_builder.update_table(database, colls, builds)
+            # All base years, so every building is in the result
+            query = CollidiumQuery().get_qstring().replace("AND base_year = 2016 ", "")
+            print("scale %dx" % scale)
+            before = measure("tuples", tuples_table, query, database)
+            after = measure("columnar", int_func.generate_table, query, database)
+            pd.testing.assert_frame_equal(before, after)
+            int_func.close_connections(database)
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [10, 100])
@@ -0,0 +1,98 @@
+"""
+COLLIDIUM
+Interactive Query Latency Benchmark
+
+Builds a Collidium database from the bundled sample data, then runs 1,000
+all_factor_interact style queries (cycling through widget filter values)
+through interactions_functionality.generate_table, and compares the pooled
+read-only connections with the original behaviour of opening a new
+sqlite3 connection (after checking the path) for every call. Map drawing is
+not timed.
+
+A second set of 1,000 queries mimics users moving sliders back and forth
+(random draws from a small set of filter values, so queries repeat), and is
+run both uncached (generate_table) and through the query result cache
+(interactions_functionality.query_table), whose counters are printed.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_interact_queries.py [scale [queries]]
+"""
+import itertools
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import table_builder
+import interactions_functionality as int_func
+from query_class import CollidiumQuery
+from sample_data import load_sample, scale_sample
+
+def unpooled_table(query, data_directory):
+    """Original generate_table: checks the path twice and connects every call."""
+    if not os.path.exists(str(data_directory)):
+        raise ValueError(str((data_directory) +" is not a valid path"))
+    if not os.path.exists(str(data_directory)):
+        raise ValueError(str((data_directory) +" is not a valid path"))
+    sql_cursor = sqlite3.connect(data_directory).cursor()
+    sql_cursor.execute(query)
+    temp = pd.DataFrame(sql_cursor.fetchall())
+    if temp.size == 0:
+        temp = pd.DataFrame({'A' : []})
+    else:
+        temp.columns = list(map(lambda x: x[0], sql_cursor.description))
+    return temp
+
+def timed(label, func, queries, database):
+    """Runs func on every query and prints total and per-query latencies."""
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query, database)
+        times.append(time.perf_counter() - start)
+    times = 1000*np.array(times)
+    print("%-10s queries %5d  total %8.1f ms  median %7.3f ms  p95 %7.3f ms" %
+          (label, len(times), times.sum(), np.median(times), np.percentile(times, 95)))
+
+def run(scale, n_queries):
+    """
+    Runs the benchmark on the sample data tiled to the given scale.
+
+    Args:
+        scale: (int) scale factor of the sample data
+        n_queries: (int) number of queries to run
+    """
+    collisions, buildings = load_sample()
+    colls, builds = scale_sample(collisions, buildings, scale)
+    filters = itertools.cycle(itertools.product(
+        int_func.BUILDING_CATEGORIES, [1500, 1200, 900], int_func.BUILDING_YEARS, [12, 6, 3],
+        int_func.COLLISION_SEVERITY, int_func.COLLISION_TYPE))
+    queries = [CollidiumQuery(*args).get_qstring()
+               for args, _ in zip(filters, range(n_queries))]
+    repeated = list(itertools.product(['All', 'COMMERCIAL', 'MULTIFAMILY'],
+                                      range(1500, 700, -100), int_func.BUILDING_YEARS))
+    picks = np.random.RandomState(0).randint(len(repeated), size=n_queries)
+    builders = [CollidiumQuery(*repeated[pick]) for pick in picks]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = os.path.join(tmp_dir, "Collidium")
+        table_builder.update_table(database, colls, builds)
+        print("scale %dx, %d queries" % (scale, n_queries))
+        timed("unpooled", unpooled_table, queries, database)
+        timed("pooled", int_func.generate_table, queries, database)
+        print("repeated queries (%d distinct)" % len(set(picks)))
+        timed("uncached", lambda query, data: int_func.generate_table(query.get_qstring(), data),
+              builders, database)
+        timed("cached", int_func.query_table, builders, database)
+        print("cache stats: %s" % int_func.QUERY_CACHE.stats())
+        int_func.close_connections(database)
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
@@ -0,0 +1,78 @@
+"""
+COLLIDIUM
+Intermediate Table Format Benchmark
+
+Computes the collidium building/collision pairs of the bundled sample data
+tiled to each scale, then saves and loads them the way the database build
+does, as:
+ - csv: to_csv, then the read_csv of table_builder.create_table
+ - column store: column_store.write_frame, then column_store.read_frame
+Reports the write and load times (load includes the conversion of the date
+columns to day numbers, _sql_frame, that create_table does next), the size
+on disk, and the memory used by the loaded dataframe, and checks that both
+give the same table.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_intermediates.py [scale ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import column_store
+import table_builder
+from process_data import create_collidium_table
+from sample_data import load_sample, scale_sample
+
+def folder_size(path):
+    """Returns the size in bytes of a file, or of the files in a folder."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def timed(label, write, read, path, pairs):
+    """Writes and loads pairs, prints the timings and returns the loaded table."""
+    start = time.perf_counter()
+    write(pairs, path)
+    written = time.perf_counter()
+    table = table_builder._sql_frame(read(path)) #pylint: disable=protected-access
+    loaded = time.perf_counter()
+    print("  %-12s write %7.3f s  load %7.3f s  disk %8.1f MB  memory %8.1f MB" %
+          (label, written - start, loaded - written, folder_size(path)/2**20,
+           table.memory_usage(deep=True).sum()/2**20))
+    return table
+
+def read_csv(path):
+    """Reads the CSV file as create_table does."""
+    frame = pd.read_csv(path)
+    del frame['Unnamed: 0']
+    return frame
+
+def run(scales):
+    """
+    Runs the benchmark at each scale.
+
+    Args:
+        scales: list of int scale factors
+    """
+    collisions, buildings = load_sample()
+    for scale in scales:
+        colls, builds = scale_sample(collisions, buildings, scale)
+        pairs = create_collidium_table(colls, builds)
+        print("scale %dx, %d pairs" % (scale, pairs.shape[0]))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv = timed("csv", lambda frame, path: frame.to_csv(path), read_csv,
+                        os.path.join(tmp_dir, 'collidium_data.csv'), pairs)
+            store = timed("column store", column_store.write_frame, column_store.read_frame,
+                          os.path.join(tmp_dir, 'collidium_data.columns'), pairs)
+            store = store.astype({column: str for column in ['b_category', 'c_type',
+                                                              'c_severity']})
+            pd.testing.assert_frame_equal(csv, store, check_dtype=False)
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1, 10])
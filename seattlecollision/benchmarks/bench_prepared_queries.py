@@ -0,0 +1,83 @@
+"""
+COLLIDIUM
+Prepared Statement Benchmark
+
+Builds a Collidium database from the bundled sample data tiled to each
+scale, then runs the same sequence of queries, drawn at random (with a fixed
+seed) from the widget values of the notebook, on one connection:
+ - query strings: CollidiumQuery.get_qstring, one statement per filter
+   combination, so sqlite parses and plans (almost) every query again
+ - statements: CollidiumQuery.get_statement, a few statement shapes with
+   bound parameters, so sqlite3 reuses its prepared statements
+Both use the rollup table, as the *_interact functions do. Reports the
+median and mean time per query (execute and fetch all rows), the number of
+distinct statements, and checks that both return the same rows.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_prepared_queries.py [scale ...]
+"""
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import table_builder
+import interactions_functionality as int_func
+from query_class import CollidiumQuery
+from sample_data import load_sample, scale_sample
+
+QUERIES = 2000
+
+def widget_queries():
+    """Returns QUERIES random CollidiumQuery objects of the widget values."""
+    filters = list(itertools.product(int_func.BUILDING_CATEGORIES, range(1500, 700, -100),
+                                     int_func.BUILDING_YEARS, range(12, 5, -1),
+                                     int_func.COLLISION_SEVERITY, int_func.COLLISION_TYPE))
+    rng = random.Random(0)
+    return [CollidiumQuery(*args, rollup=True) for args in rng.choices(filters, k=QUERIES)]
+
+def timed(label, conn, statements):
+    """Runs each (statement, params) pair, prints timings and returns the rows."""
+    times = []
+    rows = []
+    for statement, params in statements:
+        start = time.perf_counter()
+        rows.append(conn.execute(statement, params).fetchall())
+        times.append(time.perf_counter() - start)
+    print("  %-14s distinct statements %5d  median %7.3f ms  mean %7.3f ms" %
+          (label, len(set(statement for statement, _ in statements)),
+           1000*np.median(times), 1000*np.mean(times)))
+    return rows
+
+def run(scales):
+    """
+    Runs the benchmark at each scale.
+
+    Args:
+        scales: list of int scale factors
+    """
+    collisions, buildings = load_sample()
+    queries = widget_queries()
+    for scale in scales:
+        colls, builds = scale_sample(collisions, buildings, scale)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, "Collidium")
+            table_builder.update_table(database, colls, builds)
+            conn = sqlite3.connect(database, cached_statements=int_func.STATEMENT_CACHE_SIZE)
+            print("scale %dx, %d queries" % (scale, len(queries)))
+            before = timed("query strings", conn, [(query.get_qstring(), ())
+                                                   for query in queries])
+            after = timed("statements", conn, [query.get_statement() for query in queries])
+            assert [sorted(rows) for rows in before] == [sorted(rows) for rows in after]
+            conn.close()
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1, 10])
@@ -0,0 +1,134 @@
+"""
+COLLIDIUM
+Query Service Load Test
+
+Builds a Collidium database from the bundled sample data tiled to the given
+scale, starts the query_service module in a separate process, and runs N
+concurrent clients against it. Each client keeps one connection open and
+sends requests for filter combinations drawn at random (with a fixed seed)
+from the notebook's widget values (tile_export.notebook_filters), so the
+load mixes cache misses, coalesced queries and cache hits. A new service is
+started for each number of clients, so every run starts with an empty cache.
+
+Reports the throughput and the p50/p99 request latency for each number of
+clients, and the service's request counters.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_query_service.py [scale [clients ...]]
+"""
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+import numpy as np
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import table_builder
+import tile_export
+from sample_data import load_sample, scale_sample
+
+REQUESTS_PER_CLIENT = 100
+
+def query_paths():
+    """Returns the /query paths of the notebook's filter combinations."""
+    paths = []
+    for query in tile_export.notebook_filters():
+        params = {'b_category': query.b_category, 'radius': query.radius,
+                  'base_year': query.base_year, 'duration': query.duration,
+                  'c_severity': query.c_severity, 'c_type': query.c_type}
+        paths.append('/query?' + urlencode(params))
+    return paths
+
+async def get(reader, writer, path):
+    """Sends a keep-alive GET request and returns the response body."""
+    writer.write(('GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n' % path).encode('latin-1'))
+    length = 0
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+    return await reader.readexactly(length)
+
+async def client(port, paths, latencies):
+    """Sends each path in turn on one connection, recording latencies."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for path in paths:
+        start = time.perf_counter()
+        await get(reader, writer, path)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+async def load(port, clients, paths):
+    """Runs the clients concurrently and returns latencies and elapsed time."""
+    latencies = []
+    rng = random.Random(0)
+    start = time.perf_counter()
+    await asyncio.gather(*[client(port, rng.choices(paths, k=REQUESTS_PER_CLIENT), latencies)
+                           for _ in range(clients)])
+    elapsed = time.perf_counter() - start
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    stats = json.loads(await get(reader, writer, '/stats'))
+    writer.close()
+    return latencies, elapsed, stats
+
+def start_service(database):
+    """Starts the service on a free port and waits until it accepts connections."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen([sys.executable, 'seattlecollision/query_service.py',
+                                database, str(port)], stdout=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Query service did not start.")
+
+def run(scale, clients_list):
+    """
+    Runs the load test for each number of clients.
+
+    Args:
+        scale: int scale factor of the sample data
+        clients_list: list of int numbers of concurrent clients
+    """
+    collisions, buildings = load_sample()
+    colls, builds = scale_sample(collisions, buildings, scale)
+    paths = query_paths()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = os.path.join(tmp_dir, "Collidium")
+        table_builder.update_table(database, colls, builds)
+        print("scale %dx, %d filter combinations, %d requests per client" %
+              (scale, len(paths), REQUESTS_PER_CLIENT))
+        for clients in clients_list:
+            process, port = start_service(database)
+            loop = asyncio.new_event_loop()
+            try:
+                latencies, elapsed, stats = loop.run_until_complete(load(port, clients, paths))
+            finally:
+                loop.close()
+                process.terminate()
+                process.wait()
+            print("  clients %4d  %8.0f req/s  p50 %8.2f ms  p99 %8.2f ms  "
+                  "queries run %4d  coalesced %4d  cache hits %5d" %
+                  (clients, len(latencies)/elapsed, 1000*np.percentile(latencies, 50),
+                   1000*np.percentile(latencies, 99), stats['cache']['misses'] -
+                   stats['coalesced'], stats['coalesced'], stats['cache']['hits']))
+
+if __name__ == '__main__':
+    ARGS = [int(arg) for arg in sys.argv[1:]]
+    run(ARGS[0] if ARGS else 10, ARGS[1:] or [1, 10, 50])
@@ -0,0 +1,86 @@
+"""
+COLLIDIUM
+Rollup Query Benchmark
+
+Builds a Collidium database from the bundled sample data at each scale,
+then times a set of notebook CollidiumQuery queries against the
+collidium_data table and against the pre-aggregated collidium_rollup table,
+reporting the median query latency of each.
+
+Two kinds of scaling are run: 'tiled' repeats the sample area (more
+buildings, so query results grow too), and 'dense' stacks copies of the
+collision history over the same buildings (more pairs per building, as for
+a longer collision history), which is the case the rollup table is for.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_rollup_query.py [scale ...]
+"""
+import itertools
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import table_builder
+from query_class import CollidiumQuery
+from sample_data import load_sample, scale_sample
+
+# Filter combinations timed at each scale (category, radius, year, duration)
+FILTERS = list(itertools.product(['All', 'COMMERCIAL'], [1500, 1000],
+                                 [2015, 2016], [12, 6, 1]))
+
+def median_ms(conn, queries):
+    """
+    Runs each query three times and returns the median latency in ms.
+    """
+    times = []
+    for query in queries:
+        for _ in range(3):
+            start = time.perf_counter()
+            conn.execute(query).fetchall()
+            times.append(time.perf_counter() - start)
+    return 1000*np.median(times)
+
+def dense_sample(collisions, scale):
+    """
+    Returns scale copies of the collisions in place, with unique ids.
+    """
+    colls = collisions.copy()
+    copies = [colls.assign(c_id=colls["c_id"] + copy*10**7) for copy in range(scale)]
+    return pd.concat(copies, ignore_index=True)
+
+def run(scales):
+    """
+    Runs the benchmark at each scale.
+
+    Args:
+        scales: list of int scale factors
+    """
+    collisions, buildings = load_sample()
+    samples = [('tiled', scale) + scale_sample(collisions, buildings, scale)
+               for scale in scales]
+    samples += [('dense', scale, dense_sample(collisions, scale), buildings)
+                for scale in scales]
+    for kind, scale, colls, builds in samples:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, "Collidium")
+            table_builder.update_table(database, colls, builds)
+            conn = sqlite3.connect(database)
+            pairs = conn.execute("SELECT COUNT(*) FROM collidium_data").fetchone()[0]
+            rows = conn.execute("SELECT COUNT(*) FROM collidium_rollup").fetchone()[0]
+            raw = [CollidiumQuery(*args).get_qstring() for args in FILTERS]
+            rollup = [CollidiumQuery(*args, rollup=True).get_qstring() for args in FILTERS]
+            print("%s %4dx  pairs %8d  rollup rows %8d  collidium_data %8.3f ms  "
+                  "collidium_rollup %8.3f ms" %
+                  (kind, scale, pairs, rows, median_ms(conn, raw), median_ms(conn, rollup)))
+            conn.close()
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1, 10, 100])
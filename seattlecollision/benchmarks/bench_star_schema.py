@@ -0,0 +1,154 @@
+"""
+COLLIDIUM
+Star Schema Benchmark
+
+Builds a Collidium database from the bundled sample data tiled to each
+scale, with the collidium data in the star schema (buildings, collisions
+and collidium_pairs tables, see the table_builder module), and a copy of it
+as the previous flat collidium_data table, with one row per pair holding
+every building and collision column (with the same category codes), its
+(b_id, c_id) primary key and the covering index of every CollidiumQuery
+query. Reports the size of the tables and indexes of each layout (from
+sqlite's dbstat table), and the median and mean time per query of the same
+random widget queries on each layout, from the statements of
+CollidiumQuery.get_statement (joining the star schema tables, or rewritten
+to read the flat table). The results are checked to be equal.
+
+Usage (from the top level of the repository):
+    python seattlecollision/benchmarks/bench_star_schema.py [scale ...]
+"""
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/benchmarks/')
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import table_builder
+import interactions_functionality as int_func
+from query_class import CollidiumQuery, PAIRS_FROM
+from sample_data import load_sample, scale_sample
+
+QUERIES = 500
+# Covering index of the flat collidium_data table
+FLAT_INDEX = ['base_year', 'b_id', 'b_lat', 'b_long', 'radius', 'coll_days_from_build',
+              'b_category', 'c_severity', 'c_type', 'coll_before', 'coll_during', 'coll_after',
+              'b_build_days']
+# Tables and indexes of each layout
+FLAT_OBJECTS = ['collidium_data', 'sqlite_autoindex_collidium_data_1', 'collidium_query_idx']
+STAR_OBJECTS = ([table for table, _ in table_builder.STAR_TABLES] +
+                ['sqlite_autoindex_collidium_pairs_1'] + list(table_builder.STAR_INDEXES))
+
+def widget_queries():
+    """Returns QUERIES random CollidiumQuery objects of the widget values."""
+    filters = list(itertools.product(int_func.BUILDING_CATEGORIES, range(1500, 700, -100),
+                                     int_func.BUILDING_YEARS, range(12, 5, -1),
+                                     int_func.COLLISION_SEVERITY, int_func.COLLISION_TYPE))
+    rng = random.Random(0)
+    return [CollidiumQuery(*args) for args in rng.choices(filters, k=QUERIES)]
+
+def flat_statement(statement):
+    """Returns a star schema statement rewritten to read the flat table."""
+    return statement.replace(PAIRS_FROM, "FROM collidium_data ")
+
+def flat_schema(labels=False):
+    """
+    Returns the (column, sqlite type) list of the flat table, with the
+    categorical columns as integer codes, or as text labels if labels is set.
+    """
+    return [(column, 'INTEGER' if column in table_builder.CATEGORY_LABELS and not labels
+             else sql_type) for column, sql_type in table_builder.COLLIDIUM_SCHEMA]
+
+def copy_flat_layout(database, flat, schema=None, expressions=None, index=None, labels=False): #pylint: disable=too-many-arguments
+    """
+    Copies the star schema tables of a database to a flat collidium_data
+    table, with its primary key and covering index, in a new database.
+
+    Args:
+        database: path to the Collidium database
+        flat: path to the new database
+        schema: (optional) (column, sqlite type) list of the table, by
+            default flat_schema(labels)
+        expressions: (optional) dict of sqlite expressions on the joined
+            tables giving the values of some columns
+        index: (optional) columns of the covering index, by default FLAT_INDEX
+        labels: if True, the categorical columns are copied as their text
+            labels (from the collidium_data view) rather than their codes
+    """
+    schema = flat_schema(labels) if schema is None else schema
+    expressions = {} if expressions is None else expressions
+    source = ("star.collidium_data" if labels else "star.collidium_pairs JOIN star.buildings "
+              "USING (b_id) JOIN star.collisions USING (c_id)")
+    conn = sqlite3.connect(flat)
+    conn.execute("ATTACH DATABASE ? AS star", (database,))
+    conn.execute("CREATE TABLE collidium_data (%s, PRIMARY KEY (b_id, c_id))" %
+                 ', '.join('%s %s' % column for column in schema))
+    conn.execute("INSERT INTO collidium_data SELECT %s FROM %s" % (', '.join(
+        expressions.get(column, column) for column, _ in schema), source))
+    conn.commit()
+    conn.execute("DETACH DATABASE star")
+    conn.execute("CREATE INDEX collidium_query_idx ON collidium_data (%s)" %
+                 ', '.join(FLAT_INDEX if index is None else index))
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+def object_sizes(database, names):
+    """Returns the sizes in bytes of the named tables and indexes of a database."""
+    conn = sqlite3.connect(database)
+    sizes = dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat WHERE name IN (%s) "
+                              "GROUP BY name" % ', '.join('?'*len(names)), names))
+    conn.close()
+    return sizes
+
+def timed(label, database, statements, names):
+    """Runs each (statement, params) pair, prints timings and returns the rows."""
+    conn = sqlite3.connect(database, cached_statements=int_func.STATEMENT_CACHE_SIZE)
+    sizes = object_sizes(database, names)
+    times = []
+    rows = []
+    for statement, params in statements:
+        start = time.perf_counter()
+        rows.append(sorted(conn.execute(statement, params).fetchall()))
+        times.append(time.perf_counter() - start)
+    conn.close()
+    print("  %-6s total %8.2f MB  (%s)  median %7.3f ms  mean %7.3f ms" %
+          (label, sum(sizes.values())/2**20,
+           ', '.join('%s %.2f' % (name, size/2**20) for name, size in sizes.items()),
+           1000*np.median(times), 1000*np.mean(times)))
+    return rows
+
+def run(scales):
+    """
+    Runs the benchmark at each scale.
+
+    Args:
+        scales: list of int scale factors
+    """
+    collisions, buildings = load_sample()
+    queries = widget_queries()
+    for scale in scales:
+        colls, builds = scale_sample(collisions, buildings, scale)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, "Collidium")
+            flat = os.path.join(tmp_dir, "Collidium_flat")
+            table_builder.update_table(database, colls, builds)
+            copy_flat_layout(database, flat)
+            print("scale %dx, %d queries" % (scale, len(queries)))
+            statements = [query.get_statement() for query in queries]
+            before = timed("flat", flat, [(flat_statement(statement), params)
+                                          for statement, params in statements], FLAT_OBJECTS)
+            after = timed("star", database, statements, STAR_OBJECTS)
+            for old, new in zip(before, after):
+                assert [row[:4] + row[5:] for row in old] == [row[:4] + row[5:] for row in new]
+                np.testing.assert_allclose([row[4] for row in new], [row[4] for row in old],
+                                           rtol=1e-12)
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1, 10, 50])
@@ -0,0 +1,162 @@
+"""
+COLLIDIUM
+Benchmark Sample Data Module
+
+Loads the bundled sample buildings and collisions tables, and scales them up
+for the benchmark scripts in this folder. Scripts are run from the top level
+of the repository (like the tests), e.g.:
+
+    python seattlecollision/benchmarks/bench_collidium_table.py
+"""
+import numpy as np
+import pandas as pd
+
+BUILDINGS_SAMPLE = "seattlecollision/data/buildings.csv"
+COLLISIONS_SAMPLE = "seattlecollision/data/Test_Data_For_Process_Data.csv"
+
+# Offset (in degrees) between tiled copies of the sample area
+TILE_OFFSET = 0.3
+
+def load_sample():
+    """
+    Loads the bundled processed buildings and collisions sample tables.
+
+    Returns:
+        Tuple of (collisions, buildings) pandas dataframes in the format
+        returned by collisions_clean and buildings_clean.
+    """
+    buildings = pd.read_csv(BUILDINGS_SAMPLE, index_col=0,
+                            parse_dates=["b_issue_date", "b_final_date"])
+    collisions = pd.read_csv(COLLISIONS_SAMPLE, index_col=0, parse_dates=["c_datetime"],
+                             dtype={"c_severity_code": str})
+    return collisions, buildings
+
+def scale_sample(collisions, buildings, scale):
+    """
+    Tiles the sample area scale times on a square grid of latitude/longitude
+    offsets, so the number of buildings, collisions and pairs all grow
+    linearly with scale (as for a longer collision history over a larger
+    area) rather than quadratically.
+
+    Args:
+        collisions: processed collisions dataframe
+        buildings: processed buildings dataframe
+        scale: (int) number of copies of the sample area
+
+    Returns:
+        Tuple of (collisions, buildings) pandas dataframes with unique ids.
+    """
+    side = int(np.ceil(np.sqrt(scale)))
+    colls = []
+    builds = []
+    for tile in range(scale):
+        d_lat = TILE_OFFSET*(tile//side)
+        d_long = TILE_OFFSET*(tile % side)
+        coll = collisions.copy()
+        coll["c_id"] = coll["c_id"] + tile*10**7
+        coll["c_lat"] = coll["c_lat"] + d_lat
+        coll["c_long"] = coll["c_long"] + d_long
+        colls.append(coll)
+        build = buildings.copy()
+        build["b_id"] = build["b_id"] + tile*10**8
+        build["b_lat"] = build["b_lat"] + d_lat
+        build["b_long"] = build["b_long"] + d_long
+        builds.append(build)
+    return (pd.concat(colls, ignore_index=True),
+            pd.concat(builds, ignore_index=True))
+
+# Columns of the raw SDOT collisions export that collisions_clean drops
+RAW_COLLISION_EXTRA_COLUMNS = ['inckey', 'coldetkey', 'reportno', 'status', 'addrtype',
+                               'intkey', 'location', 'exceptrsncode', 'exceptrsndesc',
+                               'personcount', 'vehcount', 'injuries', 'seriousinjuries',
+                               'fatalities', 'incdate', 'junctiontype', 'sdot_colcode',
+                               'sdot_coldesc', 'inattentionind', 'underinfl', 'weather',
+                               'roadcond', 'lightcond', 'pedrownotgrnt', 'sdotcolnum',
+                               'speeding', 'st_colcode', 'st_coldesc', 'seglanekey',
+                               'crosswalkkey', 'hitparkedcar', 'collisiontype']
+
+def raw_collisions(collisions, scale=1, start_year=2004):
+    """
+    Rebuilds a raw SDOT style collisions table (as read by collisions_clean)
+    from the processed collisions sample.
+
+    Rows are repeated scale times. Half of each copy is dated before 2013 by
+    moving it back to start_year, so that collisions_clean's 2013+ filter has
+    rows to drop, and incident times of day vary and use both raw incdttm
+    formats.
+
+    Args:
+        collisions: processed collisions dataframe
+        scale: (int) number of copies of the sample rows
+        start_year: (int) year that pre-2013 rows are moved back to
+
+    Returns:
+        pandas dataframe in the raw collisions export format
+    """
+    frames = []
+    for copy in range(scale):
+        dates = collisions["c_datetime"].copy()
+        old = np.arange(len(dates)) % 2 == copy % 2
+        dates[old] = dates[old] - pd.DateOffset(years=2013 - start_year)
+        with_time = np.arange(len(dates)) % 3 != 0
+        times = pd.to_timedelta((np.arange(len(dates))*37 + copy*11) % 1440, unit='m')
+        incdttm = dates.dt.strftime('%-m/%-d/%Y').where(
+            ~with_time, (dates + times).dt.strftime('%-m/%-d/%Y %I:%M:%S %p'))
+        raw = pd.DataFrame({"X": collisions["c_long"].values,
+                            "Y": collisions["c_lat"].values,
+                            "objectid": collisions["c_id"].values + copy*10**7,
+                            "incdttm": incdttm.values,
+                            "pedcount": collisions["c_ped"].values,
+                            "pedcylcount": collisions["c_cyc"].values,
+                            "severitycode": collisions["c_severity_code"].values,
+                            "severitydesc": collisions["c_severity_desc"].values})
+        for column in RAW_COLLISION_EXTRA_COLUMNS:
+            raw[column] = "raw export value for " + column
+        frames.append(raw)
+    return pd.concat(frames, ignore_index=True)
+
+def raw_buildings(buildings, scale=1):
+    """
+    Rebuilds a raw building permits table (as read by buildings_clean) from
+    the processed buildings sample.
+
+    Rows are repeated scale times. Every other row is turned into a permit
+    that buildings_clean drops (an addition with no final date).
+
+    Args:
+        buildings: processed buildings dataframe
+        scale: (int) number of copies of the sample rows
+
+    Returns:
+        pandas dataframe in the raw building permits format
+    """
+    frames = []
+    for copy in range(scale):
+        raw = pd.DataFrame({"Application/Permit Number": buildings["b_id"].values + copy*10**8,
+                            "Permit Type": "Construction",
+                            "Address": "123 Example St",
+                            "Description": "Construct new building, per plans.",
+                            "Category": buildings["b_category"].values,
+                            "Action Type": "NEW",
+                            "Work Type": "Plan Review",
+                            "Value": buildings["b_value"].values,
+                            "Applicant Name": "Example Applicant",
+                            "Application Date": buildings["b_issue_date"].dt.strftime(
+                                '%Y-%m-%d').values,
+                            "Issue Date": buildings["b_issue_date"].dt.strftime(
+                                '%Y-%m-%d').values,
+                            "Final Date": buildings["b_final_date"].dt.strftime(
+                                '%Y-%m-%d').values,
+                            "Expiration Date": np.nan,
+                            "Status": buildings["b_status"].values,
+                            "Contractor": "Example Contractor",
+                            "Permit and Complaint Status URL": "http://web6.seattle.gov",
+                            "Master Use Permit": np.nan,
+                            "Latitude": buildings["b_lat"].values,
+                            "Longitude": buildings["b_long"].values,
+                            "Location": "(47.6, -122.3)"})
+        dropped = np.arange(len(raw)) % 2 == 1
+        raw.loc[dropped, "Action Type"] = "ADD/ALT"
+        raw.loc[dropped, "Final Date"] = np.nan
+        frames.append(raw)
+    return pd.concat(frames, ignore_index=True)
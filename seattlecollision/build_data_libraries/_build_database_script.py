@@ -9,30 +9,21 @@ the completed database is included in the git repository and
 unpackaged by the setup.py, so it should be unnecessary to
 execute this script.
 
-Infile/outfile constants are set immediately after the import
-statements.
+The build runs as the stages of the build_pipeline module
+(collisions_clean, buildings_clean, create_collidium_table and
+create_table), whose outputs are cached in the data folder, so only
+the stages whose raw data, code or parameters have changed are rerun.
+If the database already exists, it is updated incrementally: only the
+building/collision pairs of new or changed raw data rows are
+recomputed (see table_builder.update_table), which takes seconds
+rather than hours.
+
+The data folder, raw data files, radius, window, worker processes
+and stages to force are set with command line arguments, e.g.:
+    python _build_database_script.py --radius 2000 --force create_table
+(see python _build_database_script.py --help).
 """
 #pylint: disable=import-error
-import process_data
-from table_builder import create_table
-
-# INPUT FILEPATHS
-COLLISIONS_RAW_INFILE = "../data/raw_data/raw_collisions_input.csv"
-BUILDINGS_RAW_INFILE = "../data/raw_data/raw_buildings_input.csv"
-# OUTPUT FILEPATHS
-COLLISIONS_PROCESSED_OUTFILE = "../data/collisions.csv"
-BUILDINGS_PROCESSED_OUTFILE = "../data/buildings.csv"
-COLLIDIUM_PROCESSED_OUTFILE = "../data/collidium_data.csv"
-
-# PROCESS DATAFRAMES
-COLLISIONS = process_data.collisions_clean(COLLISIONS_RAW_INFILE)
-BUILDINGS = process_data.buildings_clean(BUILDINGS_RAW_INFILE)
-COLLIDIUM = process_data.create_collidium_table(COLLISIONS, BUILDINGS)
-
-# EXPORT TO CSV FILES
-COLLISIONS.to_csv(COLLISIONS_PROCESSED_OUTFILE)
-BUILDINGS.to_csv(BUILDINGS_PROCESSED_OUTFILE)
-COLLIDIUM.to_csv(COLLIDIUM_PROCESSED_OUTFILE)
+from build_pipeline import main
 
-# BUILD SQLITE DB FOR COLLIDIUM DATA
-create_table('../data/Collidium', COLLIDIUM_PROCESSED_OUTFILE)
+main()
@@ -0,0 +1,360 @@
+"""
+COLLIDIUM
+Database Build Pipeline Module
+
+The build_pipeline module builds the Collidium database from the raw
+collisions and building permit files as a pipeline of four stages, each
+depending on the outputs of the stages before it:
+
+    collisions_clean        raw collisions file -> collisions.columns
+    buildings_clean         raw buildings file -> buildings.columns
+    create_collidium_table  both cleaned tables -> collidium_data.columns
+    create_table            the three tables above -> Collidium database
+
+Stage outputs are kept in the data folder (the tables as column stores, see
+the column_store module), and a build_cache.json file there records the key
+each output was built with. A stage's key is a sha256 hash of the stage
+name, the content hashes of its input files and of the source files of the
+modules it runs, the parameters that change its output (the radius and
+window of the pairs) and the keys of the stages it depends on. A stage is
+only rerun when its key has changed, or its output is missing or has been
+modified since it was built, so e.g. new raw collisions rerun
+collisions_clean and the stages after it, but not buildings_clean. The
+content hash of each file is remembered with its size and modification
+time, so unchanged raw files are not read again.
+
+Stages are run on demand from create_table: a cached stage does not need
+the stages before it, and when the database exists and the build is
+incremental, create_table refreshes it with update_table (see the
+table_builder module) from the cleaned tables, without the
+create_collidium_table stage. Any stage can be forced to rerun (the stages
+after it only rerun if their key has changed). Each stage prints its
+running time, or that its output is cached.
+
+Functions:
+    build: runs the pipeline and returns the status of each stage.
+
+    main: command line entry point.
+
+Exceptions (ValueError) are raised if a raw data file path is not valid or
+a forced stage is not a pipeline stage.
+
+Usage (from the build_data_libraries folder):
+    python build_pipeline.py [--data-dir DIR] [--collisions FILE] [--buildings FILE]
+        [--force STAGE] [--full] [--workers N] [--radius FEET] [--window MONTHS]
+        [--chunksize ROWS]
+"""
+import argparse
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+#pylint: disable=import-error
+import process_data
+import column_store
+import table_builder
+
+# Folder of the pipeline modules, whose source files are hashed into stage keys
+LIBRARY_DIR = os.path.dirname(os.path.abspath(__file__))
+# Default data folder, and raw data files within it
+DATA_DIR = os.path.join(LIBRARY_DIR, '..', 'data')
+COLLISIONS_RAW = os.path.join('raw_data', 'raw_collisions_input.csv')
+BUILDINGS_RAW = os.path.join('raw_data', 'raw_buildings_input.csv')
+# Stage cache file in the data folder
+CACHE_FILE = 'build_cache.json'
+# Rows per chunk when streaming raw files
+RAW_CHUNKSIZE = 100000
+# Stages in build order: the stages each depends on, its raw input files,
+# the module source files it runs, its parameters and its output (in the
+# data folder)
+STAGES = OrderedDict([
+    ('collisions_clean', {'deps': [], 'inputs': ['collisions'],
+                          'code': ['process_data.py', 'column_store.py'],
+                          'params': [], 'output': 'collisions.columns'}),
+    ('buildings_clean', {'deps': [], 'inputs': ['buildings'],
+                         'code': ['process_data.py', 'column_store.py'],
+                         'params': [], 'output': 'buildings.columns'}),
+    ('create_collidium_table', {'deps': ['collisions_clean', 'buildings_clean'], 'inputs': [],
+                                'code': ['process_data.py', 'spatial_index.py',
+                                         'geo_distance.py', 'column_store.py'],
+                                'params': ['radius', 'window'],
+                                'output': 'collidium_data.columns'}),
+    # An incremental create_table computes pairs itself (see update_table),
+    # without the create_collidium_table stage, so it hashes the pair code
+    # itself rather than relying on that stage's key
+    ('create_table', {'deps': ['collisions_clean', 'buildings_clean', 'create_collidium_table'],
+                      'inputs': [], 'code': ['table_builder.py', 'category_codes.py',
+                                             'column_store.py', 'process_data.py',
+                                             'spatial_index.py', 'geo_distance.py'],
+                      'params': ['radius', 'window'], 'output': 'Collidium'}),
+])
+
+def build(data_dir=DATA_DIR, collisions_raw=None, buildings_raw=None, force=(), #pylint: disable=too-many-arguments
+          incremental=True, workers=None, radius=process_data.COLLIDIUM_RADIUS,
+          window=process_data.COLLIDIUM_WINDOW, chunksize=RAW_CHUNKSIZE):
+    """
+    Builds the Collidium database in a data folder, rerunning only the
+    stages whose key has changed since they were last built.
+
+    Args:
+        data_dir: (str) folder of the stage outputs and the build cache
+        collisions_raw: (str) raw collisions file, by default
+            raw_data/raw_collisions_input.csv in data_dir
+        buildings_raw: (str) raw buildings file, by default
+            raw_data/raw_buildings_input.csv in data_dir
+        force: names of the stages to rerun even if they are cached, or
+            'all' for every stage. Later stages are not forced with them.
+        incremental: if True and the database exists, create_table updates
+            it with update_table rather than rebuilding it
+        workers: (int) worker processes for building/collision pairs, by
+            default the number of CPUs
+        radius: maximum pair distance in feet
+        window: maximum time from the building period in months
+        chunksize: rows per chunk when streaming the raw files
+
+    Returns:
+        dict of the stages that were needed, in the order they finished,
+        with their status ('built' or 'cached') and running time in seconds
+
+    Raises:
+        ValueError: If a raw data file path is not valid, or a forced stage
+            is not in STAGES.
+    """
+    force = set(STAGES) if 'all' in force else set(force)
+    unknown = force - set(STAGES)
+    if unknown:
+        raise ValueError('Build Pipeline: unknown stages %s' % sorted(unknown))
+    inputs = {'collisions': collisions_raw or os.path.join(data_dir, COLLISIONS_RAW),
+              'buildings': buildings_raw or os.path.join(data_dir, BUILDINGS_RAW)}
+    for path in inputs.values():
+        if not os.path.exists(path):
+            raise ValueError('The file path is not valid')
+    cache_path = os.path.join(data_dir, CACHE_FILE)
+    cache = _read_cache(cache_path)
+    params = {'radius': radius, 'window': window}
+    keys = {}
+    for stage, spec in STAGES.items():
+        keys[stage] = _stage_key(stage, spec, inputs, params, keys, cache['files'])
+    state = {'data_dir': data_dir, 'inputs': inputs, 'params': params, 'keys': keys,
+             'cache': cache, 'cache_path': cache_path, 'force': force, 'frames': {},
+             'summary': OrderedDict(), 'incremental': incremental,
+             'workers': workers or os.cpu_count() or 1, 'chunksize': chunksize}
+    start = time.perf_counter()
+    # Forced stages are run even if no stage after them needs to run
+    for stage in STAGES:
+        if stage in force:
+            _run_stage(stage, state)
+    _run_stage('create_table', state)
+    print('Build Pipeline: %d stages built, %d cached in %.1f s. (Woohoo!)' % (
+        sum(run['status'] == 'built' for run in state['summary'].values()),
+        sum(run['status'] == 'cached' for run in state['summary'].values()),
+        time.perf_counter() - start))
+    return state['summary']
+
+def _read_cache(cache_path):
+    """
+    Helper function to read the build cache file, or an empty cache if the
+    file does not exist.
+    """
+    if os.path.exists(cache_path):
+        with open(cache_path) as cache_file:
+            cache = json.load(cache_file)
+    else:
+        cache = {}
+    cache.setdefault('files', {})
+    cache.setdefault('stages', {})
+    return cache
+
+def _write_cache(cache_path, cache):
+    """
+    Helper function to write the build cache file, replacing it atomically.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    with open(cache_path + '.tmp', 'w') as cache_file:
+        json.dump(cache, cache_file, indent=1, sort_keys=True)
+    os.replace(cache_path + '.tmp', cache_path)
+
+def _file_hash(path, files):
+    """
+    Helper function returning the sha256 hash of a file's content. Hashes
+    are remembered in files by absolute path with the file's size and
+    modification time, and only recomputed when either changes.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    known = files.get(path)
+    if known is not None and (known['size'], known['mtime_ns']) == (stat.st_size,
+                                                                     stat.st_mtime_ns):
+        return known['sha256']
+    digest = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for block in iter(lambda: infile.read(2**20), b''):
+            digest.update(block)
+    files[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                   'sha256': digest.hexdigest()}
+    return files[path]['sha256']
+
+def _stage_key(stage, spec, inputs, params, keys, files): #pylint: disable=too-many-arguments
+    """
+    Helper function returning the key of a stage: a sha256 hash of its name,
+    input and source file hashes, parameters and dependency keys.
+    """
+    content = {'stage': stage,
+               'inputs': {name: _file_hash(inputs[name], files) for name in spec['inputs']},
+               'code': {name: _file_hash(os.path.join(LIBRARY_DIR, name), files)
+                        for name in spec['code']},
+               'params': {name: params[name] for name in spec['params']},
+               'deps': {dep: keys[dep] for dep in spec['deps']}}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _output_path(state, stage):
+    """
+    Helper function returning the path of a stage's output.
+    """
+    return os.path.join(state['data_dir'], STAGES[stage]['output'])
+
+def _output_version(path):
+    """
+    Helper function returning the modification time of a stage output (of
+    its meta.json file for a column store), or None if it does not exist.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, column_store.META_FILE)
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+def _is_cached(state, stage):
+    """
+    Helper function to check whether a stage's output was built with its
+    current key and has not been modified since.
+    """
+    entry = state['cache']['stages'].get(stage)
+    version = _output_version(_output_path(state, stage))
+    return (entry is not None and version is not None and entry['key'] == state['keys'][stage]
+            and entry['mtime_ns'] == version)
+
+def _run_stage(stage, state):
+    """
+    Helper function to bring a stage's output up to date, running the
+    stages it needs first, and to record its status and running time.
+    """
+    if stage in state['summary']:
+        return
+    if stage not in state['force'] and _is_cached(state, stage):
+        state['summary'][stage] = {'status': 'cached', 'seconds': 0.0}
+        print('Build Pipeline: %-22s cached' % stage)
+        return
+    for dep in _needed_deps(stage, state):
+        _run_stage(dep, state)
+    start = time.perf_counter()
+    _STAGE_FUNCTIONS[stage](state)
+    seconds = time.perf_counter() - start
+    state['summary'][stage] = {'status': 'built', 'seconds': seconds}
+    state['cache']['stages'][stage] = {
+        'key': state['keys'][stage], 'output': STAGES[stage]['output'], 'seconds': seconds,
+        'mtime_ns': _output_version(_output_path(state, stage)),
+        'built_at': datetime.now().replace(microsecond=0).isoformat()}
+    # Written after every stage, so an interrupted build keeps its finished stages
+    _write_cache(state['cache_path'], state['cache'])
+    print('Build Pipeline: %-22s built in %.1f s' % (stage, seconds))
+
+def _needed_deps(stage, state):
+    """
+    Helper function returning the stages a stage needs to run: an
+    incremental update of an existing database does not need the pairs.
+    """
+    if (stage == 'create_table' and state['incremental'] and
+            os.path.exists(_output_path(state, stage))):
+        return ['collisions_clean', 'buildings_clean']
+    return STAGES[stage]['deps']
+
+def _frame(state, stage):
+    """
+    Helper function returning the table a stage built in this run, or else
+    loading its output column store.
+    """
+    if stage not in state['frames']:
+        state['frames'][stage] = column_store.read_frame(_output_path(state, stage), mmap=False)
+    return state['frames'][stage]
+
+def _collisions_clean(state):
+    """Runs the collisions_clean stage."""
+    frame = process_data.collisions_clean(state['inputs']['collisions'],
+                                          chunksize=state['chunksize'])
+    column_store.write_frame(frame, _output_path(state, 'collisions_clean'))
+    state['frames']['collisions_clean'] = frame
+
+def _buildings_clean(state):
+    """Runs the buildings_clean stage."""
+    frame = process_data.buildings_clean(state['inputs']['buildings'],
+                                         chunksize=state['chunksize'])
+    column_store.write_frame(frame, _output_path(state, 'buildings_clean'))
+    state['frames']['buildings_clean'] = frame
+
+def _create_collidium_table(state):
+    """Runs the create_collidium_table stage."""
+    frame = process_data.create_collidium_table(
+        _frame(state, 'collisions_clean'), _frame(state, 'buildings_clean'),
+        workers=state['workers'], **state['params'])
+    column_store.write_frame(frame, _output_path(state, 'create_collidium_table'))
+    state['frames']['create_collidium_table'] = frame
+
+def _create_table(state):
+    """
+    Runs the create_table stage: an update of the existing database if the
+    build is incremental, or else a new build from the pairs.
+    """
+    database = _output_path(state, 'create_table')
+    collisions = _frame(state, 'collisions_clean')
+    buildings = _frame(state, 'buildings_clean')
+    if state['incremental'] and os.path.exists(database):
+        table_builder.update_table(database, collisions, buildings, workers=state['workers'],
+                                   **state['params'])
+    else:
+        table_builder.create_table(database, _output_path(state, 'create_collidium_table'),
+                                   collisions, buildings, **state['params'])
+
+_STAGE_FUNCTIONS = {'collisions_clean': _collisions_clean,
+                    'buildings_clean': _buildings_clean,
+                    'create_collidium_table': _create_collidium_table,
+                    'create_table': _create_table}
+
+def main(argv=None):
+    """
+    Command line entry point: parses the arguments (see the module usage)
+    and runs build.
+
+    Args:
+        argv: (optional) list of arguments, by default sys.argv[1:]
+
+    Returns:
+        the build summary (see build)
+    """
+    parser = argparse.ArgumentParser(description='Builds the Collidium database from the raw '
+                                     'data, rerunning only the stages whose inputs changed.')
+    parser.add_argument('--data-dir', default=DATA_DIR,
+                        help='folder of the stage outputs and build cache')
+    parser.add_argument('--collisions', help='raw collisions file (default: '
+                        'DATA_DIR/%s)' % COLLISIONS_RAW)
+    parser.add_argument('--buildings', help='raw buildings file (default: '
+                        'DATA_DIR/%s)' % BUILDINGS_RAW)
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE',
+                        choices=list(STAGES) + ['all'],
+                        help='rerun a stage even if it is cached (repeatable, or all)')
+    parser.add_argument('--full', action='store_true',
+                        help='rebuild the database rather than updating it incrementally')
+    parser.add_argument('--workers', type=int, help='worker processes for the pairs')
+    parser.add_argument('--radius', type=int, default=process_data.COLLIDIUM_RADIUS,
+                        help='maximum pair distance in feet')
+    parser.add_argument('--window', type=int, default=process_data.COLLIDIUM_WINDOW,
+                        help='maximum time from the building period in months')
+    parser.add_argument('--chunksize', type=int, default=RAW_CHUNKSIZE,
+                        help='rows per chunk when streaming raw files')
+    args = parser.parse_args(argv)
+    return build(args.data_dir, args.collisions, args.buildings, force=args.force,
+                 incremental=not args.full, workers=args.workers, radius=args.radius,
+                 window=args.window, chunksize=args.chunksize)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""
+COLLIDIUM
+Category Codes Module
+
+Module Summary:
+The category_codes.py module holds the integer codes of the categorical columns
+(b_category, c_severity and c_type), which the table_builder module stores in the
+database (with their labels in its category_codes lookup table) and the
+CollidiumQuery filters of the query_class module are written with, so both use
+the same mapping.
+
+Labels are coded in CATEGORY_LABELS order from 1. Labels found in the data that
+are not listed get the next codes when the database is built, and cannot be
+filtered on by CollidiumQuery.
+"""
+
+# Labels of the categorical columns, in code order from 1
+CATEGORY_LABELS = {'b_category': ['COMMERCIAL', 'MULTIFAMILY', 'INDUSTRIAL', 'INSTITUTIONAL',
+                                  'SINGLE FAMILY / DUPLEX'],
+                   'c_severity': ['Fatality', 'Serious Injury', 'Injury',
+                                  'Property Damage Only'],
+                   'c_type': ['Vehicle Only', 'Bike/Pedestrian']}
+
+# Code of each label, by column
+CATEGORY_CODES = {name: {label: code for code, label in enumerate(labels, 1)}
+                  for name, labels in CATEGORY_LABELS.items()}
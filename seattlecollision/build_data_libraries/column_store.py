@@ -0,0 +1,120 @@
+"""
+COLLIDIUM
+Column Store Module
+
+Module Summary:
+The column_store.py module saves the processed collisions, buildings and collidium
+dataframes as typed binary column files, so the database build does not write them
+as CSV text and parse them back (guessing each column's dtype on the way in).
+
+A column store is a folder holding one NumPy .npy file per column and a meta.json
+file listing the columns in order with how each one is stored:
+ - numeric and datetime columns: the column values, with their dtype
+ - string columns: dictionary encoded, as integer codes (-1 for missing values)
+   with the distinct values listed in meta.json, and read back as pandas
+   categoricals (e.g. b_category, c_severity, c_type)
+ - the dataframe index, when it is not the default 0..n-1 range, as __index__.npy
+
+Column files are read with NumPy memory mapping by default, so loading a store
+only reads the parts of each file that are used.
+
+Exceptions (ValueError) are raised if a folder is not a column store.
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Name of the column store metadata file, and of the stored index column
+META_FILE = 'meta.json'
+INDEX_COLUMN = '__index__'
+FORMAT_VERSION = 1
+
+def is_column_store(path):
+    """
+    Checks whether a path is a column store folder.
+
+    Args:
+        path (str): path to check
+
+    Returns:
+        True (bool) if path is a folder with a column store meta.json file.
+    """
+    return os.path.isfile(os.path.join(str(path), META_FILE))
+
+def _encode_column(values):
+    """
+    Returns the array stored for a column and its meta.json entry.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, categories = values.cat.codes.values, values.cat.categories
+    elif values.dtype.kind in 'biufcmM':
+        array = values.values
+        return array, {'kind': 'values', 'dtype': array.dtype.str}
+    else:
+        codes, categories = pd.factorize(values, sort=True)
+    dtype = np.min_scalar_type(-max(len(categories), 1))
+    return codes.astype(dtype), {'kind': 'category', 'dtype': np.dtype(dtype).str,
+                                 'categories': [str(value) for value in categories]}
+
+def write_frame(frame, path):
+    """
+    Saves a dataframe as a column store folder, replacing the folder's
+    column files if it exists.
+
+    Args:
+        frame (dataframe): processed collisions, buildings or collidium dataframe
+        path (str): column store folder to write
+
+    Returns:
+        None
+    """
+    os.makedirs(path, exist_ok=True)
+    columns = []
+    stored = [(str(name), frame[name]) for name in frame.columns]
+    if not frame.index.equals(pd.RangeIndex(frame.shape[0])):
+        stored.append((INDEX_COLUMN, frame.index.to_series(index=None)))
+    for name, values in stored:
+        array, meta = _encode_column(values.reset_index(drop=True))
+        np.save(os.path.join(path, name + '.npy'), array, allow_pickle=False)
+        meta['name'] = name
+        columns.append(meta)
+    with open(os.path.join(path, META_FILE), 'w') as meta_file:
+        json.dump({'version': FORMAT_VERSION, 'rows': int(frame.shape[0]),
+                   'columns': columns}, meta_file, indent=1)
+
+def read_frame(path, columns=None, mmap=True):
+    """
+    Loads a dataframe from a column store folder.
+
+    Args:
+        path (str): column store folder
+        columns (list): (optional) names of the columns to load, by default all
+        mmap (bool): if True, column files are memory mapped read-only rather
+            than read into memory
+
+    Returns:
+        Dataframe with the stored dtypes, string columns as categoricals.
+
+    Raises:
+        ValueError: If path is not a column store folder, or a column is not stored.
+    """
+    if not is_column_store(path):
+        raise ValueError('%s is not a column store folder' % path)
+    with open(os.path.join(path, META_FILE)) as meta_file:
+        meta = json.load(meta_file)
+    stored = {column['name']: column for column in meta['columns']}
+    names = [name for name in stored if name != INDEX_COLUMN] if columns is None else columns
+    missing = [name for name in names if name not in stored]
+    if missing:
+        raise ValueError('Columns %s are not in the column store' % missing)
+    data = {}
+    for name in names + ([INDEX_COLUMN] if INDEX_COLUMN in stored else []):
+        # A plain ndarray view of the memory map, so pandas treats it as any array
+        array = np.asarray(np.load(os.path.join(path, name + '.npy'),
+                                   mmap_mode='r' if mmap else None, allow_pickle=False))
+        if stored[name]['kind'] == 'category':
+            array = pd.Categorical.from_codes(array, stored[name]['categories'])
+        data[name] = array
+    index = data.pop(INDEX_COLUMN, None)
+    return pd.DataFrame(data, index=index, columns=names, copy=False)
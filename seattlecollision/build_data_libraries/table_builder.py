@@ -1,34 +1,625 @@
 """
-This module takes the collidium_data.csv file and converts it into
-a table that is placed in the given database file. The module is
-called only once, during the initial setup process, and does not
-need to be called anytime after.
+This module takes the collidium data (the collidium_data.csv file, or
+the collidium_data.columns column store written by the
+create_collidium_table stage of build_pipeline.py) and converts it into
+a table that is placed in the given database file. The module is called
+only once, during the initial setup process, and does not need to be
+called anytime after.
+
+When new collisions or building permits are added to the raw data,
+update_table refreshes an existing database incrementally: only the
+building/collision pairs of new, changed or removed rows are recomputed.
+A build manifest of row content hashes, stored in the database alongside
+the collidium tables, is used to detect which rows have changed
+since the last build.
+
+The radius (in feet) and window (in months) the pairs were built with (see
+create_collidium_table) are stored in the database's build_info table, and
+CollidiumQuery filters are validated against them (see build_limits in the
+interactions_functionality module). update_table rebuilds the table from
+scratch when it is called with different limits.
+
+The collidium data is stored as a star schema of three tables with explicit
+typed schemas: buildings (BUILDINGS_SCHEMA, one row per building),
+collisions (COLLISIONS_SCHEMA, one row per collision) and collidium_pairs
+(PAIRS_SCHEMA, one row per building/collision pair, holding only the ids and
+the pair's own columns), so building and collision columns are stored once
+rather than repeated on every pair. The categorical columns (b_category,
+c_type and c_severity) are stored as small integer codes, with their labels
+in the category_codes lookup table (see CATEGORY_LABELS in the
+category_codes module, whose codes CollidiumQuery filters use); c_type and
+c_severity are stored with the pairs, so CollidiumQuery queries only join
+buildings and collidium_pairs. A collidium_data view joins the tables back
+to the flat COLLIDIUM_SCHEMA columns, with the labels, for ad hoc queries.
+Dates are
+stored as integer day numbers (days since 1970-01-01; in sqlite,
+date(c_dt*86400, 'unixepoch') gives the date as text). The before/during/after
+columns are 0/1 integers, and each building holds the length of its building
+period in days (at least 1), b_build_days, which CollidiumQuery queries
+divide the during counts by to normalize them to the exposure of their
+duration (rather than storing a normalized float per pair). The pair table
+is clustered on (b_id, c_id), the buildings table has a covering index
+matched to the CollidiumQuery query shapes, and ANALYZE statistics are
+gathered after each full build.
+
+A collidium_rollup table holding the before/during/after sums of the
+pairs grouped by every CollidiumQuery filter (with radius bucketed
+to ROLLUP_RADIUS_STEP feet and days from build bucketed to the shortest
+duration, in months up to the window, whose query counts the pair) is rebuilt by
+create_table and by full builds of update_table. Incremental updates only
+replace the rollup rows of the buildings whose pairs changed. CollidiumQuery
+objects with their rollup attribute set query it instead of collidium_data
+when they can.
 
 Modules
     create_table: This module is responsible for creating a table.
     It takes as an argument, the name of the database, and the path
-    to the CSV file.
+    to the CSV file or column store folder of the collidium data.
+
+    update_table: Incrementally updates the collidium tables from
+    processed collisions and buildings dataframes.
 """
 import os
 import sqlite3
+from datetime import datetime
+import numpy as np
 import pandas as pd
+#pylint: disable=import-error
+from process_data import create_collidium_table, COLLIDIUM_RADIUS, COLLIDIUM_WINDOW
+import column_store
+from category_codes import CATEGORY_LABELS
+
+# Columns and sqlite types of the star schema tables
+BUILDINGS_SCHEMA = [('b_id', 'INTEGER PRIMARY KEY'),
+                    ('b_lat', 'REAL'),
+                    ('b_long', 'REAL'),
+                    ('b_category', 'INTEGER'),
+                    ('b_start_dt', 'INTEGER'),
+                    ('b_end_dt', 'INTEGER'),
+                    ('b_build_days', 'INTEGER'),
+                    ('base_year', 'INTEGER')]
+COLLISIONS_SCHEMA = [('c_id', 'INTEGER PRIMARY KEY'),
+                     ('c_dt', 'INTEGER'),
+                     ('c_lat', 'REAL'),
+                     ('c_long', 'REAL')]
+PAIRS_SCHEMA = [('b_id', 'INTEGER NOT NULL'),
+                ('c_id', 'INTEGER NOT NULL'),
+                ('radius', 'REAL'),
+                ('coll_before', 'INTEGER'),
+                ('coll_during', 'INTEGER'),
+                ('coll_after', 'INTEGER'),
+                ('coll_days_from_build', 'INTEGER'),
+                ('c_type', 'INTEGER'),
+                ('c_severity', 'INTEGER')]
+# Columns and sqlite types of the collidium_data view (and of the flat
+# collidium_data table of earlier databases)
+COLLIDIUM_SCHEMA = [('b_id', 'INTEGER NOT NULL'),
+                    ('c_id', 'INTEGER NOT NULL'),
+                    ('b_lat', 'REAL'),
+                    ('b_long', 'REAL'),
+                    ('b_category', 'TEXT'),
+                    ('b_start_dt', 'INTEGER'),
+                    ('b_end_dt', 'INTEGER'),
+                    ('b_build_days', 'INTEGER'),
+                    ('c_dt', 'INTEGER'),
+                    ('c_lat', 'REAL'),
+                    ('c_long', 'REAL'),
+                    ('c_type', 'TEXT'),
+                    ('c_severity', 'TEXT'),
+                    ('radius', 'REAL'),
+                    ('coll_before', 'INTEGER'),
+                    ('coll_during', 'INTEGER'),
+                    ('coll_after', 'INTEGER'),
+                    ('coll_days_from_build', 'INTEGER'),
+                    ('base_year', 'INTEGER')]
+# Tables of the star schema, in creation order
+STAR_TABLES = [('buildings', BUILDINGS_SCHEMA), ('collisions', COLLISIONS_SCHEMA),
+               ('collidium_pairs', PAIRS_SCHEMA)]
+# Columns of the collidium data stored as integer day numbers
+DATE_COLUMNS = ['b_start_dt', 'b_end_dt', 'c_dt']
+# Indexes of the star schema tables. The first covers the buildings side of
+# every CollidiumQuery query: base_year is always filtered on, and b_id,
+# b_lat, b_long come next so that GROUP BY reads the index in order. The
+# second serves update_table's deletes of pairs by c_id.
+STAR_INDEXES = {
+    'buildings_query_idx': ('buildings', ['base_year', 'b_id', 'b_lat', 'b_long',
+                                          'b_build_days', 'b_category']),
+    'collidium_c_id_idx': ('collidium_pairs', ['c_id'])}
+# Width in feet of the rollup table's radius buckets. Must match
+# ROLLUP_RADIUS_STEP in query_class.py.
+ROLLUP_RADIUS_STEP = 100
+# Group columns and covering index of the rollup table
+ROLLUP_KEYS = ['b_id', 'b_lat', 'b_long', 'b_build_days', 'base_year', 'b_category',
+               'c_severity', 'c_type']
+ROLLUP_INDEX = ['base_year', 'b_id', 'b_lat', 'b_long', 'radius_bucket', 'duration_bucket',
+                'b_category', 'c_severity', 'c_type', 'coll_before', 'coll_during', 'coll_after',
+                'b_build_days']
 
-def create_table(database, path):
+def create_table(database, path, collisions=None, buildings=None, #pylint: disable=too-many-arguments
+                 without_rowid=True, page_size=None, radius=COLLIDIUM_RADIUS,
+                 window=COLLIDIUM_WINDOW):
     """
-    This function takes as input a database, along with a path to a folder
-    that contains the CSV file. It then constructs a table in the given
-    database, and completes its operation.
+    This function takes as input a database, along with a path to the
+    collidium data, either a CSV file or a column store folder (see the
+    column_store module). It then constructs a table in the given database,
+    and completes its operation.
 
     :param database: This is the name of the database
     file to which the tables will be added.
-    :param path: The path to a folder that contains the CSV file
+    :param path: The path to the collidium_data CSV file or column store
+    :param collisions: (optional) the processed collisions dataframe the
+    collidium data was built from. If given with buildings, a build manifest is
+    stored so that the database can later be refreshed with update_table;
+    otherwise any earlier manifest is dropped, and the next update_table
+    rebuilds the tables from scratch.
+    :param buildings: (optional) the processed buildings dataframe the
+    collidium data was built from.
+    :param without_rowid: if True (the default), the collidium_pairs table
+    is stored as a WITHOUT ROWID table clustered on its (b_id, c_id) primary
+    key.
+    :param page_size: (optional) sqlite page size in bytes for the database
+    :param radius: the radius in feet the collidium data was built with
+    :param window: the window in months the collidium data was built with
     :return: Doesn't return anything
     """
     conn = sqlite3.connect(database)
     if not os.path.exists(path):
         raise ValueError('The file path is not valid')
-    dataframe = pd.read_csv(path)
-    del dataframe['Unnamed: 0']
-    dataframe.to_sql('collidium_data', conn, if_exists='replace', index=False)
+    if os.path.isdir(path):
+        dataframe = column_store.read_frame(path)
+    else:
+        dataframe = pd.read_csv(path)
+        del dataframe['Unnamed: 0']
+    with conn:
+        _create_collidium_table(conn, _sql_frame(dataframe), without_rowid)
+        if collisions is not None and buildings is not None:
+            _write_manifest(conn, _row_hashes(collisions, 'c_id'),
+                            _row_hashes(buildings, 'b_id'))
+        else:
+            # A manifest of an earlier build does not describe the new data, so
+            # the next update_table rebuilds from scratch
+            _drop_object(conn, 'build_manifest')
+        _write_build_limits(conn, radius, window)
+        _create_rollup(conn, window)
+    _finish_build(conn, page_size)
     print('Dataprocessing: sqlite database constructed. (Woohoo!)')
     conn.close()
+
+def update_table(database, collisions, buildings, workers=1, radius=None, window=None): #pylint: disable=too-many-arguments
+    """
+    This function incrementally updates the collidium tables in the
+    given database from processed collisions and buildings dataframes.
+
+    Rows are compared with the build manifest stored by the last build.
+    Pairs for new, changed or removed buildings and collisions are deleted,
+    pairs are computed for new or changed buildings against all collisions
+    and for the other buildings against new or changed collisions, and are
+    then inserted with their building and collision rows, and buildings and
+    collisions left without pairs are removed. The collidium_rollup rows of
+    the buildings whose pairs were deleted or inserted are rebuilt. If the
+    database has no
+    manifest, was built with a different radius or window, or has no
+    collidium_pairs table with the PAIRS_SCHEMA columns (e.g. a database
+    with a flat collidium_data table), the tables are rebuilt from scratch.
+    The update runs in a single transaction.
+
+    :param database: This is the name of the database file
+    :param collisions: processed collisions dataframe (from collisions_clean)
+    :param buildings: processed buildings dataframe (from buildings_clean)
+    :param workers: number of worker processes used to compute pairs
+    :param radius: (optional) radius in feet of the pairs, by default the
+    radius the database was built with (or COLLIDIUM_RADIUS)
+    :param window: (optional) window in months of the pairs, by default the
+    window the database was built with (or COLLIDIUM_WINDOW)
+    :return: a dict with the number of changed buildings, changed
+    collisions, deleted pairs and inserted pairs
+    """
+    conn = sqlite3.connect(database)
+    coll_hashes = _row_hashes(collisions, 'c_id')
+    build_hashes = _row_hashes(buildings, 'b_id')
+    old_colls, old_builds = _read_manifest(conn)
+    old_radius, old_window = _read_build_limits(conn)
+    radius = old_radius if radius is None else radius
+    window = old_window if window is None else window
+    full_build = (old_colls is None or (radius, window) != (old_radius, old_window) or
+                  _table_columns(conn, 'collidium_pairs') !=
+                  [column for column, _ in PAIRS_SCHEMA])
+    if full_build:
+        old_colls, old_builds = pd.Series(), pd.Series()
+
+    new_b = _changed_ids(build_hashes, old_builds)
+    new_c = _changed_ids(coll_hashes, old_colls)
+    stale_b = new_b + [b_id for b_id in old_builds.index if b_id not in build_hashes.index]
+    stale_c = new_c + [c_id for c_id in old_colls.index if c_id not in coll_hashes.index]
+
+    # Pairs for changed buildings, then for unchanged buildings and changed collisions
+    is_new_b = buildings['b_id'].isin(new_b)
+    frames = []
+    if is_new_b.any():
+        frames.append(create_collidium_table(collisions, buildings[is_new_b], workers=workers,
+                                             radius=radius, window=window))
+    is_new_c = collisions['c_id'].isin(new_c)
+    if is_new_c.any() and (~is_new_b).any():
+        frames.append(create_collidium_table(collisions[is_new_c], buildings[~is_new_b],
+                                             workers=workers, radius=radius, window=window))
+    frames = [frame for frame in frames if not frame.empty]
+    pairs = pd.concat(frames, ignore_index=True) if frames else None
+    if full_build and pairs is None:
+        raise ValueError('No building/collision pairs to build the table from.')
+
+    deleted = 0
+    with conn:
+        if full_build:
+            _create_collidium_table(conn, _sql_frame(pairs))
+        else:
+            # Buildings whose rollup rows change: those with deleted or inserted pairs
+            rollup_b = set(stale_b).union(_paired_b_ids(conn, stale_c))
+            deleted = _delete_pairs(conn, 'b_id', stale_b) + _delete_pairs(conn, 'c_id', stale_c)
+            if pairs is not None:
+                _insert_pairs(conn, _sql_frame(pairs))
+                rollup_b.update(pairs['b_id'].tolist())
+            _prune_dimensions(conn)
+        _write_manifest(conn, coll_hashes, build_hashes)
+        _write_build_limits(conn, radius, window)
+        if full_build or not _table_columns(conn, 'collidium_rollup'):
+            _create_rollup(conn, window)
+        else:
+            _update_rollup(conn, sorted(rollup_b), window)
+    if full_build:
+        _finish_build(conn)
+    conn.close()
+    summary = {'buildings': len(new_b), 'collisions': len(new_c), 'deleted': deleted,
+               'inserted': 0 if pairs is None else pairs.shape[0]}
+    print('Dataprocessing: sqlite database updated. (Woohoo!)')
+    return summary
+
+def _row_hashes(frame, key):
+    """
+    Helper function to hash the content of each row of a processed dataframe.
+
+    Values are hashed by their text form, so the hashes do not depend on
+    how pandas inferred each column's dtype.
+
+    :param frame: processed collisions or buildings dataframe
+    :param key: name of the id column ('c_id' or 'b_id')
+    :return: pandas Series of int64 row hashes indexed by id
+    """
+    hashes = pd.util.hash_pandas_object(frame.astype(str), index=False)
+    return pd.Series(hashes.values.view('int64'), index=frame[key].values)
+
+def _changed_ids(hashes, old_hashes):
+    """
+    Helper function to list ids that are new or whose row hash has changed.
+
+    :param hashes: current row hashes indexed by id
+    :param old_hashes: row hashes from the manifest indexed by id
+    :return: list of ids
+    """
+    old = old_hashes.reindex(hashes.index)
+    return hashes.index[old.isnull().values | (old.values != hashes.values)].tolist()
+
+def _delete_pairs(conn, column, ids):
+    """
+    Helper function to delete collidium_pairs rows for the given ids.
+
+    :param conn: sqlite3 connection
+    :param column: 'b_id' or 'c_id'
+    :param ids: list of ids whose pairs are deleted
+    :return: number of deleted rows
+    """
+    deleted = 0
+    for start in range(0, len(ids), 500):
+        chunk = [int(x) for x in ids[start:start + 500]]
+        cursor = conn.execute('DELETE FROM collidium_pairs WHERE %s IN (%s)' % (
+            column, ','.join('?'*len(chunk))), chunk)
+        deleted += cursor.rowcount
+    return deleted
+
+def _paired_b_ids(conn, c_ids):
+    """
+    Helper function to list the buildings paired with the given collisions.
+
+    :param conn: sqlite3 connection
+    :param c_ids: list of collision ids
+    :return: list of building ids
+    """
+    b_ids = set()
+    for start in range(0, len(c_ids), 500):
+        chunk = [int(x) for x in c_ids[start:start + 500]]
+        b_ids.update(b_id for b_id, in conn.execute(
+            'SELECT DISTINCT b_id FROM collidium_pairs WHERE c_id IN (%s)' %
+            ','.join('?'*len(chunk)), chunk))
+    return list(b_ids)
+
+def _create_collidium_table(conn, pairs, without_rowid=True):
+    """
+    Helper function to (re)create the star schema tables with their typed
+    schemas and indexes, the category_codes table and the collidium_data
+    view, and fill the tables with pairs, inside the connection's current
+    transaction.
+
+    :param conn: sqlite3 connection
+    :param pairs: collidium dataframe with day number date columns
+    :param without_rowid: if True, create collidium_pairs WITHOUT ROWID
+    """
+    for name in ['collidium_data', 'category_codes'] + [table for table, _ in STAR_TABLES]:
+        _drop_object(conn, name)
+    conn.execute('CREATE TABLE category_codes (name TEXT, code INTEGER, label TEXT, '
+                 'PRIMARY KEY (name, code))')
+    conn.executemany('INSERT INTO category_codes (name, code, label) VALUES (?, ?, ?)',
+                     [(name, code, label) for name, labels in CATEGORY_LABELS.items()
+                      for code, label in enumerate(labels, 1)])
+    for table, schema in STAR_TABLES:
+        key = ', PRIMARY KEY (b_id, c_id)' if table == 'collidium_pairs' else ''
+        conn.execute('CREATE TABLE %s (%s%s)%s' % (
+            table, ', '.join('%s %s' % column for column in schema), key,
+            ' WITHOUT ROWID' if key and without_rowid else ''))
+    _insert_pairs(conn, pairs)
+    for name, (table, columns) in STAR_INDEXES.items():
+        conn.execute('CREATE INDEX %s ON %s (%s)' % (name, table, ', '.join(columns)))
+    conn.execute('CREATE VIEW collidium_data AS SELECT %s FROM collidium_pairs '
+                 'JOIN buildings USING (b_id) JOIN collisions USING (c_id)' %
+                 ', '.join(_view_column(column) for column, _ in COLLIDIUM_SCHEMA))
+
+def _view_column(column):
+    """
+    Helper function returning the collidium_data view expression of a
+    column: the label of its code for categorical columns.
+
+    :param column: name of a COLLIDIUM_SCHEMA column
+    :return: sqlite expression
+    """
+    if column not in CATEGORY_LABELS:
+        return column
+    table = [name for name, schema in STAR_TABLES if column in dict(schema)][0]
+    return ("(SELECT label FROM category_codes WHERE name = '%s' AND code = %s.%s) AS %s" %
+            (column, table, column, column))
+
+def _drop_object(conn, name):
+    """
+    Helper function to drop a table or view, whichever it is, if it exists.
+
+    :param conn: sqlite3 connection
+    :param name: name of the table or view
+    """
+    row = conn.execute('SELECT type FROM sqlite_master WHERE name = ? '
+                       "AND type IN ('table', 'view')", (name,)).fetchone()
+    if row is not None:
+        conn.execute('DROP %s %s' % (row[0].upper(), name))
+
+def _prune_dimensions(conn):
+    """
+    Helper function to delete the buildings and collisions that no longer
+    have any pairs, inside the connection's current transaction.
+
+    :param conn: sqlite3 connection
+    """
+    conn.execute('DELETE FROM buildings WHERE b_id NOT IN (SELECT b_id FROM collidium_pairs)')
+    conn.execute('DELETE FROM collisions WHERE c_id NOT IN (SELECT c_id FROM collidium_pairs)')
+
+def _duration_bucket_sql(window=COLLIDIUM_WINDOW):
+    """
+    Helper function returning a sqlite expression for the shortest duration
+    (in months, 1 to window) whose CollidiumQuery duration filter counts a
+    pair. Pairs that are only counted with no duration filter get window.
+
+    :param window: the window in months of the collidium data
+    :return: sqlite CASE expression on coll_days_from_build
+    """
+    cases = ''.join('WHEN coll_days_from_build BETWEEN 0 AND %d OR '
+                    'coll_days_from_build BETWEEN %d AND -1 THEN %d ' % (
+                        30.4167*months, -30.4167*months, months)
+                    for months in range(1, window))
+    return 'CASE %sELSE %d END' % (cases, window)
+
+def _create_rollup(conn, window=COLLIDIUM_WINDOW):
+    """
+    Helper function to (re)build the collidium_rollup table from the
+    buildings and collidium_pairs tables, inside the connection's current
+    transaction.
+
+    :param conn: sqlite3 connection
+    :param window: the window in months of the collidium data
+    """
+    conn.execute('DROP TABLE IF EXISTS collidium_rollup')
+    conn.execute('CREATE TABLE collidium_rollup AS ' + _rollup_select(window))
+    conn.execute('CREATE INDEX collidium_rollup_idx ON collidium_rollup (%s)' %
+                 ', '.join(ROLLUP_INDEX))
+
+def _update_rollup(conn, b_ids, window=COLLIDIUM_WINDOW):
+    """
+    Helper function to rebuild the collidium_rollup rows of the given
+    buildings from the buildings and collidium_pairs tables, inside the
+    connection's current transaction.
+
+    :param conn: sqlite3 connection
+    :param b_ids: list of building ids whose pairs have changed
+    :param window: the window in months of the collidium data
+    """
+    for start in range(0, len(b_ids), 500):
+        chunk = [int(x) for x in b_ids[start:start + 500]]
+        where = 'WHERE b_id IN (%s) ' % ','.join('?'*len(chunk))
+        conn.execute('DELETE FROM collidium_rollup ' + where, chunk)
+        conn.execute('INSERT INTO collidium_rollup ' + _rollup_select(window, where), chunk)
+
+def _rollup_select(window=COLLIDIUM_WINDOW, where=''):
+    """
+    Helper function returning the query of the collidium_rollup rows, from
+    the pairs matching a WHERE clause on the collidium_pairs and buildings
+    join.
+
+    :param window: the window in months of the collidium data
+    :param where: (optional) WHERE clause of the pairs, e.g. on b_id
+    :return: sqlite SELECT statement
+    """
+    keys = ', '.join(ROLLUP_KEYS)
+    return ('SELECT %s, radius_bucket, duration_bucket, '
+            'SUM(coll_before) AS coll_before, SUM(coll_during) AS coll_during, '
+            'SUM(coll_after) AS coll_after '
+            'FROM (SELECT *, CAST(radius/%d AS INTEGER)*%d AS radius_bucket, '
+            '%s AS duration_bucket FROM collidium_pairs JOIN buildings USING (b_id) %s) '
+            'GROUP BY %s, radius_bucket, duration_bucket' % (
+                keys, ROLLUP_RADIUS_STEP, ROLLUP_RADIUS_STEP,
+                _duration_bucket_sql(window), where, keys))
+
+def _finish_build(conn, page_size=None):
+    """
+    Helper function to gather ANALYZE statistics after a full build and,
+    if requested, rebuild the database file with a new page size.
+
+    :param conn: sqlite3 connection
+    :param page_size: (optional) sqlite page size in bytes
+    """
+    conn.execute('ANALYZE')
+    conn.commit()
+    if page_size is not None:
+        conn.execute('PRAGMA page_size = %d' % int(page_size))
+        conn.execute('VACUUM')
+
+def _insert_pairs(conn, pairs):
+    """
+    Helper function to insert pairs into the collidium_pairs table, and
+    their buildings and collisions into the buildings and collisions tables
+    (replacing the rows already there), with the codes of their categorical
+    columns, inside the connection's current transaction.
+
+    :param conn: sqlite3 connection
+    :param pairs: collidium dataframe with day number date columns
+    """
+    pairs = _encode_categories(conn, pairs)
+    for table, schema in STAR_TABLES:
+        columns = [column for column, _ in schema]
+        rows = pairs[columns]
+        if table != 'collidium_pairs':
+            rows = rows.drop_duplicates(columns[0])
+        conn.executemany('INSERT OR REPLACE INTO %s (%s) VALUES (%s)' % (
+            table, ', '.join(columns), ', '.join('?'*len(columns))),
+                         rows.astype(object).values.tolist())
+
+def _encode_categories(conn, pairs):
+    """
+    Helper function to replace the labels of the categorical columns of
+    pairs with their codes in the category_codes table, adding codes for
+    new labels, inside the connection's current transaction.
+
+    :param conn: sqlite3 connection
+    :param pairs: collidium dataframe with string or categorical labels
+    :return: copy of pairs with integer codes (None for missing labels)
+    """
+    pairs = pairs.copy(deep=False)
+    for name in CATEGORY_LABELS:
+        values = pd.Categorical(pairs[name])
+        codes = dict(conn.execute('SELECT label, code FROM category_codes WHERE name = ?',
+                                  (name,)).fetchall())
+        new = {label: code for code, label in enumerate(
+            [label for label in values.categories if label not in codes],
+            max(codes.values(), default=0) + 1)}
+        conn.executemany('INSERT INTO category_codes (name, code, label) VALUES (?, ?, ?)',
+                         [(name, code, label) for label, code in new.items()])
+        codes.update(new)
+        # Code -1 (a missing label) takes the last element, None
+        lookup = np.array([codes[label] for label in values.categories] + [None], dtype=object)
+        pairs[name] = lookup[values.codes]
+    return pairs
+
+def _sql_frame(pairs):
+    """
+    Helper function to convert the date columns of a collidium dataframe
+    (dates or date strings) to integer day numbers since 1970-01-01, and
+    add the b_build_days column (the building period in days, at least 1).
+
+    :param pairs: collidium dataframe (from create_collidium_table, or read
+    from the collidium_data CSV file or column store)
+    :return: copy of pairs with day number date columns
+    """
+    pairs = pairs.copy()
+    for column in DATE_COLUMNS:
+        dates = pd.to_datetime(pairs[column]).values.astype('datetime64[D]')
+        pairs[column] = dates.astype(np.int64)
+    # Buildings finished on the day they were started count one day of exposure
+    pairs['b_build_days'] = (pairs['b_end_dt'] - pairs['b_start_dt']).clip(lower=1)
+    return pairs
+
+def _table_columns(conn, table):
+    """
+    Helper function to list the columns of a table.
+
+    :param conn: sqlite3 connection
+    :param table: name of the table
+    :return: list of column names, empty if there is no table
+    """
+    return [row[1] for row in conn.execute('PRAGMA table_info(%s)' % table)]
+
+def _read_manifest(conn):
+    """
+    Helper function to read the build manifest from the database.
+
+    :param conn: sqlite3 connection
+    :return: tuple of (collision hashes, building hashes) Series indexed by
+    id, or (None, None) if the database has no manifest
+    """
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table'")]
+    if 'build_manifest' not in tables or 'collidium_pairs' not in tables:
+        return None, None
+    manifest = pd.read_sql('SELECT kind, id, hash FROM build_manifest', conn)
+    colls = manifest[manifest['kind'] == 'c']
+    builds = manifest[manifest['kind'] == 'b']
+    return (pd.Series(colls['hash'].values, index=colls['id'].values),
+            pd.Series(builds['hash'].values, index=builds['id'].values))
+
+def _write_manifest(conn, coll_hashes, build_hashes):
+    """
+    Helper function to replace the build manifest in the database, inside
+    the connection's current transaction.
+
+    The build_manifest table holds one (kind, id, hash) row per collision
+    (kind 'c') and building (kind 'b'). The build_info table holds the time
+    of the last build.
+
+    :param conn: sqlite3 connection
+    :param coll_hashes: collision row hashes indexed by c_id
+    :param build_hashes: building row hashes indexed by b_id
+    """
+    conn.execute('CREATE TABLE IF NOT EXISTS build_manifest '
+                 '(kind TEXT, id INTEGER, hash INTEGER)')
+    conn.execute('CREATE TABLE IF NOT EXISTS build_info (key TEXT PRIMARY KEY, value TEXT)')
+    conn.execute('DELETE FROM build_manifest')
+    for kind, hashes in (('c', coll_hashes), ('b', build_hashes)):
+        conn.executemany('INSERT INTO build_manifest (kind, id, hash) VALUES (?, ?, ?)',
+                         zip([kind]*len(hashes), hashes.index.astype(object).tolist(),
+                             hashes.values.astype(object).tolist()))
+    conn.execute('INSERT OR REPLACE INTO build_info (key, value) VALUES (?, ?)',
+                 ('built_at', datetime.now().isoformat()))
+
+def _read_build_limits(conn):
+    """
+    Helper function to read the radius and window the collidium data was
+    built with. Databases built before the limits were configurable have
+    the default limits.
+
+    :param conn: sqlite3 connection
+    :return: tuple of (radius in feet, window in months)
+    """
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table'")]
+    limits = {}
+    if 'build_info' in tables:
+        limits = dict(conn.execute("SELECT key, value FROM build_info "
+                                   "WHERE key IN ('radius', 'window')").fetchall())
+    radius = float(limits.get('radius', COLLIDIUM_RADIUS))
+    return (int(radius) if radius.is_integer() else radius,
+            int(limits.get('window', COLLIDIUM_WINDOW)))
+
+def _write_build_limits(conn, radius, window):
+    """
+    Helper function to store the radius and window of the collidium data in
+    the build_info table, inside the connection's current transaction.
+
+    :param conn: sqlite3 connection
+    :param radius: radius in feet
+    :param window: window in months
+    """
+    conn.execute('CREATE TABLE IF NOT EXISTS build_info (key TEXT PRIMARY KEY, value TEXT)')
+    conn.executemany('INSERT OR REPLACE INTO build_info (key, value) VALUES (?, ?)',
+                     [('radius', str(radius)), ('window', str(window))])
@@ -0,0 +1,274 @@
+"""
+COLLIDIUM
+Column Query Engine Module
+
+The column_engine module answers CollidiumQuery queries in process, from
+memory mapped numpy arrays of the columns of the collidium_data view that
+the queries read, as an alternative to running them in SQLite (see the
+backend argument of query_table in the interactions_functionality module).
+
+export_columns writes the arrays next to the database, to a
+'<database>.columns' folder of two column stores (see the column_store
+module in build_data_libraries):
+ - pairs: one row per building/collision pair, with the building's code
+   (its position in buildings), radius, base_year, coll_days_from_build,
+   dictionary encoded b_category, c_severity and c_type, and the
+   coll_before, coll_during and coll_after counts
+ - buildings: b_id, b_lat, b_long and b_build_days of each building, in
+   b_id order
+
+A query is evaluated with boolean masks over the pairs arrays, and the
+before/during/after sums are grouped by building with np.bincount (the
+during sums are normalized by b_build_days as in the SQL queries). The
+result frame is the same as the one generate_table returns for the
+query's get_qstring query: the RESULT_SCHEMA columns, one row per
+building in b_id order, or an empty frame if no building matches.
+
+Engines are kept per folder (see get_engine), and reloaded when the folder
+is exported again. The folder records the version (modification time and
+size) of the database it was exported from, in SOURCE_FILE, and get_engine
+refuses to serve queries from a folder whose database has changed since
+(e.g. after table_builder.update_table), until it is exported again.
+
+Exceptions (ValueError) are raised if the database or column folder paths
+are not valid, or if the column folder is older than its database.
+"""
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+#pylint: disable=import-error
+from build_data_libraries import column_store
+from query_class import RESULT_SCHEMA
+
+# Folder suffix of the column arrays exported from a database
+COLUMNS_SUFFIX = '.columns'
+# Columns of the pairs arrays read by queries, and the dictionary encoded ones
+PAIR_COLUMNS = ['radius', 'base_year', 'coll_days_from_build', 'b_category',
+                'c_severity', 'c_type', 'coll_before', 'coll_during', 'coll_after']
+CODED_COLUMNS = ['b_category', 'c_severity', 'c_type']
+# File of a column folder holding the path and version of its database
+SOURCE_FILE = 'source.json'
+
+def columns_path(data_directory):
+    """
+    Returns the column folder path of a database.
+    """
+    return str(data_directory) + COLUMNS_SUFFIX
+
+def version_file(path):
+    """
+    Returns the file of a column folder that is rewritten by every export,
+    whose modification time versions the folder (e.g. for QueryCache).
+    """
+    return os.path.join(str(path), 'pairs', column_store.META_FILE)
+
+def _database_version(data_directory):
+    """
+    Returns the version (modification time and size) of a database file as
+    a list, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(str(data_directory))
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def export_columns(data_directory, path=None):
+    """
+    Exports the columns of a database's collidium_data view read by
+    CollidiumQuery queries as memory mappable arrays.
+
+    Args:
+        data_directory(str): path to the Collidium database
+        path(str): (optional) column folder to write, by default
+            columns_path(data_directory)
+
+    Returns:
+        path of the column folder
+
+    Raises:
+        ValueError: If data_directory is not a valid path.
+    """
+    if not os.path.exists(str(data_directory)):
+        raise ValueError(str(data_directory) + " is not a valid path")
+    path = columns_path(data_directory) if path is None else path
+    version = _database_version(data_directory)
+    uri = pathlib.Path(os.path.abspath(str(data_directory))).as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True)
+    pairs = pd.read_sql('SELECT b_id, b_lat, b_long, b_build_days, %s FROM collidium_data '
+                        'ORDER BY b_id' % ', '.join(PAIR_COLUMNS), conn)
+    conn.close()
+    codes, b_ids = pd.factorize(pairs['b_id'], sort=True)
+    first = np.searchsorted(pairs['b_id'].values, b_ids)
+    buildings = pd.DataFrame({'b_id': b_ids.values.astype(np.int64),
+                              'b_lat': pairs['b_lat'].values[first],
+                              'b_long': pairs['b_long'].values[first],
+                              'b_build_days': pairs['b_build_days'].values[first]})
+    pairs = pairs[PAIR_COLUMNS].assign(b_code=codes.astype(np.int32))
+    for column in ['base_year', 'coll_days_from_build', 'coll_before', 'coll_during',
+                   'coll_after']:
+        values = pairs[column].values
+        if values.size:
+            pairs[column] = values.astype(np.result_type(np.min_scalar_type(values.min()),
+                                                         np.min_scalar_type(values.max())))
+    column_store.write_frame(buildings, os.path.join(path, 'buildings'))
+    column_store.write_frame(pairs, os.path.join(path, 'pairs'))
+    with open(os.path.join(path, SOURCE_FILE), 'w') as source:
+        json.dump({'database': os.path.abspath(str(data_directory)), 'version': version},
+                  source)
+    return path
+
+class ColumnEngine(object):
+    """
+    Column Query Engine Class
+
+    Holds the memory mapped arrays of one column folder (written by
+    export_columns) and answers CollidiumQuery queries from them.
+
+    Attributes:
+      path:
+        - Description: Path to the column folder
+      buildings:
+        - Description: Number of buildings
+      database, database_version:
+        - Description: Path and version of the database the folder was
+          exported from (None for folders exported without them)
+
+    Class Methods:
+        - query returns the results of a CollidiumQuery object's query
+        - is_current checks whether the database has changed since
+
+    Raises ValueError if path is not a column folder.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor method for ColumnEngine object.
+
+        Args:
+          path: (str) path to a column folder written by export_columns
+        """
+        if not column_store.is_column_store(os.path.join(str(path), 'pairs')):
+            raise ValueError(str(path) + " is not a valid column folder")
+        self.path = path
+        self.database = self.database_version = None
+        if os.path.exists(os.path.join(str(path), SOURCE_FILE)):
+            with open(os.path.join(str(path), SOURCE_FILE)) as source:
+                exported = json.load(source)
+            self.database, self.database_version = exported['database'], exported['version']
+        buildings = column_store.read_frame(os.path.join(path, 'buildings'))
+        pairs = column_store.read_frame(os.path.join(path, 'pairs'))
+        self.__b_id = buildings['b_id'].values
+        self.__b_lat = buildings['b_lat'].values
+        self.__b_long = buildings['b_long'].values
+        self.__b_build_days = buildings['b_build_days'].values
+        self.buildings = buildings.shape[0]
+        self.__pairs = {column: pairs[column].values for column in PAIR_COLUMNS + ['b_code']}
+        self.__categories = {}
+        for column in CODED_COLUMNS:
+            self.__categories[column] = list(pairs[column].cat.categories)
+            self.__pairs[column] = pairs[column].cat.codes.values
+
+    def is_current(self):
+        """
+        Returns False if the database the folder was exported from exists
+        and has changed since the export, True otherwise.
+        """
+        if self.database is None:
+            return True
+        version = _database_version(self.database)
+        return version is None or version == self.database_version
+
+    def __coded_mask__(self, column, arg):
+        """
+        Returns the mask of pairs matching a b_category, c_severity or c_type
+        filter, or None if the filter is 'All'.
+        """
+        if not isinstance(arg, list):
+            if arg == 'All':
+                return None
+            arg = [arg]
+        categories = self.__categories[column]
+        codes = [categories.index(value) for value in arg if value in categories]
+        return np.isin(self.__pairs[column], codes)
+
+    def query(self, query_builder):
+        """
+        Returns the results of a CollidiumQuery object's query.
+
+        Args:
+          query_builder: CollidiumQuery object (its rollup attribute is
+            ignored)
+
+        Returns:
+          pandas dataframe with the RESULT_SCHEMA columns, one row per
+          building in b_id order, or an empty dataframe if there are no
+          results (see generate_table)
+
+        Raises:
+          AttributeError if the query's attributes are invalid.
+        """
+        query_builder.get_qstring()
+        pairs = self.__pairs
+        days = pairs['coll_days_from_build']
+        mask = (pairs['radius'] < query_builder.radius) & \
+               (pairs['base_year'] == query_builder.base_year) & \
+               (days >= -query_builder.window_days()) & (days <= query_builder.window_days())
+        for column in CODED_COLUMNS:
+            coded = self.__coded_mask__(column, getattr(query_builder, column))
+            if coded is not None:
+                mask &= coded
+        codes = pairs['b_code'][mask]
+        if codes.size == 0:
+            return pd.DataFrame({'A': []})
+        counts = np.bincount(codes, minlength=self.buildings)
+        found = np.flatnonzero(counts)
+        sums = [np.bincount(codes, weights=pairs[column][mask],
+                            minlength=self.buildings)[found]
+                for column in ['coll_before', 'coll_during', 'coll_after']]
+        columns = [self.__b_id[found], self.__b_lat[found], self.__b_long[found],
+                   np.rint(sums[0]),
+                   sums[1]*float(query_builder.window_days())/self.__b_build_days[found],
+                   np.rint(sums[2])]
+        return pd.DataFrame({name: values.astype(dtype) for (name, dtype), values
+                             in zip(RESULT_SCHEMA, columns)})
+
+# Engines keyed by absolute column folder path, with the folder's version
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+def get_engine(path):
+    """
+    Returns the ColumnEngine of a column folder, loading it on first use and
+    again whenever the folder has been exported since. Folders whose
+    database has changed since they were exported are refused.
+
+    Args:
+        path(str): path to a column folder written by export_columns
+
+    Returns:
+        ColumnEngine object
+
+    Raises:
+        ValueError: If path is not a column folder, or the folder's database
+            has changed since the folder was exported.
+    """
+    key = os.path.abspath(str(path))
+    meta = version_file(key)
+    version = os.stat(meta).st_mtime_ns if os.path.exists(meta) else None
+    with _ENGINES_LOCK:
+        cached = _ENGINES.get(key)
+    if cached is not None and cached[0] == version:
+        engine = cached[1]
+    else:
+        engine = ColumnEngine(path)
+        with _ENGINES_LOCK:
+            _ENGINES[key] = (version, engine)
+    if not engine.is_current():
+        raise ValueError(str(path) + " is older than its database " + engine.database +
+                         "; export the columns again (see export_columns)")
+    return engine
@@ -7,16 +7,35 @@ side, one showing the number of collions before buildings were constructed,
 another shows collisions that occured during construction and a third shows
 collisions after construction ended.
 
-This module contains two functions including:
+This module contains the following functions:
 
     create_map: creates map and plots the location of building permits on it
     with the size of each dot corresponding to the number of collisions that
-    occured near that building
+    occured near that building. Marker colors, sizes and popups are computed
+    for all buildings at once with array operations, and the markers are
+    added to the map as a single CircleMarkerLayer, which writes them out as
+    one compact JSON array drawn by a short script instead of one block of
+    javascript per marker. When there are more than MAX_MARKERS buildings,
+    the zoomed out views (below DETAIL_ZOOM) draw them binned into a grid
+    (see aggregate_grid) with cells sized so that at most MAX_MARKERS
+    markers are drawn, one per cell, and the zoomed in views draw each
+    building, so the map stays fast to pan at the city scale and still
+    shows individual buildings once zoomed in.
+
+    aggregate_grid: bins buildings into a latitude/longitude grid and sums
+    their collisions per cell.
 
     place_maps: renders three maps (created using create_map function) and
     places them side by side next to each other. It creates one map for each
     time period including before construction, during construction and after
-    construction.
+    construction. The data is validated, binned and styled once, by
+    marker_data, and shared by the three maps.
+
+    marker_data: validates the data and computes the marker locations,
+    colors, radii and popups of all three periods in one pass, as one
+    marker layer per range of zoom levels.
+
+    draw_map: creates the map of one period from the output of marker_data.
 
 This module raises the following exceptions:
 
@@ -28,7 +47,10 @@ This module raises the following exceptions:
     passed as the second argument to create_map then a KeyError is raised.
 """
 
+import json
 import branca
+from branca.element import MacroElement
+from jinja2 import Template
 import folium
 import numpy as np
 
@@ -40,6 +62,183 @@ HIGH_DETAIL_TILE = 'OpenStreetMap'
 LOW_DETAIL_TILE = 'Mapbox Bright'
 SEATTLE_COORDS = [47.6062, -122.3321]
 RADIUS_ADJUSTMENT = 20
+# Maximum number of markers drawn on a map below DETAIL_ZOOM. Larger datasets
+# are binned into a grid at those zoom levels.
+MAX_MARKERS = 800
+# Zoom level from which every building is drawn, whatever the number of buildings
+DETAIL_ZOOM = 14
+# Factor the grid cell size grows by until at most MAX_MARKERS cells are used
+GRID_GROWTH = 1.25
+# Periods drawn by place_maps, in map order
+PERIODS = ['before', 'during', 'after']
+# Fields the input data must have
+DATA_FIELDS = set(['b_lat', 'after', 'before', 'b_id', 'b_long', 'during'])
+# Marker colors, indexed by the color codes of marker_data
+MARKER_COLORS = [GREEN, RED, BLUE]
+# Leaflet circle marker options shared by every marker (folium's defaults)
+MARKER_OPTIONS = {'bubblingMouseEvents': True, 'dashArray': None, 'dashOffset': None,
+                  'fill': True, 'fillOpacity': 0.2, 'fillRule': 'evenodd', 'lineCap': 'round',
+                  'lineJoin': 'round', 'opacity': 1.0, 'stroke': True, 'weight': 3}
+
+class CircleMarkerLayer(MacroElement):
+    """
+    Map layer drawing the markers of one period (see marker_data).
+
+    The layer is written to the map's html as a single JSON object of marker
+    arrays and a short script that adds each marker to a leaflet feature
+    group. The group is only shown at the layer's zoom levels. A marker that
+    stands for a grid cell of several buildings (see aggregate_grid) has the
+    number of buildings in its popup.
+
+    Args:
+    markers: one of the layer dicts returned by marker_data
+    period (str): String of value "before", "during" or "after"
+
+    Raises:
+        KeyError: If period is not "before", "during", or "after".
+    """
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+            var {{this.get_name()}} = L.featureGroup();
+            (function (map, group, markers, options, colors, zooms) {
+                for (var i = 0; i < markers.lat.length; i++) {
+                    var color = colors[markers.color[i]];
+                    L.circleMarker([markers.lat[i], markers.long[i]], Object.assign(
+                        {radius: markers.radius[i], color: color, fillColor: color}, options))
+                        .bindPopup(L.popup({maxWidth: '300'}).setContent(
+                            (markers.buildings && markers.buildings[i] > 1 ?
+                             'Buildings: ' + markers.buildings[i] + '<br>' : '') +
+                            'Number of collisions: ' + markers.popup[i]))
+                        .addTo(group);
+                }
+                function show() {
+                    var zoom = map.getZoom();
+                    if ((zooms[0] === null || zoom >= zooms[0]) &&
+                        (zooms[1] === null || zoom <= zooms[1])) {
+                        group.addTo(map);
+                    } else {
+                        group.remove();
+                    }
+                }
+                map.on('zoomend', show);
+                show();
+            })({{this._parent.get_name()}}, {{this.get_name()}}, {{this.markers}},
+               {{this.options}}, {{this.colors}}, {{this.zooms}});
+        {% endmacro %}
+        """)
+
+    def __init__(self, markers, period):
+        super(CircleMarkerLayer, self).__init__()
+        self._name = 'CircleMarkerLayer'
+        if period not in PERIODS:
+            raise KeyError("period should be one of %s" % PERIODS)
+        column = PERIODS.index(period)
+        self.color = markers['color'][:, column]
+        self.radius = markers['radius'][:, column]
+        self.markers = '{%s, "radius": %s, "color": %s, "popup": %s}' % (
+            markers['json'], json.dumps(self.radius.tolist()), json.dumps(self.color.tolist()),
+            json.dumps(markers['popup'][column]))
+        self.min_zoom = markers['min_zoom']
+        self.max_zoom = markers['max_zoom']
+        self.zooms = json.dumps([self.min_zoom, self.max_zoom])
+        self.options = json.dumps(MARKER_OPTIONS)
+        self.colors = json.dumps(MARKER_COLORS)
+
+def marker_data(data):
+    """
+    Validates the data and computes everything the before, during and after
+    maps draw, in one pass over the data: the map center, and the marker
+    locations, colors, radii and popups of all three periods. If there are
+    more than MAX_MARKERS buildings, the markers drawn below DETAIL_ZOOM are
+    grid cells of buildings (see aggregate_grid), and each building is drawn
+    from DETAIL_ZOOM on.
+
+    Colors are green if there were fewer collisions in the period than before
+    construction, red if there were more, and blue otherwise. Radii are the
+    number of collisions per building over RADIUS_ADJUSTMENT.
+
+    Args:
+    data: a non-empty dataframe with the fields listed in create_map
+
+    Returns:
+        dict with the map 'location' and the marker 'layers', a list of
+        dicts (one per range of zoom levels) holding the 'min_zoom' and
+        'max_zoom' the layer is drawn at (None for no bound), the marker
+        'color' codes (indexes into MARKER_COLORS) and 'radius' as arrays
+        with one column per period, 'popup' texts as one list per period,
+        and 'json', the marker locations (and building counts of grid
+        cells) as a JSON fragment.
+
+    Raises:
+        IndexError: If the dataframe does not contain the correct fields.
+    """
+    if not set(list(data)) == DATA_FIELDS:
+        raise IndexError("Data set does not contain correct fields")
+    location = [np.mean(data['b_lat']), np.mean(data['b_long'])]
+    if data.shape[0] <= MAX_MARKERS:
+        return {'location': location, 'layers': [_marker_layer(data, None, None)]}
+    return {'location': location,
+            'layers': [_marker_layer(aggregate_grid(data), None, DETAIL_ZOOM - 1),
+                       _marker_layer(data, DETAIL_ZOOM, None)]}
+
+def _marker_layer(data, min_zoom, max_zoom):
+    """
+    Computes the marker layer dict of marker_data for a dataframe of
+    buildings, or of grid cells with a buildings field (see aggregate_grid),
+    drawn from min_zoom to max_zoom.
+    """
+    if 'buildings' in data:
+        buildings = data['buildings'].values
+    else:
+        buildings = np.ones(data.shape[0], dtype=np.int64)
+    counts = data[PERIODS].values.astype(float)
+    before = counts[:, :1]
+    shared = {'lat': data['b_lat'].values.astype(float).tolist(),
+              'long': data['b_long'].values.astype(float).tolist()}
+    if (buildings > 1).any():
+        shared['buildings'] = buildings.tolist()
+    return {'min_zoom': min_zoom, 'max_zoom': max_zoom,
+            'color': np.select([counts < before, counts > before], [0, 1], 2),
+            'radius': counts/buildings[:, np.newaxis]/RADIUS_ADJUSTMENT,
+            'popup': [[str(count) for count in column]
+                      for column in np.round(counts, 0).T.tolist()],
+            'json': json.dumps(shared)[1:-1]}
+
+def aggregate_grid(data, max_markers=MAX_MARKERS):
+    """
+    Bins buildings into a latitude/longitude grid of square cells, using the
+    smallest cell size (growing by GRID_GROWTH from the data's extent split
+    max_markers ways) for which at most max_markers cells hold buildings.
+
+    Args:
+    data: a dataframe with b_lat, b_long, before, during and after fields
+        (see create_map)
+
+    max_markers (int): Maximum number of grid cells to return
+
+    Returns:
+        A dataframe with one row per grid cell holding buildings, with
+        fields b_lat and b_long (the mean building location in the cell),
+        before, during and after (the sums over the cell's buildings) and
+        buildings (the number of buildings in the cell).
+    """
+    lat = data['b_lat'].values.astype(float)
+    # Scale longitudes so that grid cells are square on the ground
+    long = data['b_long'].values.astype(float)*np.cos(np.radians(np.mean(lat)))
+    extent = max(np.ptp(lat), np.ptp(long), 1e-6)
+    cell = extent/max_markers
+    while True:
+        rows = np.floor((lat - lat.min())/cell).astype(np.int64)
+        cols = np.floor((long - long.min())/cell).astype(np.int64)
+        keys, codes = np.unique(rows*(cols.max() + 1) + cols, return_inverse=True)
+        if len(keys) <= max_markers:
+            break
+        cell *= GRID_GROWTH
+    grid = data[['b_lat', 'b_long', 'before', 'during', 'after']].groupby(codes, sort=False)
+    binned = grid[['b_lat', 'b_long']].mean()
+    binned[['before', 'during', 'after']] = grid[['before', 'during', 'after']].sum()
+    binned['buildings'] = grid.size()
+    return binned.reset_index(drop=True)
 
 def create_map(data, period, map_detail='Low',):
     """
@@ -70,7 +269,9 @@ def create_map(data, period, map_detail='Low',):
         marker corresponds to the number of collisions that happened in the
         period (e.g., before, during or after) identified in the inputs. If
         the user selects filters that eliminate all buildings, an map with no
-        points is returned.
+        points is returned. If there are more than MAX_MARKERS buildings,
+        each marker drawn below DETAIL_ZOOM stands for a grid cell of
+        buildings (see aggregate_grid).
 
     Raises:
         IndexError: If a dataframe is passed to the create_map function or
@@ -81,43 +282,38 @@ def create_map(data, period, map_detail='Low',):
         passed as the second argument to create_map then a KeyError is
         raised.
 
-        ValueError: If input data is too big it is difficult to render in
-        jupyter. If this happens, a ValueError is raised.
+    """
+    if data.empty:
+        return draw_map(None, period, map_detail)
+    return draw_map(marker_data(data), period, map_detail)
+
+def draw_map(markers, period, map_detail='Low'):
+    """
+    Creates a map of the markers of a period, computed by marker_data.
+
+    Args:
+    markers: dict returned by marker_data, or None for a map of Seattle
+        with no markers
+
+    period (str): String of value "before", "during" or "after"
+
+    map_detail(str): 'Low' for a low detail map, otherwise high detail
 
+    Returns:
+        folium map with the period's markers
+
+    Raises:
+        KeyError: If period is not "before", "during", or "after".
     """
     if map_detail == 'Low':
         tile = LOW_DETAIL_TILE
     else:
         tile = HIGH_DETAIL_TILE
-    true_set = set(['b_lat', 'after', 'before', 'b_id', 'b_long', 'during'])
-    my_map = folium.Map(location=SEATTLE_COORDS, zoom_start=ZOOM_START, tiles=tile)
-
-    if not data.empty:
-
-        if not set(list(data)) == true_set:
-            raise IndexError("Data set does not contain correct fields")
-
-        if data.shape[0] > 800:
-            raise TypeError("Please select 800 or fewer observations from dataframe.")
-
-        location = [np.mean(data['b_lat']), np.mean(data['b_long'])]
-        my_map = folium.Map(location=location, zoom_start=ZOOM_START, tiles=tile)
-
-        for index, row in data.iterrows(): #pylint: disable=unused-variable
-            if row[str(period)] < row['before']:
-                fill_color = GREEN
-            elif row[str(period)] > row['before']:
-                fill_color = RED
-            else:
-                fill_color = BLUE
-            folium.CircleMarker(
-                location=[row['b_lat'], row['b_long']],
-                radius=row[str(period)]/RADIUS_ADJUSTMENT,
-                fill=True,
-                popup=str('Number of collisions: '+ str(round(row[str(period)], 0))),
-                color=fill_color,
-                control_scale=True,
-                fill_color=fill_color).add_to(my_map)
+    if markers is None:
+        return folium.Map(location=SEATTLE_COORDS, zoom_start=ZOOM_START, tiles=tile)
+    my_map = folium.Map(location=markers['location'], zoom_start=ZOOM_START, tiles=tile)
+    for layer in markers['layers']:
+        CircleMarkerLayer(layer, period).add_to(my_map)
     return my_map
 
 def place_maps(data, map_detail='Low'):
@@ -167,9 +363,10 @@ def place_maps(data, map_detail='Low'):
                                     '</table></b></big>')
     map_grid.html.add_child(titles)
 
-    map_1 = create_map(data, "before", map_detail)
-    map_2 = create_map(data, "during", map_detail)
-    map_3 = create_map(data, "after", map_detail)
+    markers = None if data.empty else marker_data(data)
+    map_1 = draw_map(markers, "before", map_detail)
+    map_2 = draw_map(markers, "during", map_detail)
+    map_3 = draw_map(markers, "after", map_detail)
 
     loc_1 = map_grid.add_subplot(1, 3, 1)
     loc_2 = map_grid.add_subplot(1, 3, 2)
@@ -0,0 +1,216 @@
+"""
+COLLIDIUM
+Interaction Controller Module
+
+The InteractionController wraps one of the *_interact functions of the
+interactions_functionality module for the notebook's widgets. With plain
+ipywidgets interact, every intermediate widget value runs a full query and
+draws three maps, one after another, so moving a slider queues up maps
+nobody will look at. The controller instead:
+ - debounces input: a call only starts work once no new call has arrived
+   for `delay` seconds
+ - runs the *_interact function on a background thread, so the widgets
+   stay responsive
+ - cancels superseded work: when new input arrives, a query still running
+   for older input is interrupted, and maps finished for older input are
+   dropped instead of drawn
+ - draws only the latest state, in one display area (see show) that is
+   updated in place
+
+Usage in the notebook:
+    controller = InteractionController(radius_interact)
+    widgets.interact(controller, radius_from_building=..., ...)
+    controller.show()
+
+The controller has the same signature as the function it wraps, so it can
+be passed to widgets.interact in its place.
+"""
+import inspect
+import sqlite3
+import threading
+from IPython.display import display
+#pylint: disable=import-error
+import interactions_functionality as int_func
+
+# Seconds without new input before the latest input is drawn
+DEBOUNCE_DELAY = 0.3
+
+class InteractionController(object):
+    """
+    Debounced, Cancellable Interaction Controller Class
+
+    Calls to the controller (e.g. from widgets.interact) are recorded and
+    return at once. The latest call's arguments are passed to the wrapped
+    function on a background thread once the input has been still for
+    delay seconds, and its result is drawn if no newer call arrived while
+    it ran.
+
+    Attributes:
+      function:
+        - Description: The wrapped *_interact function
+      delay:
+        - Description: Debounce delay in seconds
+        - Default Value: DEBOUNCE_DELAY
+      submitted, started, cancelled, dropped, drawn:
+        - Description: Counters of calls, function runs started, runs whose
+          query was interrupted, runs whose result was superseded, and
+          results drawn
+      last_error:
+        - Description: Exception raised by the latest run, or None
+
+    Class Methods:
+        - __call__ records the latest input (same signature as function)
+        - show displays the area the maps are drawn in
+        - wait blocks until all input has been handled
+        - close stops the background thread
+    """
+
+    def __init__(self, function, delay=DEBOUNCE_DELAY, draw=None):
+        """
+        Constructor method for InteractionController object.
+
+        Args:
+          function: callable, e.g. an *_interact function
+          delay: (int or float) debounce delay in seconds
+          draw: (optional) callable drawing a result, by default the
+            display area created by show
+
+        Raises:
+          ValueError if function is not callable or delay is negative.
+        """
+        if not callable(function):
+            raise ValueError("Arg function should be callable.")
+        if not (isinstance(delay, (int, float)) and delay >= 0):
+            raise ValueError("Arg delay should be a non-negative number of seconds.")
+        self.function = function
+        self.delay = delay
+        self.__signature__ = inspect.signature(function)
+        self.__draw = draw
+        self.__handle = None
+        self.submitted = 0
+        self.started = 0
+        self.cancelled = 0
+        self.dropped = 0
+        self.drawn = 0
+        self.last_error = None
+        self.__condition = threading.Condition()
+        self.__generation = 0
+        self.__timer = None
+        self.__ready = None
+        self.__running = None
+        self.__closed = False
+        self.__worker = threading.Thread(target=self.__work, daemon=True)
+        self.__worker.start()
+
+    def __call__(self, *args, **kwargs):
+        """
+        Records the latest input and (re)starts the debounce timer. A query
+        still running for older input is interrupted.
+        """
+        bound = self.__signature__.bind(*args, **kwargs)
+        with self.__condition:
+            self.__generation += 1
+            self.submitted += 1
+            if self.__ready is not None:
+                self.__ready = None
+                self.dropped += 1
+            if self.__timer is not None:
+                self.__timer.cancel()
+            self.__timer = threading.Timer(self.delay, self.__release,
+                                           (self.__generation, bound.args, bound.kwargs))
+            self.__timer.daemon = True
+            self.__timer.start()
+            if self.__running is not None:
+                int_func.interrupt_queries(self.__worker.ident)
+
+    def __release(self, generation, args, kwargs):
+        """
+        Passes input that has been still for delay seconds to the worker.
+        """
+        with self.__condition:
+            if generation == self.__generation and not self.__closed:
+                self.__timer = None
+                self.__ready = (generation, args, kwargs)
+                self.__condition.notify_all()
+
+    def __work(self):
+        """
+        Background thread: runs the function for each released input, and
+        draws the result unless newer input arrived in the meantime.
+        """
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__ready is not None or self.__closed)
+                if self.__closed:
+                    return
+                generation, args, kwargs = self.__ready
+                self.__ready = None
+                self.__running = generation
+                self.started += 1
+            result, error = None, None
+            try:
+                result = self.function(*args, **kwargs)
+            except Exception as err: #pylint: disable=broad-except
+                error = err
+            with self.__condition:
+                current = generation == self.__generation
+                if not current:
+                    if isinstance(error, sqlite3.OperationalError):
+                        self.cancelled += 1
+                    else:
+                        self.dropped += 1
+                else:
+                    self.last_error = error
+            if current:
+                self.__show_result(result if error is None else
+                                   '%s: %s' % (type(error).__name__, error))
+            with self.__condition:
+                self.__running = None
+                self.__condition.notify_all()
+
+    def __show_result(self, result):
+        """
+        Draws a result (or error message) with the draw callable or in the
+        display area.
+        """
+        if self.__draw is not None:
+            self.__draw(result)
+        elif self.__handle is not None:
+            self.__handle.update(result)
+        else:
+            display(result)
+        self.drawn += 1
+
+    def show(self):
+        """
+        Displays the area the latest maps are drawn in. Call it once, e.g.
+        at the end of the notebook cell that calls widgets.interact.
+        """
+        self.__handle = display('Waiting for input...', display_id=True)
+
+    def wait(self, timeout=None):
+        """
+        Blocks until all input has been handled (drawn or dropped).
+
+        Args:
+          timeout: (optional) seconds to wait
+
+        Returns:
+          True (bool) if all input was handled, False on timeout
+        """
+        with self.__condition:
+            return self.__condition.wait_for(
+                lambda: (self.__timer is None and self.__ready is None and
+                         self.__running is None), timeout)
+
+    def close(self):
+        """
+        Stops the background thread. Input not yet handled is dropped.
+        """
+        with self.__condition:
+            self.__closed = True
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+            self.__condition.notify_all()
+        self.__worker.join()
@@ -14,7 +14,31 @@ Module summary:
 Functions:
     generate_connection: This function generates a connection to a sqlite3 database, and
         returns a cursor object that can be used to query the database. It is used
-        within each of the other functions in this module.
+        within each of the other functions in this module. Connections are opened
+        read-only, pooled by database path (one per thread, so widget callbacks on
+        other threads are safe) and reused by later calls while the database file
+        is the one they were opened on.
+
+    close_connections: Closes the pooled connections to a database, or every pooled
+        connection. It is called automatically when the python process exits.
+
+    interrupt_queries: Interrupts the queries running on a thread's pooled connections.
+        The interaction_controller module uses it to cancel superseded queries.
+
+    has_rollup: This function checks whether a database has the pre-aggregated
+        collidium_rollup table. Each "*_interact" function routes its query to the
+        rollup table when it exists.
+
+    build_limits: This function returns the radius and window (in months) the database's
+        building/collision pairs were built with, which bound the radius and duration
+        filters of each "*_interact" function's query. Like has_rollup, it reads the
+        database once per version (modification time and size) of the database file.
+
+    query_table: This function returns the results of a CollidiumQuery object's query
+        as a pandas dataframe, from the module-level QUERY_CACHE when the same query
+        has already been run on the database, and otherwise from generate_table (or,
+        with backend='columns', from the in-process column_engine). Each "*_interact"
+        function fetches its data with it.
 
     generate_table: This function takes input of a database directory and a query. It
         then querys the database, using the query string input and creates a pandas
@@ -79,12 +103,18 @@ Exceptions:
     ValueError: Raised if a user enters an invalid data directory as input
 
 """
+import atexit
 import sqlite3
 import os
+import pathlib
+import threading
+import numpy as np
 import pandas as pd
 #pylint: disable=import-error
 import draw_markers
-from query_class import CollidiumQuery
+import column_engine
+from query_class import CollidiumQuery, RESULT_SCHEMA, MAX_RADIUS, MAX_DURATION
+from query_cache import QueryCache
 
 # Set constants for display options
 BUILDING_CATEGORIES = ['All', 'COMMERCIAL', 'MULTIFAMILY', 'INDUSTRIAL',
@@ -94,13 +124,42 @@ COLLISION_SEVERITY = ['All', 'Property Damage Only', 'Injury', 'Serious Injury',
 COLLISION_TYPE = ['All', 'Vehicle Only', 'Bike/Pedestrian']
 TILES = ['Low', 'High']
 
-def generate_connection(data_directory):
+# Pragmas set on each pooled connection: map up to 256 MB of the database file
+# into memory, and keep up to 64 MB of pages cached (negative sizes are in KiB)
+CONNECTION_PRAGMAS = {'mmap_size': 256*2**20, 'cache_size': -64*2**10}
+
+# Prepared statements kept by each pooled connection. CollidiumQuery
+# statements have a few hundred shapes at most (see get_statement).
+STATEMENT_CACHE_SIZE = 512
+
+# Pooled connections keyed by (absolute database path, immutable, thread id),
+# with the (device, inode) of the database file each was opened on
+_CONNECTIONS = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+# has_rollup and build_limits results keyed by absolute database path, with
+# the version (modification time, size) of the database file they were read from
+_DATABASE_INFO = {}
+_DATABASE_INFO_LOCK = threading.Lock()
+
+def generate_connection(data_directory, immutable=False):
     """
     This function generates a sqlite3 connection with a database
 
+    The connection is opened read-only and kept in a module-level pool, so
+    later calls for the same database from the same thread reuse it. Each
+    thread gets its own connection. A pooled connection is closed, and a
+    new one opened, once the file at the path has been replaced (e.g. by
+    a database rebuilt to a temporary file and moved into place).
+
     Args:
         data_directory(str): Input with path to database location
 
+        immutable(bool): If True, the database is opened with sqlite's
+            immutable option, which skips all file locking and change
+            detection. Only use it for a database file that will not be
+            rebuilt while it is open.
+
     Returns:
         sql_cursor(cursor object): A sqlite cursor object that allows
         queries to an SQL database
@@ -108,22 +167,213 @@ def generate_connection(data_directory):
     Raises:
         ValueError: If data_directory is not a valid path a value error is raised.
     """
-    if not os.path.exists(str(data_directory)):
+    key = (os.path.abspath(str(data_directory)), bool(immutable), threading.get_ident())
+    try:
+        stat = os.stat(key[0])
+    except OSError:
+        stat = None
+    with _CONNECTIONS_LOCK:
+        entry = _CONNECTIONS.get(key)
+        stale = entry is not None and (stat is None or entry[1] != (stat.st_dev, stat.st_ino))
+        if stale:
+            del _CONNECTIONS[key]
+    if stale:
+        entry[0].close()
+        entry = None
+    if stat is None:
         raise ValueError(str((data_directory) +" is not a valid path"))
-    connection = sqlite3.connect(data_directory)
-    sql_cursor = connection.cursor()
+    if entry is None:
+        uri = pathlib.Path(key[0]).as_uri() + '?mode=ro'
+        if immutable:
+            uri += '&immutable=1'
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                     cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma, value in CONNECTION_PRAGMAS.items():
+            connection.execute('PRAGMA %s = %d' % (pragma, value))
+        with _CONNECTIONS_LOCK:
+            entry = _CONNECTIONS.setdefault(key, (connection, (stat.st_dev, stat.st_ino)))
+    sql_cursor = entry[0].cursor()
     return sql_cursor
 
-def generate_table(query, data_directory="data/Collidium"):
+def close_connections(data_directory=None):
+    """
+    Closes pooled database connections. Later calls to generate_connection
+    open new connections.
+
+    Args:
+        data_directory(str): (optional) Path to the database whose connections
+            are closed, e.g. before the database file is replaced. Every pooled
+            connection is closed if it is not given.
+    """
+    path = None if data_directory is None else os.path.abspath(str(data_directory))
+    with _CONNECTIONS_LOCK:
+        keys = [key for key in _CONNECTIONS if path is None or key[0] == path]
+        connections = [_CONNECTIONS.pop(key)[0] for key in keys]
+    for connection in connections:
+        connection.close()
+
+def interrupt_queries(thread_id):
+    """
+    Interrupts the queries running on the pooled connections of a thread,
+    e.g. a background thread running a query whose results are no longer
+    wanted. The interrupted query raises sqlite3.OperationalError in that
+    thread. Connections that are not running a query are not affected.
+
+    Args:
+        thread_id(int): threading.get_ident() of the thread that opened the
+            connections
+    """
+    with _CONNECTIONS_LOCK:
+        connections = [entry[0] for key, entry in _CONNECTIONS.items()
+                       if key[2] == thread_id]
+    for connection in connections:
+        connection.interrupt()
+
+atexit.register(close_connections)
+
+# Number of rows fetched from sqlite at a time by the columnar fetch
+FETCH_BATCH_SIZE = 4096
+
+# Results of the *_interact functions' queries (see query_table)
+QUERY_CACHE = QueryCache()
+
+# Query backends of query_table
+QUERY_BACKENDS = ['sqlite', 'columns']
+
+def _database_info(data_directory):
+    """
+    Returns whether a database has the collidium_rollup table and the limits
+    stored in its build_info table, reading them from the database only when
+    the database file has changed since they were last read.
+
+    Args:
+        data_directory(str): Input with path to database location
+
+    Returns:
+        tuple of has_rollup (bool) and the build_limits dict
+
+    Raises:
+        ValueError: If data_directory is not a valid path a value error is raised.
+    """
+    path = os.path.abspath(str(data_directory))
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise ValueError(str((data_directory) +" is not a valid path"))
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _DATABASE_INFO_LOCK:
+        entry = _DATABASE_INFO.get(path)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    sql_cursor = generate_connection(data_directory)
+    sql_cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                       "AND name IN ('collidium_rollup', 'build_info')")
+    tables = set(name for name, in sql_cursor.fetchall())
+    limits = {}
+    if 'build_info' in tables:
+        sql_cursor.execute("SELECT key, value FROM build_info "
+                           "WHERE key IN ('radius', 'window')")
+        limits = dict(sql_cursor.fetchall())
+    info = ('collidium_rollup' in tables,
+            {'max_radius': int(float(limits.get('radius', MAX_RADIUS))),
+             'max_duration': int(limits.get('window', MAX_DURATION))})
+    with _DATABASE_INFO_LOCK:
+        _DATABASE_INFO[path] = (version, info)
+    return info
+
+def has_rollup(data_directory):
+    """
+    Checks whether a database has the collidium_rollup table (built by the
+    table_builder module), which CollidiumQuery can route queries to. The
+    database is only read again once its file has changed.
+
+    Args:
+        data_directory(str): Input with path to database location
+
+    Returns:
+        True (bool) if the collidium_rollup table exists, False otherwise.
+
+    Raises:
+        ValueError: If data_directory is not a valid path a value error is raised.
+    """
+    return _database_info(data_directory)[0]
+
+def build_limits(data_directory):
+    """
+    Returns the limits of a database's building/collision pairs, stored in
+    its build_info table by the table_builder module, as CollidiumQuery
+    arguments. Databases without stored limits have the default limits.
+    The database is only read again once its file has changed.
+
+    Args:
+        data_directory(str): Input with path to database location
+
+    Returns:
+        dict with the max_radius (int, feet) and max_duration (int, months)
+        CollidiumQuery arguments.
+
+    Raises:
+        ValueError: If data_directory is not a valid path a value error is raised.
+    """
+    return dict(_database_info(data_directory)[1])
+
+def query_table(query_builder, data_directory="data/Collidium", backend='sqlite'):
+    """
+    Returns the results of a CollidiumQuery object's query on a database,
+    using QUERY_CACHE to skip queries that have already been run on the
+    same version of the database.
+
+    Args:
+    query_builder(CollidiumQuery): The query to run
+
+    data_directory(str): Input with path to database location
+
+    backend(str): 'sqlite' to run the query on the database (see generate_table),
+        or 'columns' to evaluate it on the memory mapped column arrays exported
+        from the database by column_engine.export_columns. Both return the same
+        results. The columns must have been exported from the current version
+        of the database.
+
+    Returns: A pandas dataframe with the output of the query (see generate_table)
+
+    Raises:
+        ValueError: If data_directory is not a valid path, backend is not one
+            of QUERY_BACKENDS, or the columns were exported from an earlier
+            version of the database, a value error is raised.
+    """
+    if backend not in QUERY_BACKENDS:
+        raise ValueError("backend should be one of %s" % QUERY_BACKENDS)
+    # Column results are cached by the column folder's version file
+    cache_path = data_directory
+    if backend == 'columns':
+        data_directory = column_engine.columns_path(data_directory)
+        cache_path = column_engine.version_file(data_directory)
+        # Checked before the cache, whose entries outlive changes to the database
+        engine = column_engine.get_engine(data_directory)
+    key = query_builder.get_key()
+    table = QUERY_CACHE.get(cache_path, key)
+    if table is None:
+        if backend == 'columns':
+            table = engine.query(query_builder)
+        else:
+            statement, params = query_builder.get_statement()
+            table = generate_table(statement, data_directory, params)
+        QUERY_CACHE.put(cache_path, key, table)
+    return table
+
+def generate_table(query, data_directory="data/Collidium", params=()):
     """
     Generates a pandas dataframe from the output of a query on a database.
 
     Args:
     query(str): String written as a query for SQLite3, to query the data
-        table called collidium_data, located in the data_directory
+        Collidium tables (e.g. collidium_data), located in the data_directory
 
     data_directory(str): Input with path to database location
 
+    params(tuple): Values bound to the query's ? parameters, e.g. from
+        CollidiumQuery.get_statement
+
     Returns: A pandas dataframe with the output of the query, incuding
         field names. If the query had no results and empty dataframe is
         returned.
@@ -132,17 +382,65 @@ def generate_table(query, data_directory="data/Collidium"):
         ValueError: If data_directory is not a valid path a value error is raised.
 
     """
-    if not os.path.exists(str(data_directory)):
-        raise ValueError(str((data_directory) +" is not a valid path"))
     sql_cursor = generate_connection(data_directory)
-    sql_cursor.execute(query)
-    temp = pd.DataFrame(sql_cursor.fetchall())
+    sql_cursor.execute(query, params)
+    columns = list(map(lambda x: x[0], sql_cursor.description))
+    if columns == [name for name, _ in RESULT_SCHEMA]:
+        temp = fetch_columnar(sql_cursor, RESULT_SCHEMA)
+    else:
+        temp = pd.DataFrame(sql_cursor.fetchall())
+        if temp.size != 0:
+            temp.columns = columns
     if temp.size == 0:
         temp = pd.DataFrame({'A' : []})
-    else:
-        temp.columns = list(map(lambda x: x[0], sql_cursor.description))
     return temp
 
+def fetch_columnar(sql_cursor, schema, batch_size=FETCH_BATCH_SIZE):
+    """
+    Fetches the rows of an executed query into a pandas dataframe with one
+    typed numpy array per column, without building a list of every row.
+
+    Rows are fetched batch_size at a time, converted to a numpy record array
+    and copied into per-column arrays that grow by doubling. Integer columns
+    that hold NULL values are changed to float columns (with NULL as NaN),
+    as pandas does when building a dataframe from rows.
+
+    Args:
+        sql_cursor(cursor object): A sqlite cursor with an executed query
+
+        schema(list): (column name, numpy dtype) tuples of the query's columns
+
+        batch_size(int): Number of rows fetched at a time
+
+    Returns: A pandas dataframe of the query results, with the schema's columns
+    """
+    dtype = np.dtype(schema)
+    arrays = {name: np.empty(batch_size, dtype=dtype[name]) for name in dtype.names}
+    size = 0
+    while True:
+        rows = sql_cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        try:
+            batch = np.array(rows, dtype=dtype)
+        except TypeError:
+            nulls = [name for i, name in enumerate(dtype.names) if dtype[name].kind == 'i'
+                     and any(row[i] is None for row in rows)]
+            dtype = np.dtype([(name, 'float64' if name in nulls else dtype[name])
+                              for name in dtype.names])
+            arrays = {name: array.astype(dtype[name]) for name, array in arrays.items()}
+            batch = np.array(rows, dtype=dtype)
+        if size + len(batch) > len(arrays[dtype.names[0]]):
+            capacity = max(2*len(arrays[dtype.names[0]]), size + len(batch))
+            for name in dtype.names:
+                grown = np.empty(capacity, dtype=dtype[name])
+                grown[:size] = arrays[name][:size]
+                arrays[name] = grown
+        for name in dtype.names:
+            arrays[name][size:size + len(batch)] = batch[name]
+        size += len(batch)
+    return pd.DataFrame({name: arrays[name][:size] for name in dtype.names})
+
 def build_type_interact(building_category, map_detail='Low', data_directory="data/Collidium"):
     """
     Queries database and returns maps based on data filtered by building type.
@@ -163,12 +461,10 @@ def build_type_interact(building_category, map_detail='Low', data_directory="dat
     Raises:
         ValueError: If data_directory is not a valid path a value error is raised.
     """
-    if not os.path.exists(str(data_directory)):
-        raise ValueError(str((data_directory) +" is not a valid path"))
-    query_builder = CollidiumQuery()
+    query_builder = CollidiumQuery(rollup=has_rollup(data_directory),
+                                   **build_limits(data_directory))
     query_builder.set_b_category(building_category)
-    whole_query = query_builder.get_qstring()
-    mapping_data = generate_table(whole_query, data_directory)
+    mapping_data = query_table(query_builder, data_directory)
     return draw_markers.place_maps(mapping_data, map_detail=map_detail)
 
 def year_int_interact(building_year, collision_interval, map_detail='Low',
@@ -193,13 +489,11 @@ def year_int_interact(building_year, collision_interval, map_detail='Low',
     Raises:
         ValueError: If data_directory is not a valid path a value error is raised.
     """
-    if not os.path.exists(str(data_directory)):
-        raise ValueError(str((data_directory) +" is not a valid path"))
-    query_builder = CollidiumQuery()
+    query_builder = CollidiumQuery(rollup=has_rollup(data_directory),
+                                   **build_limits(data_directory))
     query_builder.set_base_year(building_year)
     query_builder.set_duration(collision_interval)
-    whole_query = query_builder.get_qstring()
-    mapping_data = generate_table(whole_query, data_directory)
+    mapping_data = query_table(query_builder, data_directory)
     return draw_markers.place_maps(mapping_data, map_detail=map_detail)
 
 def collision_severity_interact(collision_severity, map_detail='Low',
@@ -222,12 +516,10 @@ def collision_severity_interact(collision_severity, map_detail='Low',
     Raises:
         ValueError: If data_directory is not a valid path a value error is raised.
     """
-    if not os.path.exists(str(data_directory)):
-        raise ValueError(str((data_directory) +" is not a valid path"))
-    query_builder = CollidiumQuery()
+    query_builder = CollidiumQuery(rollup=has_rollup(data_directory),
+                                   **build_limits(data_directory))
     query_builder.set_c_severity(collision_severity)
-    whole_query = query_builder.get_qstring()
-    mapping_data = generate_table(whole_query, data_directory)
+    mapping_data = query_table(query_builder, data_directory)
     return draw_markers.place_maps(mapping_data, map_detail=map_detail)
 
 def collision_type_interact(collision_type, map_detail='Low', data_directory="data/Collidium"):
@@ -249,12 +541,10 @@ def collision_type_interact(collision_type, map_detail='Low', data_directory="da
     Raises:
         ValueError: If data_directory is not a valid path a value error is raised.
     """
-    if not os.path.exists(str(data_directory)):
-        raise ValueError(str((data_directory) +" is not a valid path"))
-    query_builder = CollidiumQuery()
+    query_builder = CollidiumQuery(rollup=has_rollup(data_directory),
+                                   **build_limits(data_directory))
     query_builder.set_c_type(collision_type)
-    whole_query = query_builder.get_qstring()
-    mapping_data = generate_table(whole_query, data_directory)
+    mapping_data = query_table(query_builder, data_directory)
     return draw_markers.place_maps(mapping_data, map_detail=map_detail)
 
 def radius_interact(radius_from_building, map_detail='Low', data_directory="data/Collidium"):
@@ -277,12 +567,10 @@ def radius_interact(radius_from_building, map_detail='Low', data_directory="data
     Raises:
         ValueError: If data_directory is not a valid path a value error is raised.
     """
-    if not os.path.exists(str(data_directory)):
-        raise ValueError(str((data_directory) +" is not a valid path"))
-    query_builder = CollidiumQuery()
+    query_builder = CollidiumQuery(rollup=has_rollup(data_directory),
+                                   **build_limits(data_directory))
     query_builder.set_radius(radius_from_building)
-    whole_query = query_builder.get_qstring()
-    mapping_data = generate_table(whole_query, data_directory)
+    mapping_data = query_table(query_builder, data_directory)
     return draw_markers.place_maps(mapping_data, map_detail=map_detail)
 
 def all_factor_interact(building_category, building_year, collision_interval, #pylint: disable=too-many-arguments
@@ -322,15 +610,13 @@ def all_factor_interact(building_category, building_year, collision_interval, #p
     Raises:
         ValueError: If data_directory is not a valid path a value error is raised.
     """
-    if not os.path.exists(str(data_directory)):
-        raise ValueError(str((data_directory) +" is not a valid path"))
-    query_builder = CollidiumQuery()
+    query_builder = CollidiumQuery(rollup=has_rollup(data_directory),
+                                   **build_limits(data_directory))
     query_builder.set_b_category(building_category)
     query_builder.set_base_year(building_year)
     query_builder.set_duration(collision_interval)
     query_builder.set_c_severity(collision_severity)
     query_builder.set_c_type(collision_type)
     query_builder.set_radius(radius_from_building)
-    whole_query = query_builder.get_qstring()
-    mapping_data = generate_table(whole_query, data_directory)
+    mapping_data = query_table(query_builder, data_directory)
     return draw_markers.place_maps(mapping_data, map_detail=map_detail)
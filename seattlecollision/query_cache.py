@@ -0,0 +1,164 @@
+"""
+COLLIDIUM
+Query Result Cache Module
+
+The QueryCache is a bounded, size-aware least recently used (LRU) cache of
+query result dataframes. Notebook users drag the interact widgets back and
+forth, so the same queries are run again and again; the cache lets the
+*_interact functions in the interactions_functionality module skip the
+database for results they have already fetched.
+
+Entries are keyed by the database path and the normalized attribute tuple
+of a CollidiumQuery object (see CollidiumQuery.get_key), so equivalent
+queries share an entry even if their query strings differ. Each entry also
+records the database file's version (modification time and size) when it
+was stored; an entry is discarded instead of returned once the database
+file has changed, e.g. after it is rebuilt by the table_builder module.
+
+The cache keeps hit, miss, eviction and invalidation counters (see
+QueryCache.stats) so its capacity can be tuned.
+
+Entries may also be bytes, e.g. the encoded responses of the query_service
+module, which are sized by their length and, being immutable, not copied.
+"""
+from collections import OrderedDict
+import os
+import threading
+
+class QueryCache(object):
+    """
+    Query Result Cache Class
+
+    Stores query result dataframes up to a total of max_bytes (measured with
+    DataFrame.memory_usage(deep=True)), evicting the least recently used
+    entries first. Results larger than max_bytes are not stored. Dataframes
+    are copied on the way in and out, so callers may modify them freely.
+
+    Attributes:
+      max_bytes:
+        - Description: Capacity of the cache in bytes
+        - Default Value: 64 MB
+      hits, misses, evictions, invalidations:
+        - Description: Counters of cache lookups that returned a result,
+          lookups that did not, entries removed to make room, and entries
+          discarded because their database file changed
+
+    Class Methods:
+        - get returns a cached result, or None
+        - put stores a result
+        - clear removes every entry
+        - stats returns the counters and current size
+    """
+
+    def __init__(self, max_bytes=64*2**20):
+        """
+        Constructor method for QueryCache object.
+
+        Args:
+          max_bytes: (int) capacity of the cache in bytes
+
+        Raises:
+          ValueError if max_bytes is not a positive integer.
+        """
+        if not (isinstance(max_bytes, int) and max_bytes > 0):
+            raise ValueError("Arg max_bytes should be a positive integer.")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.__entries = OrderedDict()
+        self.__bytes = 0
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def __file_version__(data_directory):
+        """
+        Static method returning the version (modification time and size) of
+        a database file, or None if it does not exist.
+        """
+        try:
+            stat = os.stat(str(data_directory))
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, data_directory, key):
+        """
+        Returns a copy of the cached result for key on the database at
+        data_directory, or None if there is no current entry.
+
+        Args:
+          data_directory: (str) path to the database
+          key: hashable query key, e.g. from CollidiumQuery.get_key
+
+        Returns:
+          pandas dataframe (or bytes), or None
+        """
+        cache_key = (os.path.abspath(str(data_directory)), key)
+        version = self.__file_version__(data_directory)
+        with self.__lock:
+            entry = self.__entries.get(cache_key)
+            if entry is not None and entry[0] != version:
+                self.__remove(cache_key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[1] if isinstance(entry[1], bytes) else entry[1].copy()
+
+    def put(self, data_directory, key, frame):
+        """
+        Stores a copy of frame as the result for key on the database at
+        data_directory, evicting least recently used entries to make room.
+
+        Args:
+          data_directory: (str) path to the database
+          key: hashable query key, e.g. from CollidiumQuery.get_key
+          frame: pandas dataframe of query results, or bytes
+        """
+        cache_key = (os.path.abspath(str(data_directory)), key)
+        version = self.__file_version__(data_directory)
+        if isinstance(frame, bytes):
+            size = len(frame)
+        else:
+            size = int(frame.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        if not isinstance(frame, bytes):
+            frame = frame.copy()
+        with self.__lock:
+            if cache_key in self.__entries:
+                self.__remove(cache_key)
+            while self.__bytes + size > self.max_bytes:
+                self.__remove(next(iter(self.__entries)))
+                self.evictions += 1
+            self.__entries[cache_key] = (version, frame, size)
+            self.__bytes += size
+
+    def __remove(self, cache_key):
+        """
+        Removes an entry. The caller must hold the lock.
+        """
+        self.__bytes -= self.__entries.pop(cache_key)[2]
+
+    def clear(self):
+        """
+        Removes every entry. Counters are not reset.
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+
+    def stats(self):
+        """
+        Returns a dict of the hits, misses, evictions and invalidations
+        counters, and the current number of entries and bytes stored.
+        """
+        with self.__lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'invalidations': self.invalidations,
+                    'entries': len(self.__entries), 'bytes': self.__bytes}
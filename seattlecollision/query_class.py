@@ -15,7 +15,56 @@ created with default attributes, and modified as the interact widgets
 request new values. The qstring attribute is then calculated and returned,
 with the new data results table sent to the draw_markers function (in the
 draw_markers module).
+
+The during counts of each building are normalized to the exposure of the
+duration in the query itself: the number of collisions during the building
+period is multiplied by the duration's window in days (the same
+int(30.4167*duration) days that filter coll_days_from_build) and divided
+by the building period's length in days, b_build_days.
+
+Queries read the star schema tables built by the table_builder module,
+buildings joined with collidium_pairs (see PAIRS_FROM), where b_category,
+c_severity and c_type are stored as integer codes. Filters on them are
+written with the codes of their labels, from the category_codes module in
+build_data_libraries that the table_builder module stores them with.
+
+The get_statement method returns the same query as a parameterized
+statement and its parameters, which the interactions_functionality module
+runs so that sqlite3 can reuse prepared statements between queries.
+
+If the rollup attribute is set, queries are routed to the pre-aggregated
+collidium_rollup table (built by the table_builder module) whenever the
+requested filters can be answered from it, i.e. whenever radius is a
+multiple of ROLLUP_RADIUS_STEP.
+
+The largest valid radius and duration are the radius and window the
+database's pairs were built with. They default to MAX_RADIUS and
+MAX_DURATION, and are set from the database's build_info table by the
+build_limits function of the interactions_functionality module. The
+duration filter is applied even at the largest duration, so query results
+do not depend on the limits matching the database.
 """
+#pylint: disable=import-error
+from build_data_libraries.category_codes import CATEGORY_LABELS, CATEGORY_CODES
+
+# Default radius (in feet) and window (in months) of the building/collision
+# pairs. Must match COLLIDIUM_RADIUS and COLLIDIUM_WINDOW in
+# build_data_libraries/process_data.py.
+MAX_RADIUS = 1500
+MAX_DURATION = 12
+
+# Width in feet of the rollup table's radius buckets. Must match
+# ROLLUP_RADIUS_STEP in build_data_libraries/table_builder.py.
+ROLLUP_RADIUS_STEP = 100
+
+# FROM clause of the queries on the star schema tables. Table names must
+# match STAR_TABLES in build_data_libraries/table_builder.py.
+PAIRS_FROM = "FROM buildings JOIN collidium_pairs USING (b_id) "
+
+# Columns and numpy dtypes of the results of every get_qstring query
+RESULT_SCHEMA = [('b_id', 'int64'), ('b_lat', 'float64'), ('b_long', 'float64'),
+                 ('before', 'int64'), ('during', 'float64'), ('after', 'int64')]
+
 class CollidiumQuery(object):
     """
     Collidium Query Object Class
@@ -47,7 +96,7 @@ class CollidiumQuery(object):
         - Description: Distance between building and collision in feet
         - Default Value: 1500
         - Valid Types: int
-        - Valid Values: (0, 1500]
+        - Valid Values: (0, max_radius]
       base_year:
         - Description: Year of building completion date
         - Default Value: 2016
@@ -57,7 +106,7 @@ class CollidiumQuery(object):
         - Description: Months to count collisions before and after construction
         - Default Value: 12
         - Valid Types: int or float
-        - Valid Values: (0, 12]
+        - Valid Values: (0, max_duration]
       c_severity:
         - Description: Accident severity
         - Default Value: 'All'
@@ -69,13 +118,25 @@ class CollidiumQuery(object):
         - Default Value: 'All'
         - Valid Types: list or single list element as string
         - Valid Values: ['All', 'Vehicle Only', 'Bike/Pedestrian']
+      rollup:
+        - Description: Query the collidium_rollup table when possible
+        - Default Value: False
+        - Valid Types: bool
+      max_radius, max_duration:
+        - Description: Radius (in feet) and window (in months) the
+          database's pairs were built with
+        - Default Value: MAX_RADIUS, MAX_DURATION
+        - Valid Types: int
       qstring (no constructor arg, NOTE: user does not ever set):
         - Description: Sqlite query string for Collidium database
         - Default Value (set by get_qstring function):
           'SELECT b_id, b_lat, b_long, SUM(coll_before) AS before, ' +\
-          'SUM(coll_during)*1.000000 AS during, SUM(coll_after) AS ' +\
-          'after FROM collidium_data WHERE radius< 1500 AND ' +\
-          'base_year = 2017 GROUP BY b_id, b_lat, b_long'
+          'SUM(coll_during)*365.000000/MAX(b_build_days) AS during, ' +\
+          'SUM(coll_after) AS after FROM buildings JOIN collidium_pairs ' +\
+          'USING (b_id) WHERE radius < 1500 AND base_year = 2017 ' +\
+          'AND (coll_days_from_build BETWEEN 0 AND 365 OR ' +\
+          'coll_days_from_build BETWEEN -365 AND -1) ' +\
+          'GROUP BY b_id, b_lat, b_long'
 
     Class Methods:
         - set_* methods allow setting an individual attribute for abs
@@ -84,19 +145,30 @@ class CollidiumQuery(object):
         - get_qstring method constructs a sqlite query string from
               current attributes. The query string is set as an attribute
               and returned by the method.
+        - get_statement method returns a parameterized sqlite statement and
+              its parameters for the current attributes. Queries with the
+              same shape share the statement text, so sqlite3's statement
+              cache is reused across widget interactions.
+        - window_days method returns the duration's window in days.
+        - get_key method returns a normalized tuple of the attributes
+              that determine the query results, used as a cache key.
+        - set_limits method sets max_radius and max_duration.
 
     Static Methods:
         - __dynamic_substring__ method is a helper function to allow
               multiple entries for each attribute that accepts lists or
               strings (c_severity, c_type, and b_category). Performs a
               validity check and throws AttributeError if args are invalid.
+        - __dynamic_clause__ method is the parameterized counterpart of
+              __dynamic_substring__, used by get_statement.
     """
     # Locally disable linter to allow for reasonable object construction:
     # pylint: disable=too-many-instance-attributes
     # pylint: disable=too-many-arguments
 
     def __init__(self, b_category='All', radius=1500, base_year=2016,
-                 duration=12, c_severity='All', c_type='All'):
+                 duration=12, c_severity='All', c_type='All', rollup=False,
+                 max_radius=MAX_RADIUS, max_duration=MAX_DURATION):
         """
         Constructor method for CollidiumQuery object.
 
@@ -120,7 +192,7 @@ class CollidiumQuery(object):
             - Description: Distance between building and collision in feet
             - Default Value: 1500
             - Valid Types: int
-            - Valid Values: (0, 1500]
+            - Valid Values: (0, max_radius]
           base_year:
             - Description: Year of building completion date
             - Default Value: 2016
@@ -130,7 +202,7 @@ class CollidiumQuery(object):
             - Description: Months to count collisions before and after construction
             - Default Value: 12
             - Valid Types: int
-            - Valid Values: (0, 12]
+            - Valid Values: (0, max_duration]
           c_severity:
             - Description: Accident severity
             - Default Value: 'All'
@@ -142,19 +214,29 @@ class CollidiumQuery(object):
             - Default Value: 'All'
             - Valid Types: list or single list element as string
             - Valid Values: ['All', 'Vehicle Only', 'Bike/Pedestrian']
+          rollup:
+            - Description: Query the collidium_rollup table when possible
+            - Default Value: False
+            - Valid Types: bool
+          max_radius, max_duration:
+            - Description: Radius (in feet) and window (in months) the
+              database's pairs were built with
+            - Default Value: MAX_RADIUS, MAX_DURATION
+            - Valid Types: positive int
           qstring (no arg, NOTE: user does not ever set):
             - Description: Sqlite query string for Collidium database
             - Default Value (set by get_qstring function):
               'SELECT b_id, b_lat, b_long, SUM(coll_before) AS before, ' +\
-              'SUM(coll_during)*1.000000 AS during, SUM(coll_after) AS ' +\
-              'after FROM collidium_data WHERE radius < 1500 AND ' +\
-              'base_year = 2016 GROUP BY b_id, b_lat, b_long'
+              'SUM(coll_during)*365.000000/MAX(b_build_days) AS during, ' +\
+              'SUM(coll_after) AS after FROM buildings JOIN collidium_pairs ' +\
+              'USING (b_id) WHERE radius < 1500 AND base_year = 2016 ' +\
+              'AND (coll_days_from_build BETWEEN 0 AND 365 OR ' +\
+              'coll_days_from_build BETWEEN -365 AND -1) ' +\
+              'GROUP BY b_id, b_lat, b_long'
         """
-        self.__valid_c_severity = ['All', 'Fatality', 'Serious Injury', 'Injury',
-                                   'Property Damage Only']
-        self.__valid_c_type = ['All', 'Vehicle Only', 'Bike/Pedestrian']
-        self.__valid_b_category = ['All', 'COMMERCIAL', 'MULTIFAMILY', 'INDUSTRIAL',
-                                   'INSTITUTIONAL', 'SINGLE FAMILY / DUPLEX']
+        self.__valid_c_severity = ['All'] + CATEGORY_LABELS['c_severity']
+        self.__valid_c_type = ['All'] + CATEGORY_LABELS['c_type']
+        self.__valid_b_category = ['All'] + CATEGORY_LABELS['b_category']
 
         self.b_category = b_category
         self.radius = radius
@@ -162,6 +244,9 @@ class CollidiumQuery(object):
         self.duration = duration
         self.c_severity = c_severity
         self.c_type = c_type
+        self.rollup = rollup
+        self.max_radius = max_radius
+        self.max_duration = max_duration
         self.get_qstring()
 
     @staticmethod
@@ -170,8 +255,9 @@ class CollidiumQuery(object):
         Static method to create substring for variables with dynamic
         valid types (e.g.: b_category, c_severity, and c_type). Each
         of those args can be a list or string. This method builds an
-        appropriate query substring based on the arg type. If the arg
-        is 'All', then a blank query substring is returned.
+        appropriate query substring based on the arg type, filtering
+        on the code of each label (see CATEGORY_CODES). If the arg is
+        'All', then a blank query substring is returned.
 
         Args:
           - label: the attribute name we are constructing a substring for
@@ -181,8 +267,8 @@ class CollidiumQuery(object):
         Returns:
           query substring depending on the value of arg:
             - blank if arg == 'All'
-            - 'AND (label) = (arg)' if arg is a string
-            - 'AND (label) IN (tuple(arg))' if arg is list
+            - 'AND (label) = (code)' if arg is a string
+            - 'AND (label) IN (code, ...)' if arg is list
 
         Raises:
           AttributeError if invalid arg is provided
@@ -190,14 +276,43 @@ class CollidiumQuery(object):
         if isinstance(arg, list):
             if not all([x in valid_args for x in arg]):
                 raise AttributeError("%s list contains invalid values." % label)
-            return "AND %s IN %s " % (label, tuple(arg).__str__())
+            return "AND %s IN (%s) " % (label, ", ".join(str(CATEGORY_CODES[label][x])
+                                                         for x in arg))
         elif arg == "All":
             return ''
         elif arg in valid_args:
-            return "AND %s = '%s' " % (label, arg)
+            return "AND %s = %d " % (label, CATEGORY_CODES[label][arg])
         else:
             raise AttributeError("Attribute %s is invalid." % label)
 
+    @staticmethod
+    def __dynamic_clause__(label, arg):
+        """
+        Static method to create the parameterized counterpart of
+        __dynamic_substring__ (which validates arg). The parameters are
+        the codes of the labels (see CATEGORY_CODES), and lists are sorted
+        with duplicates removed, so equal filters share a statement.
+
+        Args:
+          - label: the attribute name we are constructing a clause for
+          - arg: the (valid) value of the attribute
+
+        Returns:
+          tuple of (clause, params) depending on the value of arg:
+            - ('', ()) if arg == 'All'
+            - ('AND (label) = ? ', (code,)) if arg is a string or one element list
+            - ('AND (label) IN (?, ...) ', tuple(codes)) if arg is list
+        """
+        if isinstance(arg, list):
+            arg = sorted(set(arg))
+            if len(arg) > 1:
+                return "AND %s IN (%s) " % (label, ", ".join("?"*len(arg))), tuple(
+                    sorted(CATEGORY_CODES[label][x] for x in arg))
+            arg = arg[0]
+        if arg == "All":
+            return '', ()
+        return "AND %s = ? " % label, (CATEGORY_CODES[label][arg],)
+
     def get_qstring(self):
         """
         Class method builds sqlite query string from currently set
@@ -216,25 +331,42 @@ class CollidiumQuery(object):
             from current attributes
         """
         # Check validity of directly referenced attributes
-        if not (isinstance(self.radius, int) and self.radius <= 1500 and self.radius > 0):
-            raise AttributeError("Attribute radius should be an integer <= 1500.")
-        if not (isinstance(self.duration, int) and self.duration <= 12 and self.duration > 0):
-            raise AttributeError("Attribute duration (in months) should be a positive int <= 12.")
+        if not all(isinstance(limit, int) and limit > 0
+                   for limit in (self.max_radius, self.max_duration)):
+            raise AttributeError("Attributes max_radius and max_duration should be positive "
+                                 "integers.")
+        if not (isinstance(self.radius, int) and self.radius <= self.max_radius and
+                self.radius > 0):
+            raise AttributeError("Attribute radius should be an integer <= %d." %
+                                 self.max_radius)
+        if not (isinstance(self.duration, int) and self.duration <= self.max_duration and
+                self.duration > 0):
+            raise AttributeError("Attribute duration (in months) should be a positive int "
+                                 "<= %d." % self.max_duration)
         if not (isinstance(self.base_year, int) and self.base_year in (2014, 2015, 2016, 2017)):
             raise AttributeError("Attribute base_year should be an integer between 2014-2017.")
+        if not isinstance(self.rollup, bool):
+            raise AttributeError("Attribute rollup should be a bool.")
 
         # Build query string from attributes
         qstring = "SELECT b_id, b_lat, b_long, "
         qstring += "SUM(coll_before) AS before, "
-        qstring += "SUM(coll_during)*%f AS during, " % (self.duration/12)
+        qstring += "SUM(coll_during)*%f/MAX(b_build_days) AS during, " % self.window_days()
         qstring += "SUM(coll_after) AS after "
-        qstring += "FROM collidium_data "
-        qstring += "WHERE radius < %d " % self.radius
-        qstring += "AND base_year = %d " % self.base_year
-        if self.duration != 12:
+        if self.rollup and self.radius % ROLLUP_RADIUS_STEP == 0:
+            # Radius buckets are floored to ROLLUP_RADIUS_STEP, and pairs are
+            # bucketed by the shortest duration (in months) that counts them
+            qstring += "FROM collidium_rollup "
+            qstring += "WHERE radius_bucket < %d " % self.radius
+            qstring += "AND base_year = %d " % self.base_year
+            qstring += "AND duration_bucket <= %d " % self.duration
+        else:
+            qstring += PAIRS_FROM
+            qstring += "WHERE radius < %d " % self.radius
+            qstring += "AND base_year = %d " % self.base_year
             qstring += "AND (coll_days_from_build BETWEEN 0 AND "
             qstring += "%d OR coll_days_from_build BETWEEN %d AND -1) " %(
-                30.4167*self.duration, -30.4167*self.duration)
+                self.window_days(), -self.window_days())
 
         # Dynamic string constructor checks other attributes
         qstring += self.__dynamic_substring__('b_category', self.b_category,
@@ -248,6 +380,83 @@ class CollidiumQuery(object):
         self.qstring = qstring
         return qstring
 
+    def get_statement(self):
+        """
+        Class method builds a parameterized sqlite statement from currently
+        set attributes. It returns the same results as the qstring (which
+        is kept for backwards compatibility), but the filter values are
+        bound as parameters rather than written into the statement, so
+        there is one statement per query shape (table, and the form of each
+        list attribute) instead of one per filter combination.
+
+        Raises:
+          - AttributeError if any attributes are invalid (see get_qstring).
+
+        Returns:
+          - tuple of (statement, params), to pass to sqlite3 execute
+        """
+        self.get_qstring()
+        params = [float(self.window_days())]
+        statement = "SELECT b_id, b_lat, b_long, "
+        statement += "SUM(coll_before) AS before, "
+        statement += "SUM(coll_during)*?/MAX(b_build_days) AS during, "
+        statement += "SUM(coll_after) AS after "
+        if self.rollup and self.radius % ROLLUP_RADIUS_STEP == 0:
+            statement += "FROM collidium_rollup "
+            statement += "WHERE radius_bucket < ? AND base_year = ? "
+            statement += "AND duration_bucket <= ? "
+            params += [self.radius, self.base_year, self.duration]
+        else:
+            statement += PAIRS_FROM
+            statement += "WHERE radius < ? AND base_year = ? "
+            statement += "AND (coll_days_from_build BETWEEN 0 AND ? "
+            statement += "OR coll_days_from_build BETWEEN ? AND -1) "
+            params += [self.radius, self.base_year, self.window_days(), -self.window_days()]
+        for label in ['b_category', 'c_severity', 'c_type']:
+            clause, clause_params = self.__dynamic_clause__(label, getattr(self, label))
+            statement += clause
+            params += clause_params
+        statement += "GROUP BY b_id, b_lat, b_long"
+        return statement, tuple(params)
+
+    def window_days(self):
+        """
+        Class method returns the window of the duration attribute in days:
+        pairs at most this many days from the building period are counted,
+        and during counts are normalized to this many days of exposure.
+
+        Returns:
+          - int(30.4167*duration) (365 for 12 months)
+        """
+        return int(30.4167*self.duration)
+
+    def get_key(self):
+        """
+        Class method returns a normalized, hashable tuple of the attributes
+        that determine the query results, for use as a cache key. Queries
+        with equal keys return the same results: list attributes are sorted
+        with duplicates removed, one element lists are replaced by the
+        element, and the rollup attribute (which only changes which table
+        is read) is left out.
+
+        Raises:
+          - AttributeError if any attributes are invalid (see get_qstring).
+
+        Returns:
+          - tuple of (b_category, radius, base_year, duration, c_severity,
+            c_type)
+        """
+        self.get_qstring()
+
+        def normalize(arg):
+            if isinstance(arg, list):
+                arg = tuple(sorted(set(arg)))
+                return arg[0] if len(arg) == 1 else arg
+            return arg
+
+        return (normalize(self.b_category), self.radius, self.base_year, self.duration,
+                normalize(self.c_severity), normalize(self.c_type))
+
     def set_c_severity(self, c_severity):
         """
         Sets c_severity attribute.
@@ -318,13 +527,13 @@ class CollidiumQuery(object):
             radius:
               - Description: Distance between building and collision in feet
               - Valid Types: int
-              - Valid Values: (0, 1500]
+              - Valid Values: (0, max_radius]
 
         Raises:
             ValueError if radius is not a valid type or value.
         """
-        if not (isinstance(radius, int) and radius <= 1500 and radius > 0):
-            raise ValueError("Arg radius should be a positive integer <= 1500.")
+        if not (isinstance(radius, int) and radius <= self.max_radius and radius > 0):
+            raise ValueError("Arg radius should be a positive integer <= %d." % self.max_radius)
         self.radius = radius
 
     def set_duration(self, duration):
@@ -335,13 +544,14 @@ class CollidiumQuery(object):
             duration:
               - Description: Months to count collisions before and after construction
               - Valid Types: int
-              - Valid Values: (0, 12]
+              - Valid Values: (0, max_duration]
 
         Raises:
             ValueError if duration is not a valid type or value.
         """
-        if not (isinstance(duration, int) and duration <= 12 and duration > 0):
-            raise ValueError("Arg duration (in months) should be a positive int <= 12.")
+        if not (isinstance(duration, int) and duration <= self.max_duration and duration > 0):
+            raise ValueError("Arg duration (in months) should be a positive int <= %d." %
+                             self.max_duration)
         self.duration = duration
 
     def set_base_year(self, base_year):
@@ -360,3 +570,44 @@ class CollidiumQuery(object):
         if not (isinstance(base_year, int) and base_year in (2014, 2015, 2016, 2017)):
             raise ValueError("Arg base_year should be an integer between 2014-2017.")
         self.base_year = base_year
+
+    def set_rollup(self, rollup):
+        """
+        Sets rollup attribute.
+
+        Args:
+            rollup:
+              - Description: Query the collidium_rollup table when possible
+              - Valid Types: bool
+
+        Raises:
+            ValueError if rollup is not a bool.
+        """
+        if not isinstance(rollup, bool):
+            raise ValueError("Arg rollup should be a bool.")
+        self.rollup = rollup
+
+    def set_limits(self, max_radius, max_duration):
+        """
+        Sets max_radius and max_duration attributes, e.g. to the limits of a
+        database's pairs returned by build_limits in the
+        interactions_functionality module.
+
+        Args:
+            max_radius:
+              - Description: Radius in feet the pairs were built with
+              - Valid Types: positive int
+            max_duration:
+              - Description: Window in months the pairs were built with
+              - Valid Types: positive int
+
+        Raises:
+            ValueError if either limit is not a positive int, or the radius
+            or duration attribute is above its new limit.
+        """
+        if not all(isinstance(limit, int) and limit > 0 for limit in (max_radius, max_duration)):
+            raise ValueError("Args max_radius and max_duration should be positive integers.")
+        if self.radius > max_radius or self.duration > max_duration:
+            raise ValueError("Attributes radius and duration should be within the new limits.")
+        self.max_radius = max_radius
+        self.max_duration = max_duration
@@ -0,0 +1,350 @@
+"""
+COLLIDIUM
+HTTP Query Service Module
+
+The query_service module serves Collidium query results over HTTP, so that
+many clients (e.g. a web page using the static tiles of the tile_export
+module, or a dashboard) can share one database, connection pool and cache
+instead of each running its own Jupyter kernel.
+
+The service is a small asyncio HTTP/1.1 server (standard library only,
+with keep-alive connections) with the endpoints:
+
+    GET /query?b_category=...&base_year=...&duration=...&c_severity=...
+              &c_type=...&radius=...
+        The filters of all_factor_interact in the interactions_functionality
+        module. Omitted filters keep their CollidiumQuery defaults, and
+        b_category, c_severity and c_type may be repeated to select several
+        values. Returns a JSON object with the filters, the number of
+        buildings, the before/during/after totals, and the results as
+        columns (b_id, b_lat, b_long, before, during, after).
+
+    GET /stats
+        Returns a JSON object of the request, coalescing and cache counters.
+
+Invalid filters return a 400 response with a JSON error message. Requests
+whose request line and headers are longer than MAX_HEADER_BYTES, or whose
+body is longer than MAX_BODY_BYTES, get a 431 or 413 response and their
+connection is closed.
+
+Queries are run on a thread pool with the pooled connections of the
+interactions_functionality module (one read-only connection per worker
+thread). Encoded responses are kept in a QueryCache, keyed by the
+CollidiumQuery key, so they are discarded when the database is rebuilt.
+Identical queries that arrive while the same query is already running are
+coalesced: they wait for the running query instead of starting their own.
+
+Usage (from the seattlecollision folder, like the notebook):
+    python query_service.py [database [port]]
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import sys
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+#pylint: disable=import-error
+import interactions_functionality as int_func
+from query_class import CollidiumQuery, RESULT_SCHEMA
+from query_cache import QueryCache
+
+# Default port and number of query worker threads
+PORT = 8050
+MAX_WORKERS = 4
+# Maximum size of a request's request line and headers, and of its body
+# (which is read and ignored, as only GET requests are supported)
+MAX_HEADER_BYTES = 8192
+MAX_BODY_BYTES = 1024
+# Query string filters and the CollidiumQuery setters they are passed to
+LIST_FILTERS = {'b_category': 'set_b_category', 'c_severity': 'set_c_severity',
+                'c_type': 'set_c_type'}
+INT_FILTERS = {'base_year': 'set_base_year', 'duration': 'set_duration',
+               'radius': 'set_radius'}
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 413: 'Payload Too Large',
+               431: 'Request Header Fields Too Large', 500: 'Internal Server Error'}
+
+def parse_filters(query_string, **limits):
+    """
+    Builds a CollidiumQuery from the filters of a /query query string.
+
+    Args:
+        query_string: (str) URL query string, e.g. 'base_year=2015&radius=800'
+        limits: (optional) max_radius and max_duration CollidiumQuery
+            arguments bounding the radius and duration filters (see
+            interactions_functionality.build_limits)
+
+    Returns:
+        CollidiumQuery object
+
+    Raises:
+        ValueError: If a filter is unknown or has an invalid value.
+    """
+    query = CollidiumQuery(**limits)
+    for name, values in parse_qs(query_string, strict_parsing=False).items():
+        if name in LIST_FILTERS:
+            getattr(query, LIST_FILTERS[name])(values[0] if len(values) == 1 else values)
+        elif name in INT_FILTERS and len(values) == 1:
+            try:
+                value = int(values[0])
+            except ValueError:
+                raise ValueError("Filter %s should be an integer." % name)
+            getattr(query, INT_FILTERS[name])(value)
+        else:
+            raise ValueError("Unknown or repeated filter %s." % name)
+    return query
+
+def column_list(values):
+    """
+    Returns a numpy column as a list for JSON, with NaN (NULL) values as None.
+    """
+    if values.dtype.kind == 'f' and np.isnan(values).any():
+        return [None if np.isnan(value) else value for value in values.tolist()]
+    return values.tolist()
+
+def encode_results(query, results):
+    """
+    Encodes query results as the JSON body of a /query response.
+
+    Args:
+        query: CollidiumQuery object the results are for
+        results: dataframe returned by generate_table
+
+    Returns:
+        bytes of the JSON response body
+    """
+    names = [name for name, _ in RESULT_SCHEMA]
+    if 'b_id' not in results:
+        results = results.reindex(columns=names)
+    totals = {period: np.nansum(results[period].values.astype(float)).item()
+              for period in ['before', 'during', 'after']}
+    body = {'filters': {'b_category': query.b_category, 'radius': query.radius,
+                        'base_year': query.base_year, 'duration': query.duration,
+                        'c_severity': query.c_severity, 'c_type': query.c_type},
+            'buildings': int(results.shape[0]), 'totals': totals,
+            'columns': {name: column_list(results[name].values) for name in names}}
+    return json.dumps(body, separators=(',', ':')).encode('utf-8')
+
+class QueryService(object):
+    """
+    Collidium HTTP Query Service Class
+
+    Handles HTTP connections (see handle) for a Collidium database. Start the
+    service with serve, or pass handle to asyncio.start_server.
+
+    Attributes:
+      data_directory:
+        - Description: Path to the Collidium database
+      limits:
+        - Description: Radius and duration limits of the database's pairs
+          (see build_limits), read again whenever the database changes
+      cache:
+        - Description: QueryCache of encoded /query responses
+      requests, coalesced, errors:
+        - Description: Counters of /query requests, requests that waited for
+          an identical running query, and requests with invalid filters
+
+    Raises ValueError if data_directory is not a valid path.
+    """
+
+    def __init__(self, data_directory="data/Collidium", max_workers=MAX_WORKERS,
+                 cache=None):
+        """
+        Constructor method for QueryService object.
+
+        Args:
+          data_directory: (str) path to the Collidium database
+          max_workers: (int) number of query worker threads
+          cache: (optional) QueryCache of responses, by default a new one
+        """
+        if not os.path.exists(str(data_directory)):
+            raise ValueError("Query Service: data_directory is not a valid path.")
+        self.data_directory = data_directory
+        self.cache = QueryCache() if cache is None else cache
+        self.requests = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.__in_flight = {}
+
+    @property
+    def limits(self):
+        """
+        The radius and duration limits of the database's pairs, read from
+        the database again once its file has changed (see build_limits).
+        """
+        return int_func.build_limits(self.data_directory)
+
+    def run_query(self, query):
+        """
+        Runs a query on a worker thread and returns the encoded response,
+        storing it in the cache.
+        """
+        query.set_rollup(int_func.has_rollup(self.data_directory))
+        statement, params = query.get_statement()
+        results = int_func.generate_table(statement, self.data_directory, params)
+        body = encode_results(query, results)
+        self.cache.put(self.data_directory, query.get_key(), body)
+        return body
+
+    async def query_response(self, query):
+        """
+        Returns the encoded response of a query: from the cache, from an
+        identical query that is already running, or by running it.
+        """
+        key = query.get_key()
+        body = self.cache.get(self.data_directory, key)
+        if body is not None:
+            return body
+        future = self.__in_flight.get(key)
+        if future is None:
+            future = asyncio.get_event_loop().run_in_executor(
+                self.__executor, self.run_query, query)
+            self.__in_flight[key] = future
+            future.add_done_callback(lambda _: self.__in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    def stats(self):
+        """
+        Returns a dict of the service's request counters and cache stats.
+        """
+        return {'requests': self.requests, 'coalesced': self.coalesced,
+                'errors': self.errors, 'in_flight': len(self.__in_flight),
+                'cache': self.cache.stats()}
+
+    async def route(self, method, target):
+        """
+        Returns the status code and JSON body of a request.
+        """
+        if method != 'GET':
+            return 405, b'{"error":"Only GET requests are supported."}'
+        url = urlsplit(target)
+        if url.path == '/stats':
+            return 200, json.dumps(self.stats()).encode('utf-8')
+        if url.path != '/query':
+            return 404, b'{"error":"Unknown path."}'
+        self.requests += 1
+        limits = self.limits
+        try:
+            query = parse_filters(url.query, **limits)
+        except ValueError as error:
+            self.errors += 1
+            return 400, json.dumps({'error': str(error)}).encode('utf-8')
+        return 200, await self.query_response(query)
+
+    @staticmethod
+    async def read_head(reader):
+        """
+        Reads the request line and headers of a request.
+
+        Returns:
+            tuple of the request line (bytes) and a dict of the headers with
+            lower case names, or None if the client closed the connection
+
+        Raises:
+            ValueError: If the request line and headers are longer than
+                MAX_HEADER_BYTES.
+        """
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        size = len(request_line)
+        headers = {}
+        while size <= MAX_HEADER_BYTES:
+            line = await reader.readline()
+            if not line.strip():
+                return request_line, headers
+            size += len(line)
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        raise ValueError("Request headers should be at most %d bytes." % MAX_HEADER_BYTES)
+
+    @staticmethod
+    async def write_response(writer, status, body, keep_alive):
+        """
+        Writes an HTTP/1.1 response with a JSON body.
+        """
+        writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\n'
+                      'Content-Length: %d\r\nConnection: %s\r\n\r\n' %
+                      (status, STATUS_TEXT[status], len(body),
+                       'keep-alive' if keep_alive else 'close')).encode('latin-1'))
+        writer.write(body)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        """
+        Handles the HTTP/1.1 requests of one client connection, keeping the
+        connection open until the client closes it or sends Connection: close.
+        The connection is also closed after a request that is too large.
+        """
+        try:
+            while True:
+                try:
+                    head = await self.read_head(reader)
+                except ValueError as error:
+                    await self.write_response(writer, 431, json.dumps(
+                        {'error': str(error)}).encode('utf-8'), False)
+                    break
+                if head is None:
+                    break
+                request_line, headers = head
+                length = headers.get('content-length') or '0'
+                if not length.isdigit():
+                    await self.write_response(
+                        writer, 400, b'{"error":"Invalid Content-Length header."}', False)
+                    break
+                if int(length) > MAX_BODY_BYTES:
+                    await self.write_response(writer, 413, json.dumps(
+                        {'error': "Request bodies should be at most %d bytes." %
+                                  MAX_BODY_BYTES}).encode('utf-8'), False)
+                    break
+                await reader.readexactly(int(length))
+                try:
+                    method, target, _ = request_line.decode('latin-1').split()
+                    status, body = await self.route(method, target)
+                except Exception as error: #pylint: disable=broad-except
+                    status, body = 500, json.dumps({'error': str(error)}).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self.write_response(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=PORT):
+        """
+        Serves requests on host:port until cancelled.
+        """
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        print('Query Service: serving %s on http://%s:%d (Woohoo!)' %
+              (self.data_directory, host, port))
+        try:
+            # A future that is never set, so the server runs until cancelled
+            await asyncio.get_event_loop().create_future()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    def close(self):
+        """
+        Shuts down the worker threads.
+        """
+        self.__executor.shutdown(wait=True)
+
+if __name__ == '__main__':
+    ARGS = sys.argv[1:]
+    SERVICE = QueryService(ARGS[0] if ARGS else 'data/Collidium')
+    LOOP = asyncio.new_event_loop()
+    asyncio.set_event_loop(LOOP)
+    try:
+        LOOP.run_until_complete(SERVICE.serve(port=int(ARGS[1]) if len(ARGS) > 1 else PORT))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        SERVICE.close()
+        LOOP.close()
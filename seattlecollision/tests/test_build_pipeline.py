@@ -0,0 +1,190 @@
+"""
+COLLIDIUM
+Build Pipeline Test Module
+
+The test_build_pipeline.py module uses the unittest package from Python to
+test the build_pipeline module on small raw data files written to a
+temporary data folder:
+ - test_bad_inputs: tests that invalid raw file paths and unknown forced
+   stages raise a ValueError
+ - test_cached_stages: tests that a second build reruns no stage, and that
+   a modified stage output is rebuilt
+ - test_changed_raw_file: tests that a changed raw file only reruns the
+   stages that depend on it, and that the updated database holds the
+   pairs of the new data
+ - test_force: tests that forced stages are rerun, and that changing the
+   radius invalidates the pair stages
+ - test_changed_code: tests that a change to the pair code reruns an
+   incremental create_table
+"""
+import glob
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+sys.path.append('seattlecollision/build_data_libraries/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import build_pipeline
+from process_data import collisions_clean, buildings_clean, create_collidium_table
+
+RAW_COLLISIONS = pd.DataFrame({
+    "X": [-122.310, -122.311, -122.312, -122.341, -122.342, -122.350],
+    "Y": [47.610, 47.611, 47.612, 47.641, 47.642, 47.700],
+    "objectid": [1, 2, 3, 4, 5, 6],
+    "incdttm": ["1/2/2014", "3/4/2015 10:00:00 AM", "5/6/2016", "7/8/2015 05:30:00 PM",
+                "9/10/2016", "11/12/2015"],
+    "pedcount": [0, 1, 0, 0, 0, 0],
+    "pedcylcount": [0, 0, 1, 0, 0, 0],
+    "severitycode": ["1", "2", "2b", "3", "1", "2"],
+    "severitydesc": ["Property Damage Only Collision", "Injury Collision",
+                     "Serious Injury Collision", "Fatality Collision",
+                     "Property Damage Only Collision", "Injury Collision"]})
+RAW_BUILDINGS = pd.DataFrame({
+    "Application/Permit Number": [10, 11, 12],
+    "Category": ["COMMERCIAL", "MULTIFAMILY", "INDUSTRIAL"],
+    "Action Type": ["NEW", "NEW", "NEW"],
+    "Value": [2000000.0, 3000000.0, 4000000.0],
+    "Issue Date": ["2014-06-02", "2015-02-03", "2015-03-04"],
+    "Final Date": ["2015-06-02", "2016-02-03", "2016-03-04"],
+    "Status": ["Permit Closed", "Permit Closed", "Permit Finaled"],
+    "Latitude": [47.611, 47.641, 47.800],
+    "Longitude": [-122.311, -122.341, -122.400]})
+
+class TestBuildPipeline(unittest.TestCase):
+    """
+    Using the unit test framework, the build pipeline is run on raw files in
+    a temporary data folder.
+    """
+
+    def setUp(self):
+        """Writes the raw files to a temporary data folder."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = self.tmp_dir.name
+        os.makedirs(os.path.join(self.data_dir, 'raw_data'))
+        self.collisions = os.path.join(self.data_dir, build_pipeline.COLLISIONS_RAW)
+        self.buildings = os.path.join(self.data_dir, build_pipeline.BUILDINGS_RAW)
+        RAW_COLLISIONS.to_csv(self.collisions, index=False)
+        RAW_BUILDINGS.to_csv(self.buildings)
+
+    def tearDown(self):
+        """Removes the data folder."""
+        self.tmp_dir.cleanup()
+
+    def build(self, *args):
+        """Runs the pipeline from the command line arguments, with one worker."""
+        return build_pipeline.main(['--data-dir', self.data_dir, '--workers', '1'] + list(args))
+
+    def pair_count(self):
+        """Returns the number of pairs in the database."""
+        conn = sqlite3.connect(os.path.join(self.data_dir, 'Collidium'))
+        count = conn.execute("SELECT COUNT(*) FROM collidium_pairs").fetchone()[0]
+        conn.close()
+        return count
+
+    def test_bad_inputs(self):
+        """
+        Tests that a ValueError is raised for a raw file that does not exist
+        and for an unknown forced stage.
+
+        Returns:
+            True (bool) if ValueError is raised.
+        """
+        with self.assertRaises(ValueError):
+            build_pipeline.build(self.data_dir, collisions_raw='nothing.csv')
+        with self.assertRaises(ValueError):
+            build_pipeline.build(self.data_dir, force=['clean'])
+
+    def test_cached_stages(self):
+        """
+        Tests that the first build runs every stage, that the second finds
+        the database cached, and that a modified stage output is rebuilt.
+
+        Returns:
+            True (bool) if the stage statuses are as expected.
+        """
+        summary = self.build()
+        self.assertEqual(list(summary), ['collisions_clean', 'buildings_clean',
+                                         'create_collidium_table', 'create_table'])
+        self.assertTrue(all(stage['status'] == 'built' for stage in summary.values()))
+        self.assertEqual(self.pair_count(), 5)
+        self.assertEqual(self.build(), {'create_table': {'status': 'cached', 'seconds': 0.0}})
+        database = os.path.join(self.data_dir, 'Collidium')
+        stat = os.stat(database)
+        os.utime(database, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        summary = self.build()
+        self.assertEqual({stage: run['status'] for stage, run in summary.items()},
+                         {'collisions_clean': 'cached', 'buildings_clean': 'cached',
+                          'create_table': 'built'})
+
+    def test_changed_raw_file(self):
+        """
+        Tests that a new raw collision reruns collisions_clean and updates the
+        database, with buildings_clean cached, and that the database then
+        holds the pairs of the new data.
+
+        Returns:
+            True (bool) if the stage statuses and pair counts are as expected.
+        """
+        self.build()
+        before = self.pair_count()
+        new = RAW_COLLISIONS.iloc[[0]].assign(objectid=7, incdttm="2/3/2015")
+        pd.concat([RAW_COLLISIONS, new]).to_csv(self.collisions, index=False)
+        summary = self.build()
+        self.assertEqual({stage: run['status'] for stage, run in summary.items()},
+                         {'collisions_clean': 'built', 'buildings_clean': 'cached',
+                          'create_table': 'built'})
+        expected = create_collidium_table(collisions_clean(self.collisions),
+                                          buildings_clean(self.buildings))
+        self.assertEqual(self.pair_count(), expected.shape[0])
+        self.assertGreater(self.pair_count(), before)
+
+    def test_force(self):
+        """
+        Tests that a forced stage reruns while the stages after it stay
+        cached, that --force all reruns every stage, and that a new radius
+        reruns the pair stages only.
+
+        Returns:
+            True (bool) if the stage statuses are as expected.
+        """
+        self.build()
+        summary = self.build('--force', 'buildings_clean')
+        self.assertEqual({stage: run['status'] for stage, run in summary.items()},
+                         {'buildings_clean': 'built', 'create_table': 'cached'})
+        summary = self.build('--force', 'all', '--full')
+        self.assertTrue(len(summary) == 4 and
+                        all(stage['status'] == 'built' for stage in summary.values()))
+        summary = self.build('--radius', '1000', '--full')
+        self.assertEqual({stage: run['status'] for stage, run in summary.items()},
+                         {'collisions_clean': 'cached', 'buildings_clean': 'cached',
+                          'create_collidium_table': 'built', 'create_table': 'built'})
+
+    def test_changed_code(self):
+        """
+        Tests that a change to a pair module (on a copy of the module source
+        files) reruns an incremental create_table, which computes its pairs
+        without the create_collidium_table stage.
+
+        Returns:
+            True (bool) if the stage statuses are as expected.
+        """
+        library = os.path.join(self.data_dir, 'library')
+        os.makedirs(library)
+        for path in glob.glob(os.path.join(build_pipeline.LIBRARY_DIR, '*.py')):
+            shutil.copy(path, library)
+        with mock.patch.object(build_pipeline, 'LIBRARY_DIR', library):
+            self.build()
+            with open(os.path.join(library, 'spatial_index.py'), 'a') as source:
+                source.write('# changed\n')
+            summary = self.build()
+        self.assertEqual({stage: run['status'] for stage, run in summary.items()},
+                         {'collisions_clean': 'cached', 'buildings_clean': 'cached',
+                          'create_table': 'built'})
+
+if __name__ == '__main__':
+    unittest.main()
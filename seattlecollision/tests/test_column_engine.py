@@ -0,0 +1,146 @@
+"""
+COLLIDIUM
+Column Query Engine Test Module
+
+The test_column_engine.py module uses the unittest package from Python to
+test the column_engine module on a database built from the bundled sample
+data:
+ - test_bad_path: tests that invalid database and column folder paths
+   raise a ValueError
+ - test_same_results: tests that the engine returns the same results as
+   the SQLite queries, for combinations of every filter
+ - test_query_table_backend: tests the backend argument of query_table,
+   and that engines are reloaded when the columns are exported again
+ - test_stale_columns: tests that columns exported before their database
+   was updated are refused until they are exported again
+"""
+import itertools
+import os
+import sys
+import tempfile
+import unittest
+import pandas as pd
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import table_builder
+import column_engine
+import interactions_functionality as int_func
+from query_class import CollidiumQuery
+
+class TestColumnEngine(unittest.TestCase):
+    """
+    Using the unit test framework, the column engine is tested against the
+    SQLite queries on a temporary database.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Builds a temporary Collidium database and exports its columns."""
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date'])
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.database = os.path.join(cls.tmp_dir.name, 'Collidium')
+        table_builder.update_table(cls.database, collisions, buildings)
+        column_engine.export_columns(cls.database)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Closes the pooled connections and removes the database."""
+        int_func.close_connections(cls.database)
+        cls.tmp_dir.cleanup()
+
+    def test_bad_path(self):
+        """
+        Tests that a ValueError is raised for a database or column folder
+        that does not exist.
+
+        Returns:
+            True (bool) if ValueError is raised.
+        """
+        with self.assertRaises(ValueError):
+            column_engine.export_columns(os.path.join(self.tmp_dir.name, 'nothing'))
+        with self.assertRaises(ValueError):
+            column_engine.ColumnEngine(self.tmp_dir.name)
+
+    def test_same_results(self):
+        """
+        Tests that the engine returns the generate_table results of the
+        query strings, including queries with no results.
+
+        Returns:
+            True (bool) if every pair of results matches.
+        """
+        engine = column_engine.get_engine(column_engine.columns_path(self.database))
+        filters = itertools.product(['All', ['COMMERCIAL', 'MULTIFAMILY']], [1500, 850, 10],
+                                    [2014, 2017], [12, 5],
+                                    ['All', 'Fatality', ['Injury', 'Property Damage Only']],
+                                    ['All', 'Vehicle Only'])
+        for args in filters:
+            query = CollidiumQuery(*args)
+            expected = int_func.generate_table(query.get_qstring(), self.database)
+            pd.testing.assert_frame_equal(engine.query(query), expected, check_exact=False)
+
+    def test_query_table_backend(self):
+        """
+        Tests that query_table returns the same results with either backend,
+        rejects unknown backends, and that get_engine reloads re-exported
+        columns.
+
+        Returns:
+            True (bool) if the results and engines are as expected.
+        """
+        query = CollidiumQuery(b_category='MULTIFAMILY', duration=6)
+        pd.testing.assert_frame_equal(
+            int_func.query_table(query, self.database, backend='columns'),
+            int_func.query_table(query, self.database), check_exact=False)
+        with self.assertRaises(ValueError):
+            int_func.query_table(query, self.database, backend='arrow')
+        path = column_engine.columns_path(self.database)
+        engine = column_engine.get_engine(path)
+        self.assertIs(column_engine.get_engine(path), engine)
+        meta = column_engine.version_file(path)
+        stat = os.stat(meta)
+        column_engine.export_columns(self.database)
+        os.utime(meta, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNot(column_engine.get_engine(path), engine)
+
+    def test_stale_columns(self):
+        """
+        Tests that query_table and get_engine raise a ValueError once the
+        database has changed since its columns were exported, also for a
+        query whose results are cached, and that a new export is served.
+
+        Returns:
+            True (bool) if stale columns are refused and new ones are served.
+        """
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date'])
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        database = os.path.join(self.tmp_dir.name, 'Collidium_updated')
+        table_builder.update_table(database, collisions, buildings)
+        path = column_engine.export_columns(database)
+        query = CollidiumQuery(base_year=2015)
+        int_func.query_table(query, database, backend='columns')
+        table_builder.update_table(database, collisions, buildings.iloc[1:])
+        with self.assertRaises(ValueError):
+            int_func.query_table(query, database, backend='columns')
+        with self.assertRaises(ValueError):
+            column_engine.get_engine(path)
+        stat = os.stat(column_engine.version_file(path))
+        column_engine.export_columns(database)
+        os.utime(column_engine.version_file(path),
+                 ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        pd.testing.assert_frame_equal(
+            int_func.query_table(query, database, backend='columns'),
+            int_func.query_table(query, database), check_exact=False)
+        int_func.close_connections(database)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+COLLIDIUM
+Column Store Test Module
+
+The test_column_store.py module uses the unittest package from Python to test
+the column_store module on the bundled sample data:
+ - test_round_trip: tests that processed dataframes are read back with their
+   values, dtypes and index, with string columns as categoricals
+ - test_read_columns: tests loading a subset of the columns, without
+   memory mapping
+ - test_not_a_store: tests that reading a folder that is not a column store,
+   or a column that is not stored, raises a ValueError
+"""
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+sys.path.append('seattlecollision/build_data_libraries/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import column_store
+
+def load_sample():
+    """Returns the processed collisions and buildings sample dataframes."""
+    buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                            parse_dates=['b_issue_date', 'b_final_date'])
+    collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                             index_col=0, parse_dates=['c_datetime'],
+                             dtype={'c_severity_code': str})
+    return collisions, buildings
+
+class TestColumnStore(unittest.TestCase):
+    """
+    Using the unit test framework, column stores are written to and read from
+    a temporary folder.
+    """
+
+    def setUp(self):
+        """Creates a temporary folder for each test."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Removes the temporary folder."""
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        """
+        Tests that the sample collisions and buildings (with a missing value)
+        are read back with the same values, dtypes and index.
+
+        Returns:
+            True (bool) if the dataframes match.
+        """
+        collisions, buildings = load_sample()
+        buildings.iloc[0, buildings.columns.get_loc('b_status')] = np.nan
+        for name, frame in [('collisions', collisions), ('buildings', buildings)]:
+            path = os.path.join(self.tmp_dir.name, name + '.columns')
+            column_store.write_frame(frame, path)
+            self.assertTrue(column_store.is_column_store(path))
+            result = column_store.read_frame(path)
+            strings = [column for column in frame if frame[column].dtype.kind not in 'iufM']
+            for column in strings:
+                self.assertIsInstance(result[column].dtype, pd.CategoricalDtype)
+            expected = frame.astype({column: 'category' for column in strings})
+            pd.testing.assert_frame_equal(result, expected, check_categorical=False)
+        self.assertTrue(pd.isnull(result['b_status'].iloc[0]))
+
+    def test_read_columns(self):
+        """
+        Tests that a subset of the columns is loaded, in the requested order.
+
+        Returns:
+            True (bool) if the columns match.
+        """
+        _, buildings = load_sample()
+        path = os.path.join(self.tmp_dir.name, 'buildings.columns')
+        column_store.write_frame(buildings, path)
+        result = column_store.read_frame(path, columns=['b_lat', 'b_id'], mmap=False)
+        pd.testing.assert_frame_equal(result, buildings[['b_lat', 'b_id']])
+
+    def test_not_a_store(self):
+        """
+        Tests that a ValueError is raised for a folder without a column store,
+        and for a column that is not stored.
+
+        Returns:
+            True (bool) if ValueError is raised.
+        """
+        with self.assertRaises(ValueError):
+            column_store.read_frame(self.tmp_dir.name)
+        _, buildings = load_sample()
+        column_store.write_frame(buildings, self.tmp_dir.name)
+        with self.assertRaises(ValueError):
+            column_store.read_frame(self.tmp_dir.name, columns=['c_id'])
+
+if __name__ == '__main__':
+    unittest.main()
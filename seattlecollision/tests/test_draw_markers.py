@@ -6,19 +6,28 @@ whether the functions create_map and place_maps from draw_markers.py perform as
 Classes:
     UnitTests: A class created to conduct unit tests on the functions from the draw_markers.py
         module. The test ensures that an IndexError is raised if the input data doesn't contain the
-        correct fields. It also checks that a TypeError is thrown if too many observations are
-        included in the input data. Finally, it throws a TypeError if the b_id is not a key of the
-        data. The class returns a human readable string summarizing the results of the unit tests.
+        correct fields. It also checks that input data with too many observations to draw
+        is binned into a bounded number of grid cell markers below DETAIL_ZOOM, and drawn
+        building by building from DETAIL_ZOOM on. Finally, it throws a TypeError if the
+        b_id is not a key of the data. The class returns a human readable string
+        summarizing the results of the unit tests.
 
 Functions: The five functions are each contained in the UnitTests class
 
     test_col_names: assesses whether incorrect column names result in an IndexError
 
-    test_data_frame_size: assesses whether a data frame that is larger than 800 rows
-        raises TypeError.
+    test_data_frame_size: assesses whether a data frame that is larger than MAX_MARKERS
+        rows is drawn as at most MAX_MARKERS grid cell markers that keep the totals below
+        DETAIL_ZOOM, and as one marker per row from DETAIL_ZOOM on.
 
     test_b_id_is_key: assesses whether b_id a key to input.
 
+    test_marker_layer: assesses whether create_map adds a single marker layer with the
+        colors and radii of the original per-row markers.
+
+    test_place_maps_single_pass: assesses whether place_maps prepares the marker data once
+        for its three maps.
+
 Exceptions:
     AssertionError: If a test fails the class will raise an assertion error, and describe
         which test failed
@@ -29,6 +38,7 @@ Attributes:
 '''
 import sys
 import unittest
+from unittest import mock
 import pandas as pd
 sys.path.append('seattlecollision/')
 sys.path.append('seattlecollision/data')
@@ -51,10 +61,15 @@ class UnitTests(unittest.TestCase):
     Functions:
         test_col_names: assesses whether incorrect column names raises an IndexError.
 
-        test_data_frame_size: assesses whether a dataframe that is too big raises a ValueError.
+        test_data_frame_size: assesses whether a dataframe with more than MAX_MARKERS rows
+            is binned into at most MAX_MARKERS grid cells below DETAIL_ZOOM only.
 
         test_b_id_key: assesses whether building ID is key to the dataframe
 
+        test_marker_layer: assesses whether the marker layer has the expected colors and radii
+
+        test_place_maps_single_pass: assesses whether marker data is prepared once for three maps
+
     Returns: A human readable string that provides a summary of results of the three tests
         conducted within this class.
     '''
@@ -64,8 +79,19 @@ class UnitTests(unittest.TestCase):
         self.assertRaises(IndexError, dm.create_map, TEST_DATA.iloc[:, [0, 4]], "before")
 
     def test_data_frame_size(self):
-        '''Tests whether a TypeError is raised if more than 800 rows are in data.'''
-        self.assertRaises(TypeError, dm.create_map, TEST_DATA.head(801), "before")
+        '''Tests whether more than MAX_MARKERS rows are binned below DETAIL_ZOOM only.'''
+        binned = dm.aggregate_grid(TEST_DATA)
+        self.assertTrue(0 < binned.shape[0] <= dm.MAX_MARKERS)
+        self.assertEqual(binned['buildings'].sum(), TEST_DATA.shape[0])
+        for period in ['before', 'during', 'after']:
+            self.assertEqual(binned[period].sum(), TEST_DATA[period].sum())
+        my_map = dm.create_map(TEST_DATA, "before")
+        layers = [child for child in my_map._children.values() #pylint: disable=protected-access
+                  if isinstance(child, dm.CircleMarkerLayer)]
+        self.assertEqual([(layer.min_zoom, layer.max_zoom) for layer in layers],
+                         [(None, dm.DETAIL_ZOOM - 1), (dm.DETAIL_ZOOM, None)])
+        self.assertEqual(len(layers[0].color), binned.shape[0])
+        self.assertEqual(len(layers[1].color), TEST_DATA.shape[0])
 
     def test_b_id_is_key(self):
         ''' Tests if b_id is a key to function input.'''
@@ -73,5 +99,28 @@ class UnitTests(unittest.TestCase):
         key_unique = len(TEST_DATA.drop_duplicates())
         self.assertTrue(total_unique == key_unique)
 
+    def test_marker_layer(self):
+        '''Tests whether create_map adds one marker layer with the expected markers.'''
+        data = TEST_DATA.head(50)
+        my_map = dm.create_map(data, "during")
+        layers = [child for child in my_map._children.values() #pylint: disable=protected-access
+                  if isinstance(child, dm.CircleMarkerLayer)]
+        self.assertEqual(len(layers), 1)
+        self.assertEqual((layers[0].min_zoom, layers[0].max_zoom), (None, None))
+        expected = [dm.MARKER_COLORS.index(dm.GREEN if row['during'] < row['before'] else
+                                           dm.RED if row['during'] > row['before'] else dm.BLUE)
+                    for _, row in data.iterrows()]
+        self.assertEqual(layers[0].color.tolist(), expected)
+        self.assertEqual(layers[0].radius.tolist(),
+                         (data['during']/dm.RADIUS_ADJUSTMENT).tolist())
+
+    def test_place_maps_single_pass(self):
+        '''Tests whether place_maps prepares the marker data once for all three maps.'''
+        with mock.patch.object(dm, 'marker_data', wraps=dm.marker_data) as prepare:
+            map_grid = dm.place_maps(TEST_DATA.head(50))
+        self.assertEqual(prepare.call_count, 1)
+        html = map_grid.render()
+        self.assertEqual(html.count('L.featureGroup()'), 3)
+
 SUITE = unittest.TestLoader().loadTestsFromTestCase(UnitTests)
 _ = unittest.TextTestRunner().run(SUITE)
@@ -0,0 +1,76 @@
+"""
+COLLIDIUM
+Distance Test Module
+
+This module is executed at each git push, as part of our continuous
+integration design with Travis.
+
+The test_geo_distance.py module uses the unittest package from Python to test
+the vectorized distance modes in the geo_distance module against geopy's
+distance.distance function, using building/collision pairs up to 1500 feet
+apart around Seattle.
+
+ - test_mode_errors: each mode is within its documented maximum error
+ - test_zero_distance: identical points are zero feet apart
+ - test_bad_mode: an unknown mode raises ValueError
+"""
+import sys
+import unittest
+import numpy as np
+sys.path.append('seattlecollision/build_data_libraries/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import geo_distance
+
+# Random pairs up to 1500 feet apart around Seattle
+RNG = np.random.RandomState(47)
+LAT1 = RNG.uniform(47.50, 47.75, 2000)
+LONG1 = RNG.uniform(-122.42, -122.24, 2000)
+BEARING = RNG.uniform(0, 2*np.pi, 2000)
+FEET = RNG.uniform(0, 1500, 2000)
+LAT2 = LAT1 + FEET*np.sin(BEARING)/364000
+LONG2 = LONG1 + FEET*np.cos(BEARING)/(364000*np.cos(np.radians(47.6)))
+
+class TestGeoDistance(unittest.TestCase):
+    """
+    Using the unit test framework, this class tests the distance modes from
+    the geo_distance.py module against geopy.
+    """
+    def test_mode_errors(self):
+        """
+        This tests whether each vectorized mode is within its documented
+        maximum error of geopy's distance.
+
+        Returns:
+            True (bool) if all modes are within their maximum error
+        """
+        geodesic = geo_distance.distance_ft(LAT1, LONG1, LAT2, LONG2)
+        max_error = {'vincenty': 0.0001, 'haversine': 5, 'equirectangular': 0.0001}
+        for mode, error in max_error.items():
+            dist = geo_distance.distance_ft(LAT1, LONG1, LAT2, LONG2, mode=mode)
+            self.assertTrue(np.abs(dist - geodesic).max() < error, mode)
+
+    def test_zero_distance(self):
+        """
+        This tests whether identical points are zero feet apart in every mode.
+
+        Returns:
+            True (bool) if all distances are zero
+        """
+        for mode in geo_distance.DISTANCE_MODES:
+            dist = geo_distance.distance_ft(LAT1[:5], LONG1[:5], LAT1[:5], LONG1[:5], mode=mode)
+            self.assertTrue(np.all(dist == 0), mode)
+
+    def test_bad_mode(self):
+        """
+        This tests whether the correct ValueError exception is raised for an
+        unknown mode.
+
+        Returns:
+            True (bool) if the correct exception is raised.
+        """
+        self.assertRaises(ValueError, geo_distance.distance_ft,
+                          LAT1, LONG1, LAT2, LONG2, mode='not_a_mode')
+
+if __name__ == '__main__':
+    unittest.main()
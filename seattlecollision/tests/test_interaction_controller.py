@@ -0,0 +1,139 @@
+"""
+COLLIDIUM
+Interaction Controller Test Module
+
+The test_interaction_controller.py module uses the unittest package from
+Python to test the InteractionController class:
+ - test_bad_args: tests bad constructor input
+ - test_debounce: tests that a burst of calls runs the function once, with
+   the latest input, and that the controller keeps the function signature
+ - test_drop_superseded: tests that a result finished after newer input
+   arrived is dropped instead of drawn
+ - test_cancel_query: tests that a running query is interrupted when newer
+   input arrives
+"""
+import inspect
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+sys.path.append('seattlecollision/')
+#pylint: disable=import-error
+#pylint: disable=wrong-import-position
+import interactions_functionality as int_func
+from interaction_controller import InteractionController
+
+# Counts to a billion, which takes sqlite far longer than the tests wait
+SLOW_QUERY = ("WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter "
+              "WHERE x < 1000000000) SELECT COUNT(*) FROM counter")
+
+def wait_until(condition, timeout=5):
+    """Polls condition until it is true or timeout seconds have passed."""
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+    return condition()
+
+def radius_interact(radius_from_building, map_detail='Low'):
+    """Stand-in for an *_interact function returning its input."""
+    return (radius_from_building, map_detail)
+
+class TestInteractionController(unittest.TestCase):
+    """
+    Using the unit test framework, InteractionController objects are tested
+    with stand-in *_interact functions.
+    """
+
+    def setUp(self):
+        """Creates the list results are drawn to."""
+        self.drawn = []
+        self.controllers = []
+
+    def tearDown(self):
+        """Stops the controllers' background threads."""
+        for controller in self.controllers:
+            controller.close()
+
+    def controller(self, function, delay):
+        """Returns a controller drawing to self.drawn."""
+        controller = InteractionController(function, delay=delay, draw=self.drawn.append)
+        self.controllers.append(controller)
+        return controller
+
+    def test_bad_args(self):
+        """
+        Tests that a ValueError is raised for a function that is not callable
+        or a negative delay.
+
+        Returns:
+            True (bool) if ValueError is raised.
+        """
+        with self.assertRaises(ValueError):
+            InteractionController('radius_interact')
+        with self.assertRaises(ValueError):
+            InteractionController(radius_interact, delay=-1)
+
+    def test_debounce(self):
+        """
+        Tests that a burst of calls runs the function once with the latest
+        input, and that the controller has the function's signature.
+
+        Returns:
+            True (bool) if only the latest input is drawn.
+        """
+        controller = self.controller(radius_interact, 0.2)
+        self.assertEqual(inspect.signature(controller), inspect.signature(radius_interact))
+        for radius in range(1500, 700, -100):
+            controller(radius_from_building=radius)
+        self.assertTrue(controller.wait(timeout=5))
+        self.assertEqual(self.drawn, [(800, 'Low')])
+        self.assertEqual((controller.submitted, controller.started, controller.drawn), (8, 1, 1))
+
+    def test_drop_superseded(self):
+        """
+        Tests that a result finished after newer input arrived is dropped.
+
+        Returns:
+            True (bool) if only the newer result is drawn.
+        """
+        def slow_interact(radius_from_building):
+            time.sleep(0.3)
+            return radius_from_building
+        controller = self.controller(slow_interact, 0)
+        controller(1500)
+        self.assertTrue(wait_until(lambda: controller.started == 1))
+        controller(800)
+        self.assertTrue(controller.wait(timeout=5))
+        self.assertEqual(self.drawn, [800])
+        self.assertEqual((controller.started, controller.dropped), (2, 1))
+
+    def test_cancel_query(self):
+        """
+        Tests that a query still running when newer input arrives is
+        interrupted, and the newer input is drawn.
+
+        Returns:
+            True (bool) if the query is cancelled and the newer result drawn.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, 'Collidium')
+            sqlite3.connect(database).execute('CREATE TABLE t (x INTEGER)').connection.close()
+            def query_interact(query):
+                sql_cursor = int_func.generate_connection(database)
+                return sql_cursor.execute(query).fetchone()[0]
+            controller = self.controller(query_interact, 0)
+            controller(SLOW_QUERY)
+            self.assertTrue(wait_until(lambda: controller.started == 1))
+            time.sleep(0.1)
+            start = time.time()
+            controller('SELECT 800')
+            self.assertTrue(controller.wait(timeout=10))
+            self.assertLess(time.time() - start, 5)
+            self.assertEqual(self.drawn, [800])
+            self.assertEqual(controller.cancelled, 1)
+            int_func.close_connections(database)
+
+if __name__ == '__main__':
+    unittest.main()
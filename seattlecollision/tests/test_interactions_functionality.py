@@ -12,7 +12,9 @@ Classes:
         the sample connection connects to a table with the required column names, and
         that is at least a minimum of 10,000 rows long. Additionally the class validates
         that the function will raise a ValueError if it is connected to an invalid
-        directory.
+        directory, and that pooled connections are reused, read-only, separate for
+        each thread, closed by close_connections and reopened once the database file
+        is replaced.
 
     TestGenerateTable: This class conducts three tests on the generate_table function.
         The first test alidates that the function assigns column names to the table.
@@ -46,7 +48,11 @@ Attributes:
         local machine.
 
 """
+import os
+import sqlite3
 import sys
+import tempfile
+import threading
 import unittest
 
 sys.path.append('../')
@@ -55,7 +61,10 @@ sys.path.append('seattlecollision/data')
 sys.path.append('seattlecollision/tests')
 #pylint: disable=import-error
 #pylint: disable=wrong-import-position
+import numpy as np
+import pandas as pd
 import interactions_functionality as int_func
+from query_class import CollidiumQuery, RESULT_SCHEMA
 
 DATA_DIRECTORY = "seattlecollision/data/Collidium" # Select if running on Travis, else comment out
 # DATA_DIRECTORY = "../data/Collidium" # Select this if running on local machine, else comment out.
@@ -83,16 +92,22 @@ class TestGenerateConnections(unittest.TestCase):
             Parameters: self
             Returns: Pass if table invalid path raises exception, and fail otherwise.
 
+        test_connection_pool: Tests whether connections are reused within a thread, are
+            read-only, differ between threads, are closed by close_connections and are
+            reopened once the database file is replaced or raise once it is removed.
+            Parameters: self
+            Returns: Pass if the pool behaves as described, and fail otherwise.
+
     Returns: A human readable string that provides a summary of results of the five tests
         conducted within this class.
     '''
 
     def test_col_names(self):
         '''Tests whether function connects to DB with the correct column names.'''
-        true_cols = set(['b_category', 'b_end_dt', 'b_id', 'b_lat', 'b_long', 'b_start_dt',
-                         'base_year', 'c_dt', 'c_id', 'c_lat', 'c_long', 'c_severity', 'c_type',
-                         'coll_after', 'coll_before', 'coll_days_from_build', 'coll_during',
-                         'radius'])
+        true_cols = set(['b_build_days', 'b_category', 'b_end_dt', 'b_id', 'b_lat', 'b_long',
+                         'b_start_dt', 'base_year', 'c_dt', 'c_id', 'c_lat', 'c_long',
+                         'c_severity', 'c_type', 'coll_after', 'coll_before',
+                         'coll_days_from_build', 'coll_during', 'radius'])
         TEST_CONNECTION.execute('PRAGMA TABLE_INFO({})'.format('collidium_data'))
         test_cols = TEST_CONNECTION.execute('PRAGMA TABLE_INFO({})'.format('collidium_data'))
         test_cols = set([tup[1] for tup in TEST_CONNECTION.fetchall()])
@@ -110,6 +125,39 @@ class TestGenerateConnections(unittest.TestCase):
         '''Tests whether an invalid path raises a ValueError exception.'''
         self.assertRaises(Exception, int_func.generate_connection, 'badPath')
 
+    def test_connection_pool(self):
+        '''Tests connection reuse, read-only access, threads and closing.'''
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, 'pool.db')
+            sqlite3.connect(database).close()
+            connection = int_func.generate_connection(database).connection
+            self.assertIs(int_func.generate_connection(database).connection, connection)
+            with self.assertRaises(sqlite3.OperationalError):
+                connection.execute('CREATE TABLE pool_test (x INTEGER)')
+            other = []
+            thread = threading.Thread(target=lambda: other.append(
+                int_func.generate_connection(database).connection))
+            thread.start()
+            thread.join()
+            self.assertIsNot(other[0], connection)
+            int_func.close_connections(database)
+            with self.assertRaises(sqlite3.ProgrammingError):
+                connection.execute('SELECT 1')
+            connection = int_func.generate_connection(database).connection
+            self.assertIsNot(connection, other[0])
+            replacement = os.path.join(tmp_dir, 'replacement.db')
+            replacement_connection = sqlite3.connect(replacement)
+            replacement_connection.execute('CREATE TABLE pool_test (x INTEGER)')
+            replacement_connection.close()
+            os.replace(replacement, database)
+            sql_cursor = int_func.generate_connection(database)
+            self.assertIsNot(sql_cursor.connection, connection)
+            sql_cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            self.assertEqual(sql_cursor.fetchall(), [('pool_test',)])
+            os.remove(database)
+            self.assertRaises(ValueError, int_func.generate_connection, database)
+            int_func.close_connections(database)
+
 
 SUITE = unittest.TestLoader().loadTestsFromTestCase(TestGenerateConnections)
 _ = unittest.TextTestRunner().run(SUITE)
@@ -140,6 +188,11 @@ class TestGenerateTable(unittest.TestCase):
             Parameters: self
             Returns: Pass if invalid path raises a ValueError, and fail otherwise.
 
+        test_columnar_fetch: Tests that CollidiumQuery results fetched into typed numpy
+            arrays match pandas.read_sql, including integer columns holding NULL values.
+            Parameters: self
+            Returns: Pass if the dataframes match, and fail otherwise.
+
     Returns: A human readable string that provides a summary of results of the five tests
         conducted within this class.
     '''
@@ -154,7 +207,8 @@ class TestGenerateTable(unittest.TestCase):
     def test_zero_data_points(self):
         '''Tests that a query that eliminates all datapoints will return an empty dataframe'''
         query = ("""SELECT b_id, b_lat, b_long, SUM(coll_before) AS before,
-                 SUM(coll_during)*1.000000 AS during, SUM(coll_after) AS after
+                 SUM(coll_during)*365.000000/MAX(b_build_days) AS during,
+                 SUM(coll_after) AS after
                  FROM collidium_data
                  WHERE radius < 1500 AND base_year = 2017 AND b_category = 'INDUSTRIAL'
                  AND c_severity = 'Fatality' AND c_type = 'Bike/Pedestrian'
@@ -167,6 +221,19 @@ class TestGenerateTable(unittest.TestCase):
         '''Tests whether an invalid path raises a ValueError exception.'''
         self.assertRaises(Exception, int_func.generate_table, 'badPath')
 
+    def test_columnar_fetch(self):
+        '''Tests that the columnar fetch matches pandas.read_sql.'''
+        query = CollidiumQuery(radius=1000).get_qstring()
+        expected = pd.read_sql(query, sqlite3.connect(DATA_DIRECTORY))
+        pd.testing.assert_frame_equal(int_func.generate_table(query, DATA_DIRECTORY), expected)
+        cursor = sqlite3.connect(':memory:').execute(
+            "SELECT 1 AS b_id, 47.6 AS b_lat, -122.3 AS b_long, 2 AS before, "
+            "0.5 AS during, 3 AS after UNION ALL SELECT 2, NULL, -122.4, NULL, 1.5, 4")
+        table = int_func.fetch_columnar(cursor, RESULT_SCHEMA, batch_size=1)
+        pd.testing.assert_frame_equal(table, pd.DataFrame({
+            'b_id': [1, 2], 'b_lat': [47.6, np.nan], 'b_long': [-122.3, -122.4],
+            'before': [2, np.nan], 'during': [0.5, 1.5], 'after': [3, 4]}))
+
 
 SUITE = unittest.TestLoader().loadTestsFromTestCase(TestGenerateTable)
 _ = unittest.TextTestRunner().run(SUITE)
@@ -25,9 +25,28 @@ check that there are at least 10 rows in each DataFrame:
  - test_buildings_rows
  - test_collisions_rows
  - test_collidium_rows
+
+The pair engines and distance modes used by create_collidium_table are
+checked against the original nested loop on the bundled sample data:
+ - test_collidium_engine_parity
+
+Tables built with a wider radius and window contain the default table:
+ - test_collidium_limits
+
+Raw date strings in either raw data format are parsed the same way as with
+datetime.strptime, with missing values kept as NaT:
+ - test_parse_dates
+
+Streaming the raw files in chunks gives the same cleaned DataFrames as
+reading them whole, with the repeated string columns as Categoricals:
+ - test_chunked_clean
 """
+from datetime import datetime
+import os
 import sys
+import tempfile
 import unittest
+import numpy as np
 import pandas as pd
 sys.path.append('seattlecollision/build_data_libraries/')
 sys.path.append('seattlecollsion/data')
@@ -36,6 +55,8 @@ sys.path.append('seattlecollsion/data')
 from process_data import buildings_clean
 from process_data import collisions_clean
 from process_data import create_collidium_table
+from process_data import _parse_dates
+from process_data import COLLISIONS_CATEGORICAL, BUILDINGS_CATEGORICAL
 
 class TestProcessData(unittest.TestCase):
     """
@@ -59,6 +80,21 @@ class TestProcessData(unittest.TestCase):
      - test_buildings_rows
      - test_collisions_rows
      - test_collidium_rows
+
+    The pair engines and distance modes used by create_collidium_table are
+    checked against the original nested loop on the bundled sample data:
+     - test_collidium_engine_parity
+
+    Tables built with a wider radius and window contain the default table:
+     - test_collidium_limits
+
+    Raw date strings in either raw data format are parsed the same way as with
+    datetime.strptime, with missing values kept as NaT:
+     - test_parse_dates
+
+    Streaming the raw files in chunks gives the same cleaned DataFrames as
+    reading them whole, with the repeated string columns as Categoricals:
+     - test_chunked_clean
     """
     def test_collisions_file_path(self):
         """
@@ -193,5 +229,146 @@ class TestProcessData(unittest.TestCase):
         processed_collidium_output = create_collidium_table(good_colls, good_builds_1)
         self.assertTrue(processed_collidium_output.shape[0] >= 10)
 
+    def test_collidium_engine_parity(self):
+        """
+        This tests whether the grid and brute pair engines (serial and with
+        two worker processes) build the same collidium table as the original
+        nested loop, and whether the vincenty distance mode matches it to
+        within float tolerance. The categories of c_severity are the
+        severities of every input collision, without their ' Collision' suffix.
+
+        The bundled buildings.csv and Test_Data_For_Process_Data.csv files are
+        used. Only the first ten buildings are used to limit computation time.
+
+        Args:
+
+        Returns:
+            True (bool) if the tables are identical
+        """
+        builds = pd.read_csv("seattlecollision/data/buildings.csv", index_col=0,
+                             parse_dates=["b_issue_date", "b_final_date"]).head(10)
+        colls = pd.read_csv("seattlecollision/data/Test_Data_For_Process_Data.csv",
+                            index_col=0, parse_dates=["c_datetime"],
+                            dtype={"c_severity_code": str})
+        loop_output = create_collidium_table(colls, builds, engine='loop')
+        self.assertTrue(loop_output.shape[0] >= 10)
+        for engine in ('grid', 'brute'):
+            engine_output = create_collidium_table(colls, builds, engine=engine)
+            pd.testing.assert_frame_equal(loop_output, engine_output)
+        parallel_output = create_collidium_table(colls, builds, workers=2)
+        pd.testing.assert_frame_equal(loop_output, parallel_output)
+        vincenty_output = create_collidium_table(colls, builds, distance_mode='vincenty')
+        pd.testing.assert_frame_equal(loop_output, vincenty_output, check_exact=False)
+        self.assertEqual(list(loop_output['c_severity'].cat.categories),
+                         ['Fatality', 'Injury', 'Property Damage Only', 'Serious Injury'])
+        self.assertRaises(ValueError, create_collidium_table, colls, builds, engine='bad')
+        self.assertRaises(ValueError, create_collidium_table, colls, builds,
+                          distance_mode='bad')
+        self.assertRaises(ValueError, create_collidium_table, colls, builds, workers=0)
+
+    def test_collidium_limits(self):
+        """
+        This tests whether a table built with a 2500 foot radius and a 24
+        month window matches the nested loop, and gives the default table
+        when its pairs are restricted to 1500 feet and 365 days, and whether
+        invalid limits raise a ValueError.
+
+        Only the first ten buildings are used to limit computation time.
+
+        Args:
+
+        Returns:
+            True (bool) if the tables are identical
+        """
+        builds = pd.read_csv("seattlecollision/data/buildings.csv", index_col=0,
+                             parse_dates=["b_issue_date", "b_final_date"]).head(10)
+        colls = pd.read_csv("seattlecollision/data/Test_Data_For_Process_Data.csv",
+                            index_col=0, parse_dates=["c_datetime"],
+                            dtype={"c_severity_code": str})
+        wide = create_collidium_table(colls, builds, radius=2500, window=24)
+        pd.testing.assert_frame_equal(
+            wide, create_collidium_table(colls, builds, engine='loop', radius=2500, window=24))
+        default = create_collidium_table(colls, builds)
+        self.assertTrue(wide.shape[0] > default.shape[0])
+        self.assertTrue(wide["coll_days_from_build"].abs().max() <= 730)
+        inside = (wide["radius"] <= 1500) & (wide["coll_days_from_build"].abs() <= 365)
+        pd.testing.assert_frame_equal(wide[inside].reset_index(drop=True), default)
+        self.assertRaises(ValueError, create_collidium_table, colls, builds, radius=0)
+        self.assertRaises(ValueError, create_collidium_table, colls, builds, window=1.5)
+
+    def test_parse_dates(self):
+        """
+        This tests whether mixed format date strings are parsed to the same
+        dates as datetime.strptime, and whether missing and malformed values
+        are NaT.
+
+        Args:
+
+        Returns:
+            True (bool) if the parsed dates match
+        """
+        raw = pd.Series(['1/2/2014 05:30:00 PM', '12/31/2013', np.nan,
+                         '3/4/2015 11:00:00 AM', 'not a date', '12/31/2013'],
+                        index=[5, 3, 1, 0, 2, 4])
+        parsed = _parse_dates(raw, ['%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y'])
+        expected = pd.Series([datetime(2014, 1, 2, 17, 30), datetime(2013, 12, 31), pd.NaT,
+                              datetime(2015, 3, 4, 11), pd.NaT, datetime(2013, 12, 31)],
+                             index=[5, 3, 1, 0, 2, 4], dtype='datetime64[ns]')
+        pd.testing.assert_series_equal(parsed, expected)
+
+    def test_chunked_clean(self):
+        """
+        This tests whether collisions_clean and buildings_clean return the same
+        DataFrames when the raw files are streamed in chunks, and whether
+        their repeated string columns are Categoricals.
+
+        Small raw files are written to a temporary folder. The chunk size is
+        chosen so that some chunks have no surviving rows.
+
+        Args:
+
+        Returns:
+            True (bool) if the chunked and whole-file outputs are identical
+        """
+        raw_colls = pd.DataFrame({
+            "X": [-122.31, -122.32, -122.33, -122.34, -122.35, -122.36, -122.37],
+            "Y": [47.61, 47.62, 47.63, 47.64, 47.65, 47.66, 47.67],
+            "objectid": [1, 2, 3, 4, 5, 6, 7],
+            "location": ["A ST", "B ST", "C ST", "D ST", "E ST", "F ST", "G ST"],
+            "incdttm": ["1/2/2010", "3/4/2011 10:00:00 AM", "5/6/2014",
+                        "7/8/2015 05:30:00 PM", "9/10/2016", "11/12/2017", "1/2/2018"],
+            "pedcount": [0, 1, 0, 1, 0, 0, 0],
+            "pedcylcount": [0, 0, 1, 0, 0, 0, 1],
+            "severitycode": ["1", "2", "2b", "3", "0", "1", "2"],
+            "severitydesc": ["Property Damage Only Collision", "Injury Collision",
+                             "Serious Injury Collision", "Fatality Collision", "Unknown",
+                             "Property Damage Only Collision", "Injury Collision"]})
+        raw_builds = pd.DataFrame({
+            "Application/Permit Number": [10, 11, 12, 13, 14],
+            "Category": ["COMMERCIAL", "MULTIFAMILY", "INDUSTRIAL", "MULTIFAMILY",
+                         "INSTITUTIONAL"],
+            "Action Type": ["NEW", "ADD/ALT", "NEW", "NEW", "NEW"],
+            "Value": [2000000.0, 3000000.0, 500000.0, 4000000.0, 5000000.0],
+            "Issue Date": ["2014-01-02", "2014-02-03", "2015-03-04", "2015-04-05", np.nan],
+            "Final Date": ["2015-01-02", "2016-02-03", "2016-03-04", "2016-04-05", np.nan],
+            "Status": ["Permit Closed", "Permit Closed", "Permit Closed",
+                       "Permit Finaled", "Permit Closed"],
+            "Latitude": [47.61, 47.62, 47.63, 47.64, 47.65],
+            "Longitude": [-122.31, -122.32, -122.33, -122.34, -122.35]})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            colls_path = os.path.join(tmp_dir, "raw_collisions_input.csv")
+            builds_path = os.path.join(tmp_dir, "raw_buildings_input.csv")
+            raw_colls.to_csv(colls_path, index=False)
+            raw_builds.to_csv(builds_path)
+            colls = collisions_clean(colls_path)
+            builds = buildings_clean(builds_path)
+            self.assertTrue(colls.shape[0] == 4 and builds.shape[0] == 2)
+            pd.testing.assert_frame_equal(colls, collisions_clean(colls_path, chunksize=2))
+            pd.testing.assert_frame_equal(builds, buildings_clean(builds_path, chunksize=2))
+            for frame, columns in [(colls, COLLISIONS_CATEGORICAL),
+                                   (builds, BUILDINGS_CATEGORICAL)]:
+                for column in columns:
+                    self.assertIsInstance(frame[column].dtype, pd.CategoricalDtype)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,130 @@
+"""
+COLLIDIUM
+Query Cache Test Module
+
+The test_query_cache.py module uses the unittest package from Python to test
+the QueryCache class of the query_cache module:
+ - test_bad_max_bytes: tests bad constructor input for max_bytes
+ - test_hit_and_miss: tests that stored results are returned as copies,
+   and that the hit and miss counters are kept
+ - test_lru_eviction: tests that the least recently used entries are
+   evicted first when the cache is full, and results larger than the
+   cache are not stored
+ - test_invalidation: tests that entries are discarded once the database
+   file changes
+ - test_bytes_entries: tests that bytes entries are sized by their length
+"""
+import os
+import sys
+import tempfile
+import unittest
+import pandas as pd
+sys.path.append('seattlecollision/')
+#pylint: disable=import-error
+#pylint: disable=wrong-import-position
+from query_cache import QueryCache
+
+def result(rows):
+    """Returns a query result style dataframe with the given number of rows."""
+    return pd.DataFrame({'b_id': range(rows), 'before': 1, 'during': 0.5, 'after': 2})
+
+class TestQueryCache(unittest.TestCase):
+    """
+    Using the unit test framework, QueryCache objects are tested for their
+    lookups, counters, eviction and invalidation.
+    """
+
+    def setUp(self):
+        """Creates a temporary database file for each test."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmp_dir.name, 'Collidium')
+        with open(self.database, 'w') as database:
+            database.write('version 1')
+
+    def tearDown(self):
+        """Removes the temporary database file."""
+        self.tmp_dir.cleanup()
+
+    def test_bad_max_bytes(self):
+        """
+        Tests that a ValueError is raised when max_bytes is not a positive int.
+
+        Returns:
+            True (bool) if ValueError is raised.
+        """
+        with self.assertRaises(ValueError):
+            QueryCache(max_bytes=0)
+
+    def test_hit_and_miss(self):
+        """
+        Tests that a stored result is returned (as a copy) and that hits and
+        misses are counted.
+
+        Returns:
+            True (bool) if the result and counters are as expected.
+        """
+        cache = QueryCache()
+        self.assertIsNone(cache.get(self.database, ('All', 1500)))
+        cache.put(self.database, ('All', 1500), result(10))
+        cached = cache.get(self.database, ('All', 1500))
+        pd.testing.assert_frame_equal(cached, result(10))
+        cached['before'] = 0
+        pd.testing.assert_frame_equal(cache.get(self.database, ('All', 1500)), result(10))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 1, 1))
+
+    def test_lru_eviction(self):
+        """
+        Tests that the least recently used entry is evicted when the cache is
+        full, and that a result larger than the cache is not stored.
+
+        Returns:
+            True (bool) if the expected entries are kept.
+        """
+        size = int(result(100).memory_usage(deep=True).sum())
+        cache = QueryCache(max_bytes=2*size)
+        cache.put(self.database, 'a', result(100))
+        cache.put(self.database, 'b', result(100))
+        cache.get(self.database, 'a')
+        cache.put(self.database, 'c', result(100))
+        self.assertIsNone(cache.get(self.database, 'b'))
+        self.assertIsNotNone(cache.get(self.database, 'a'))
+        self.assertIsNotNone(cache.get(self.database, 'c'))
+        cache.put(self.database, 'd', result(1000))
+        self.assertIsNone(cache.get(self.database, 'd'))
+        stats = cache.stats()
+        self.assertEqual((stats['evictions'], stats['entries'], stats['bytes']),
+                         (1, 2, 2*size))
+
+    def test_invalidation(self):
+        """
+        Tests that an entry is discarded once the database file is modified.
+
+        Returns:
+            True (bool) if the stale entry is not returned.
+        """
+        cache = QueryCache()
+        cache.put(self.database, 'a', result(10))
+        stat = os.stat(self.database)
+        os.utime(self.database, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNone(cache.get(self.database, 'a'))
+        stats = cache.stats()
+        self.assertEqual((stats['invalidations'], stats['entries']), (1, 0))
+
+    def test_bytes_entries(self):
+        """
+        Tests that bytes (e.g. encoded responses) are stored and sized by
+        their length.
+
+        Returns:
+            True (bool) if the bytes are returned and counted.
+        """
+        cache = QueryCache(max_bytes=100)
+        cache.put(self.database, 'a', b'{"buildings":0}')
+        cache.put(self.database, 'b', b'x'*101)
+        self.assertEqual(cache.get(self.database, 'a'), b'{"buildings":0}')
+        self.assertIsNone(cache.get(self.database, 'b'))
+        self.assertEqual(cache.stats()['bytes'], 15)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -29,6 +29,7 @@ method:
  - test_bad_arg_set_duration: tests bad set_duration() input
  - test_bad_arg_set_c_severity: tests bad set_c_severity() input
  - test_bad_arg_set_c_type: tests bad set_c_type() input
+ - test_bad_arg_set_rollup: tests bad set_rollup() input
 
 Examples are tested against expected query strings when appropriate input
 is provided:
@@ -45,6 +46,16 @@ is provided:
    when valid b_category (as list) is arg for set_b_category()
  - test_set_duration: tests for expected query string output
    when valid duration is arg for set_duration()
+ - test_get_key: tests that equivalent attribute values give equal keys
+ - test_rollup_qstring: tests for expected rollup query string output
+ - test_get_statement: tests for expected parameterized statements and
+   parameters (with the codes of the filter labels), shared between
+   filter values of the same shape, the rollup parameters when rollup
+   is set, and the star schema fallback when radius is not a multiple
+   of ROLLUP_RADIUS_STEP
+ - test_limits: tests that radius and duration are validated against the
+   max_radius and max_duration limits, and the duration filter of queries
+   of databases built with a wider window
 """
 import sys
 import unittest
@@ -189,10 +200,13 @@ class TestQueryClass(unittest.TestCase):
         """
         tmp = cq.CollidiumQuery()
         self.assertTrue(tmp.get_qstring() == "SELECT b_id, b_lat, b_long, "+\
-                        "SUM(coll_before) AS before, SUM(coll_during)*1.000000 " +\
-                        "AS during, SUM(coll_after) AS after FROM collidium_data " +\
-                        "WHERE radius < 1500 AND base_year = 2016 GROUP BY " +\
-                        "b_id, b_lat, b_long")
+                        "SUM(coll_before) AS before, SUM(coll_during)*365.000000/" +\
+                        "MAX(b_build_days) AS during, SUM(coll_after) AS after " +\
+                        "FROM buildings JOIN collidium_pairs USING (b_id) " +\
+                        "WHERE radius < 1500 AND base_year = 2016 " +\
+                        "AND (coll_days_from_build BETWEEN 0 AND 365 OR " +\
+                        "coll_days_from_build BETWEEN -365 AND -1) " +\
+                        "GROUP BY b_id, b_lat, b_long")
 
     def test_constr_b_category_str(self):
         """
@@ -204,10 +218,13 @@ class TestQueryClass(unittest.TestCase):
         """
         tmp = cq.CollidiumQuery(b_category='COMMERCIAL')
         self.assertTrue(tmp.get_qstring() == "SELECT b_id, b_lat, b_long, "+\
-                        "SUM(coll_before) AS before, SUM(coll_during)*1.000000 " +\
-                        "AS during, SUM(coll_after) AS after FROM collidium_data " +\
+                        "SUM(coll_before) AS before, SUM(coll_during)*365.000000/" +\
+                        "MAX(b_build_days) AS during, SUM(coll_after) AS after " +\
+                        "FROM buildings JOIN collidium_pairs USING (b_id) " +\
                         "WHERE radius < 1500 AND base_year = 2016 " +\
-                        "AND b_category = 'COMMERCIAL' " +\
+                        "AND (coll_days_from_build BETWEEN 0 AND 365 OR " +\
+                        "coll_days_from_build BETWEEN -365 AND -1) " +\
+                        "AND b_category = 1 " +\
                         "GROUP BY b_id, b_lat, b_long")
 
     def test_constr_b_category_list(self):
@@ -220,10 +237,13 @@ class TestQueryClass(unittest.TestCase):
         """
         tmp = cq.CollidiumQuery(b_category=['COMMERCIAL', 'INDUSTRIAL'])
         self.assertTrue(tmp.get_qstring() == "SELECT b_id, b_lat, b_long, "+\
-                        "SUM(coll_before) AS before, SUM(coll_during)*1.000000 " +\
-                        "AS during, SUM(coll_after) AS after FROM collidium_data " +\
+                        "SUM(coll_before) AS before, SUM(coll_during)*365.000000/" +\
+                        "MAX(b_build_days) AS during, SUM(coll_after) AS after " +\
+                        "FROM buildings JOIN collidium_pairs USING (b_id) " +\
                         "WHERE radius < 1500 AND base_year = 2016 " +\
-                        "AND b_category IN ('COMMERCIAL', 'INDUSTRIAL') " +\
+                        "AND (coll_days_from_build BETWEEN 0 AND 365 OR " +\
+                        "coll_days_from_build BETWEEN -365 AND -1) " +\
+                        "AND b_category IN (1, 3) " +\
                         "GROUP BY b_id, b_lat, b_long")
 
     def test_set_b_category_str(self):
@@ -237,10 +257,13 @@ class TestQueryClass(unittest.TestCase):
         tmp = cq.CollidiumQuery()
         tmp.set_b_category('COMMERCIAL')
         self.assertTrue(tmp.get_qstring() == "SELECT b_id, b_lat, b_long, "+\
-                        "SUM(coll_before) AS before, SUM(coll_during)*1.000000 " +\
-                        "AS during, SUM(coll_after) AS after FROM collidium_data " +\
+                        "SUM(coll_before) AS before, SUM(coll_during)*365.000000/" +\
+                        "MAX(b_build_days) AS during, SUM(coll_after) AS after " +\
+                        "FROM buildings JOIN collidium_pairs USING (b_id) " +\
                         "WHERE radius < 1500 AND base_year = 2016 " +\
-                        "AND b_category = 'COMMERCIAL' " +\
+                        "AND (coll_days_from_build BETWEEN 0 AND 365 OR " +\
+                        "coll_days_from_build BETWEEN -365 AND -1) " +\
+                        "AND b_category = 1 " +\
                         "GROUP BY b_id, b_lat, b_long")
 
     def test_set_b_category_list(self):
@@ -254,10 +277,13 @@ class TestQueryClass(unittest.TestCase):
         tmp = cq.CollidiumQuery()
         tmp.set_b_category(['COMMERCIAL', 'INDUSTRIAL'])
         self.assertTrue(tmp.get_qstring() == "SELECT b_id, b_lat, b_long, "+\
-                        "SUM(coll_before) AS before, SUM(coll_during)*1.000000 " +\
-                        "AS during, SUM(coll_after) AS after FROM collidium_data " +\
+                        "SUM(coll_before) AS before, SUM(coll_during)*365.000000/" +\
+                        "MAX(b_build_days) AS during, SUM(coll_after) AS after " +\
+                        "FROM buildings JOIN collidium_pairs USING (b_id) " +\
                         "WHERE radius < 1500 AND base_year = 2016 " +\
-                        "AND b_category IN ('COMMERCIAL', 'INDUSTRIAL') " +\
+                        "AND (coll_days_from_build BETWEEN 0 AND 365 OR " +\
+                        "coll_days_from_build BETWEEN -365 AND -1) " +\
+                        "AND b_category IN (1, 3) " +\
                         "GROUP BY b_id, b_lat, b_long")
 
     def test_constr_duration(self):
@@ -270,8 +296,9 @@ class TestQueryClass(unittest.TestCase):
         """
         tmp = cq.CollidiumQuery(duration=5)
         self.assertTrue(tmp.get_qstring() == "SELECT b_id, b_lat, b_long, "+\
-                        "SUM(coll_before) AS before, SUM(coll_during)*0.416667 " +\
-                        "AS during, SUM(coll_after) AS after FROM collidium_data " +\
+                        "SUM(coll_before) AS before, SUM(coll_during)*152.000000/" +\
+                        "MAX(b_build_days) AS during, SUM(coll_after) AS after " +\
+                        "FROM buildings JOIN collidium_pairs USING (b_id) " +\
                         "WHERE radius < 1500 AND base_year = 2016 " +\
                         "AND (coll_days_from_build BETWEEN 0 AND 152 OR " +\
                         "coll_days_from_build BETWEEN -152 AND -1) " +\
@@ -288,12 +315,116 @@ class TestQueryClass(unittest.TestCase):
         tmp = cq.CollidiumQuery()
         tmp.set_duration(5)
         self.assertTrue(tmp.get_qstring() == "SELECT b_id, b_lat, b_long, "+\
-                        "SUM(coll_before) AS before, SUM(coll_during)*0.416667 " +\
-                        "AS during, SUM(coll_after) AS after FROM collidium_data " +\
+                        "SUM(coll_before) AS before, SUM(coll_during)*152.000000/" +\
+                        "MAX(b_build_days) AS during, SUM(coll_after) AS after " +\
+                        "FROM buildings JOIN collidium_pairs USING (b_id) " +\
                         "WHERE radius < 1500 AND base_year = 2016 " +\
                         "AND (coll_days_from_build BETWEEN 0 AND 152 OR " +\
                         "coll_days_from_build BETWEEN -152 AND -1) " +\
                         "GROUP BY b_id, b_lat, b_long")
 
+    def test_bad_arg_set_rollup(self):
+        """
+        Tests that a ValueError is raised when set_rollup gets a non bool arg.
+
+        Returns:
+            True (bool) if ValueError is raised.
+        """
+        tmp = cq.CollidiumQuery()
+        with self.assertRaises(ValueError):
+            tmp.set_rollup('yes')
+
+    def test_get_key(self):
+        """
+        Tests that the cache key is normalized: list order, duplicates, one
+        element lists and the rollup attribute do not change it.
+
+        Returns:
+            True (bool) if the expected keys are returned.
+        """
+        tmp = cq.CollidiumQuery(b_category=['INDUSTRIAL', 'COMMERCIAL', 'INDUSTRIAL'],
+                                c_severity=['Injury'], rollup=True)
+        self.assertEqual(tmp.get_key(), (('COMMERCIAL', 'INDUSTRIAL'), 1500, 2016, 12,
+                                         'Injury', 'All'))
+        self.assertEqual(tmp.get_key(), cq.CollidiumQuery(
+            b_category=['COMMERCIAL', 'INDUSTRIAL'], c_severity='Injury').get_key())
+
+    def test_rollup_qstring(self):
+        """
+        Tests that the query string matches expected rollup query when rollup
+        is set, and falls back to the star schema tables for other radii.
+
+        Returns:
+            True (bool) if the correct query strings are returned.
+        """
+        tmp = cq.CollidiumQuery(duration=5, rollup=True)
+        self.assertTrue(tmp.get_qstring() == "SELECT b_id, b_lat, b_long, "+\
+                        "SUM(coll_before) AS before, SUM(coll_during)*152.000000/" +\
+                        "MAX(b_build_days) AS during, SUM(coll_after) AS after " +\
+                        "FROM collidium_rollup " +\
+                        "WHERE radius_bucket < 1500 AND base_year = 2016 " +\
+                        "AND duration_bucket <= 5 " +\
+                        "GROUP BY b_id, b_lat, b_long")
+        tmp.set_radius(1450)
+        self.assertTrue("USING (b_id) WHERE radius < 1450 " in tmp.get_qstring())
+
+    def test_get_statement(self):
+        """
+        Tests that the parameterized statement and parameters match expected
+        values, and that queries of the same shape share the statement.
+
+        Returns:
+            True (bool) if the correct statements and parameters are returned.
+        """
+        tmp = cq.CollidiumQuery(b_category=['INDUSTRIAL', 'COMMERCIAL'], duration=5,
+                                c_type='Vehicle Only')
+        self.assertEqual(tmp.get_statement(), (
+            "SELECT b_id, b_lat, b_long, SUM(coll_before) AS before, " +\
+            "SUM(coll_during)*?/MAX(b_build_days) AS during, SUM(coll_after) AS after " +\
+            "FROM buildings JOIN collidium_pairs USING (b_id) " +\
+            "WHERE radius < ? AND base_year = ? " +\
+            "AND (coll_days_from_build BETWEEN 0 AND ? OR " +\
+            "coll_days_from_build BETWEEN ? AND -1) " +\
+            "AND b_category IN (?, ?) AND c_type = ? " +\
+            "GROUP BY b_id, b_lat, b_long",
+            (152.0, 1500, 2016, 152, -152, 1, 3, 1)))
+        other = cq.CollidiumQuery(b_category=['MULTIFAMILY', 'INSTITUTIONAL'], radius=800,
+                                  base_year=2014, duration=7, c_type=['Bike/Pedestrian'])
+        self.assertEqual(other.get_statement()[0], tmp.get_statement()[0])
+        self.assertEqual(other.get_statement()[1][-3:], (2, 4, 2))
+        tmp.set_rollup(True)
+        self.assertEqual(tmp.get_statement()[1],
+                         (152.0, 1500, 2016, 5, 1, 3, 1))
+
+    def test_limits(self):
+        """
+        Tests that radius and duration above the default limits raise errors,
+        and are accepted with wider limits, with the duration filter kept at
+        the window of the limits.
+
+        Returns:
+            True (bool) if the expected errors and query strings are returned.
+        """
+        with self.assertRaises(AttributeError):
+            cq.CollidiumQuery(radius=2500)
+        with self.assertRaises(AttributeError):
+            cq.CollidiumQuery(duration=12, max_duration=0)
+        tmp = cq.CollidiumQuery(radius=2500, duration=24, max_radius=2500, max_duration=24)
+        self.assertTrue("radius < 2500 AND base_year = 2016 AND (coll_days_from_build " +\
+                        "BETWEEN 0 AND 730 OR" in tmp.get_qstring())
+        tmp.set_duration(12)
+        self.assertTrue("SUM(coll_during)*365.000000/" in tmp.get_qstring())
+        self.assertTrue("coll_days_from_build BETWEEN 0 AND 365 OR " +\
+                        "coll_days_from_build BETWEEN -365 AND -1" in tmp.get_qstring())
+        with self.assertRaises(ValueError):
+            tmp.set_radius(2600)
+        with self.assertRaises(ValueError):
+            tmp.set_limits(1500, 12)
+        with self.assertRaises(ValueError):
+            tmp.set_limits(2500.0, 24)
+        tmp.set_radius(1500)
+        tmp.set_limits(1500, 12)
+        self.assertEqual(tmp.get_qstring(), cq.CollidiumQuery().get_qstring())
+
 if __name__ == '__main__':
     unittest.main()
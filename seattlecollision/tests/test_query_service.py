@@ -0,0 +1,204 @@
+"""
+COLLIDIUM
+Query Service Test Module
+
+The test_query_service.py module uses the unittest package from Python to
+test the query_service module on a database built from the bundled sample
+data:
+ - test_parse_filters: tests query string parsing, including bad filters
+ - test_query_endpoint: tests that /query returns the results of
+   generate_table, and bad requests return errors
+ - test_coalescing: tests that identical concurrent queries are run once,
+   and repeated queries are answered from the cache
+ - test_request_size: tests that requests with too large headers or bodies
+   get 431 and 413 responses
+ - test_rebuilt_database: tests that the limits are read again when the
+   database is rebuilt with a wider window
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+import pandas as pd
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import table_builder
+import interactions_functionality as int_func
+import query_service
+from query_class import CollidiumQuery
+
+async def fetch(port, path, headers=''):
+    """Returns the status code and decoded JSON body of a GET request."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(('GET %s HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n%s\r\n' %
+                  (path, headers)).encode('latin-1'))
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+def serve_and_fetch(service, paths, headers=''):
+    """Starts service on a free port and fetches paths concurrently."""
+    async def run():
+        server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.gather(*[fetch(port, path, headers) for path in paths])
+        finally:
+            server.close()
+            await server.wait_closed()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+class TestQueryService(unittest.TestCase):
+    """
+    Using the unit test framework, the query service is tested on a
+    temporary database.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Builds a temporary Collidium database from the sample data."""
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date'])
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.database = os.path.join(cls.tmp_dir.name, 'Collidium')
+        table_builder.update_table(cls.database, collisions, buildings)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Closes the pooled connections and removes the database."""
+        int_func.close_connections(cls.database)
+        cls.tmp_dir.cleanup()
+
+    def test_parse_filters(self):
+        """
+        Tests that query strings set the CollidiumQuery filters, and that
+        unknown or invalid filters raise a ValueError.
+
+        Returns:
+            True (bool) if the filters and errors are as expected.
+        """
+        query = query_service.parse_filters(
+            'base_year=2015&radius=800&c_type=Vehicle+Only&b_category=COMMERCIAL'
+            '&b_category=INDUSTRIAL')
+        self.assertEqual(query.get_key(), CollidiumQuery(
+            b_category=['COMMERCIAL', 'INDUSTRIAL'], radius=800, base_year=2015,
+            c_type='Vehicle Only').get_key())
+        for query_string in ['radius=far', 'base_year=2020', 'radius=800&radius=900', 'x=1']:
+            with self.assertRaises(ValueError):
+                query_service.parse_filters(query_string)
+
+    def test_query_endpoint(self):
+        """
+        Tests that /query returns the generate_table results as columns with
+        their totals, and that bad requests return 400 and 404 responses.
+
+        Returns:
+            True (bool) if the responses are as expected.
+        """
+        service = query_service.QueryService(self.database)
+        try:
+            responses = serve_and_fetch(service, ['/query?base_year=2015&duration=6',
+                                                  '/query?base_year=2030', '/nothing'])
+        finally:
+            service.close()
+        query = CollidiumQuery(base_year=2015, duration=6, rollup=True)
+        results = int_func.generate_table(query.get_qstring(), self.database)
+        status, body = responses[0]
+        self.assertEqual((status, body['buildings']), (200, results.shape[0]))
+        pd.testing.assert_frame_equal(pd.DataFrame(body['columns']), results,
+                                      check_dtype=False)
+        self.assertEqual(body['totals']['before'], results['before'].sum())
+        self.assertEqual([response[0] for response in responses[1:]], [400, 404])
+        self.assertEqual(service.stats()['errors'], 1)
+
+    def test_coalescing(self):
+        """
+        Tests that identical queries sent at the same time run one database
+        query, and that a repeated query is answered from the cache.
+
+        Returns:
+            True (bool) if the query is run once.
+        """
+        service = query_service.QueryService(self.database)
+        run_query = service.run_query
+        calls = []
+        def slow_run_query(query):
+            calls.append(query.get_key())
+            time.sleep(0.2)
+            return run_query(query)
+        service.run_query = slow_run_query
+        try:
+            responses = serve_and_fetch(service, ['/query?radius=900'] * 5)
+            responses += serve_and_fetch(service, ['/query?radius=900'])
+        finally:
+            service.close()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(json.dumps(body) for _, body in responses)), 1)
+        stats = service.stats()
+        self.assertEqual((stats['requests'], stats['coalesced'], stats['cache']['hits']),
+                         (6, 4, 1))
+
+    def test_request_size(self):
+        """
+        Tests that requests whose headers are longer than MAX_HEADER_BYTES
+        get a 431 response, that requests with a body longer than
+        MAX_BODY_BYTES or an invalid Content-Length get 413 and 400
+        responses, and that a small body is accepted.
+
+        Returns:
+            True (bool) if the response codes are as expected.
+        """
+        service = query_service.QueryService(self.database)
+        filler = 'X-Filler: %s\r\n' % ('x'*query_service.MAX_HEADER_BYTES)
+        try:
+            statuses = [serve_and_fetch(service, ['/stats'], headers)[0][0] for headers in [
+                filler, 'Content-Length: %d\r\n' % (query_service.MAX_BODY_BYTES + 1),
+                'Content-Length: many\r\n']]
+            statuses += [serve_and_fetch(service, ['/stats'], 'Content-Length: 0\r\n')[0][0]]
+        finally:
+            service.close()
+        self.assertEqual(statuses, [431, 413, 400, 200])
+
+    def test_rebuilt_database(self):
+        """
+        Tests that the service answers queries with the limits of a database
+        that was rebuilt with a 24 month window after the service started.
+
+        Returns:
+            True (bool) if a 24 month query is refused before the rebuild and
+            answered after it.
+        """
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date'])
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        database = os.path.join(self.tmp_dir.name, 'Collidium_rebuilt')
+        table_builder.update_table(database, collisions, buildings)
+        service = query_service.QueryService(database)
+        try:
+            before = serve_and_fetch(service, ['/query?duration=24'])[0][0]
+            table_builder.update_table(database, collisions, buildings, window=24)
+            after = serve_and_fetch(service, ['/query?duration=24'])[0][0]
+        finally:
+            service.close()
+            int_func.close_connections(database)
+        self.assertEqual((before, after), (400, 200))
+        self.assertEqual(service.limits['max_duration'], 24)
+
+if __name__ == '__main__':
+    unittest.main()
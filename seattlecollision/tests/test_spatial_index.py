@@ -0,0 +1,83 @@
+"""
+COLLIDIUM
+Spatial Index Test Module
+
+This module is executed at each git push, as part of our continuous
+integration design with Travis.
+
+The test_spatial_index.py module uses the unittest package from Python to test
+the pair engines in the spatial_index module.
+
+ - test_grid_finds_all_pairs: every pair within the radius (by geopy distance)
+   is returned by the grid engine
+ - test_pairs_sorted: candidate pairs are ordered by building, then collision
+ - test_bad_engine: an unknown engine raises ValueError
+"""
+import sys
+import unittest
+import numpy as np
+import pandas as pd
+from geopy.distance import distance as gpdist
+sys.path.append('seattlecollision/build_data_libraries/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import spatial_index
+
+BUILDINGS = pd.read_csv("seattlecollision/data/buildings.csv", index_col=0).head(8)
+COLLISIONS = pd.read_csv("seattlecollision/data/Test_Data_For_Process_Data.csv", index_col=0)
+
+class TestSpatialIndex(unittest.TestCase):
+    """
+    Using the unit test framework, this class tests the grid and brute
+    pair engines from the spatial_index.py module.
+    """
+    def test_grid_finds_all_pairs(self):
+        """
+        This tests whether the grid engine returns every pair within the
+        radius, using geopy distances over all pairs as the reference.
+
+        Returns:
+            True (bool) if no pair within the radius is missing
+        """
+        b_idx, c_idx = spatial_index.candidate_pairs(
+            BUILDINGS["b_lat"].values, BUILDINGS["b_long"].values,
+            COLLISIONS["c_lat"].values, COLLISIONS["c_long"].values, 1500)
+        found = set(zip(b_idx.tolist(), c_idx.tolist()))
+        expected = set()
+        for i, (b_lat, b_long) in enumerate(zip(BUILDINGS["b_lat"], BUILDINGS["b_long"])):
+            for j, (c_lat, c_long) in enumerate(zip(COLLISIONS["c_lat"], COLLISIONS["c_long"])):
+                if gpdist((b_lat, b_long), (c_lat, c_long)).ft <= 1500:
+                    expected.add((i, j))
+        self.assertTrue(len(expected) > 0)
+        self.assertTrue(expected <= found)
+        self.assertTrue(len(found) < BUILDINGS.shape[0]*COLLISIONS.shape[0])
+
+    def test_pairs_sorted(self):
+        """
+        This tests whether candidate pairs are sorted by building position
+        and then by collision position.
+
+        Returns:
+            True (bool) if the pairs are sorted
+        """
+        b_idx, c_idx = spatial_index.grid_candidate_pairs(
+            BUILDINGS["b_lat"].values, BUILDINGS["b_long"].values,
+            COLLISIONS["c_lat"].values, COLLISIONS["c_long"].values, 1500)
+        self.assertTrue(np.all(np.diff(b_idx) >= 0))
+        same_building = np.diff(b_idx) == 0
+        self.assertTrue(np.all(np.diff(c_idx)[same_building] > 0))
+
+    def test_bad_engine(self):
+        """
+        This tests whether the correct ValueError exception is raised for an
+        unknown engine.
+
+        Returns:
+            True (bool) if the correct exception is raised.
+        """
+        self.assertRaises(ValueError, spatial_index.candidate_pairs,
+                          np.zeros(1), np.zeros(1), np.zeros(1), np.zeros(1), 1500,
+                          engine='not_an_engine')
+
+if __name__ == '__main__':
+    unittest.main()
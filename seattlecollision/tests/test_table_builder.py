@@ -3,14 +3,25 @@ This module is used to perform unit testing on the table_builder.py
 module. It is to be eventually added to a single file that will
 perform unit testing on all our modules.
 """
+import itertools
+import os
+import sqlite3
+import tempfile
 import unittest
 import sys
 from io import StringIO
+from unittest import mock
+import pandas as pd
 sys.path.append('seattlecollision/build_data_libraries/')
 sys.path.append('seattlecollision/data')
+sys.path.append('seattlecollision/')
 #pylint: disable=wrong-import-position
 #pylint: disable=import-error
 import table_builder
+import column_store
+import interactions_functionality as int_func
+from process_data import create_collidium_table
+from query_class import CollidiumQuery
 
 
 class TestTableBuilder(unittest.TestCase):
@@ -56,5 +67,358 @@ class TestTableBuilder(unittest.TestCase):
         output = out.getvalue().strip()
         self.assertEqual(output, 'Dataprocessing: sqlite database constructed. (Woohoo!)')
 
+    def test_column_store_input(self):
+        """
+        Testing if create_table builds the same table from a column store
+        folder as from a CSV file of the same collidium data.
+        :param: self
+        :return: pass if the tables match, fail otherwise
+        """
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date']).head(30)
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        pairs = create_collidium_table(collisions, buildings)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pairs.to_csv(os.path.join(tmp_dir, 'collidium_data.csv'))
+            column_store.write_frame(pairs, os.path.join(tmp_dir, 'collidium_data.columns'))
+            tables = []
+            for source in ['collidium_data.csv', 'collidium_data.columns']:
+                database = os.path.join(tmp_dir, source + '.db')
+                table_builder.create_table(database, os.path.join(tmp_dir, source))
+                conn = sqlite3.connect(database)
+                tables.append(pd.read_sql('SELECT * FROM collidium_data ORDER BY b_id, c_id',
+                                          conn))
+                conn.close()
+            pd.testing.assert_frame_equal(tables[0], tables[1])
+            self.assertEqual(tables[1].shape[0], pairs.shape[0])
+
+    def test_incremental_update(self):
+        """
+        Testing if an incremental update gives the same collidium_data
+        view, buildings, collisions and collidium_rollup tables as a full
+        build, after collisions are added, changed and removed and buildings
+        are changed and removed.
+        :param: self
+        :return: pass if the tables match, fail otherwise
+        """
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date']).head(30)
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        old_colls = collisions.iloc[100:]
+        new_colls = collisions.copy()
+        new_colls.loc[new_colls.index[-1], 'c_datetime'] += pd.Timedelta(days=1)
+        new_builds = buildings.iloc[1:].copy()
+        new_builds.loc[new_builds.index[0], 'b_final_date'] = pd.Timestamp('2017-01-01')
+
+        def read_table(database, table='collidium_data', keys=('b_id', 'c_id')):
+            conn = sqlite3.connect(database)
+            table = pd.read_sql('SELECT * FROM %s' % table, conn)
+            conn.close()
+            return table.sort_values(list(keys)).reset_index(drop=True)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            incremental = os.path.join(tmp_dir, 'incremental.db')
+            full = os.path.join(tmp_dir, 'full.db')
+            table_builder.update_table(incremental, old_colls, buildings)
+            conn = sqlite3.connect(incremental)
+            removed = conn.execute('SELECT MIN(c_id) FROM collidium_pairs WHERE c_id != ?',
+                                   (int(new_colls['c_id'].iloc[-1]),)).fetchone()[0]
+            conn.close()
+            new_colls = new_colls[new_colls['c_id'] != removed]
+            summary = table_builder.update_table(incremental, new_colls, new_builds)
+            self.assertEqual((summary['buildings'], summary['collisions']), (1, 101))
+            table_builder.update_table(full, new_colls, new_builds)
+            pd.testing.assert_frame_equal(read_table(incremental), read_table(full))
+            for table, keys in [('buildings', ['b_id']), ('collisions', ['c_id']),
+                                ('collidium_rollup', table_builder.ROLLUP_KEYS +
+                                 ['radius_bucket', 'duration_bucket'])]:
+                pd.testing.assert_frame_equal(read_table(incremental, table, keys),
+                                              read_table(full, table, keys))
+            summary = table_builder.update_table(incremental, new_colls, new_builds)
+            self.assertEqual(summary, {'buildings': 0, 'collisions': 0,
+                                       'deleted': 0, 'inserted': 0})
+
+    def test_rebuild_then_update(self):
+        """
+        Testing if a rebuild from a CSV file without the processed
+        dataframes drops the manifest of the earlier build, so that the next
+        update_table rebuilds from scratch rather than diffing against it.
+        :param: self
+        :return: pass if the updated table matches a full build, fail otherwise
+        """
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date']).head(30)
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, 'rebuilt.db')
+            full = os.path.join(tmp_dir, 'full.db')
+            csv = os.path.join(tmp_dir, 'collidium_data.csv')
+            table_builder.update_table(database, collisions, buildings)
+            create_collidium_table(collisions.iloc[100:], buildings.iloc[5:]).to_csv(csv)
+            table_builder.create_table(database, csv)
+            summary = table_builder.update_table(database, collisions, buildings)
+            self.assertEqual((summary['buildings'], summary['collisions']),
+                             (buildings.shape[0], collisions.shape[0]))
+            table_builder.update_table(full, collisions, buildings)
+            tables = []
+            for path in [database, full]:
+                conn = sqlite3.connect(path)
+                tables.append(pd.read_sql('SELECT * FROM collidium_data ORDER BY b_id, c_id',
+                                          conn))
+                conn.close()
+            pd.testing.assert_frame_equal(tables[0], tables[1])
+
+    def test_query_plan(self):
+        """
+        Testing if the CollidiumQuery queries are answered from the covering
+        index of the buildings table and the primary key of the pair table
+        (without reading the collisions table, even for collision filters),
+        without a table scan or a temporary b-tree for GROUP BY.
+        :param: self
+        :return: pass if every query plan searches the indexes, fail otherwise
+        """
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date']).head(30)
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        queries = [CollidiumQuery(), CollidiumQuery(b_category='COMMERCIAL', radius=500,
+                                                     base_year=2015, duration=3,
+                                                     c_severity='Injury', c_type='Vehicle Only')]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, 'plan.db')
+            table_builder.update_table(database, collisions, buildings)
+            conn = sqlite3.connect(database)
+            for query in queries:
+                plan = [row[-1] for row in conn.execute(
+                    'EXPLAIN QUERY PLAN ' + query.get_qstring())]
+                self.assertTrue(all(step.startswith('SEARCH') for step in plan), plan)
+                self.assertIn('COVERING INDEX buildings_query_idx', plan[0])
+                self.assertIn('collidium_pairs USING PRIMARY KEY', plan[1])
+                self.assertEqual(len(plan), 2)
+            conn.close()
+
+    def test_rollup_query(self):
+        """
+        Testing if CollidiumQuery queries routed to the collidium_rollup
+        table return the same results as the collidium_data queries, and
+        if the parameterized statements return the same results as the
+        query strings.
+        :param: self
+        :return: pass if every pair of results matches, fail otherwise
+        """
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date'])
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        filters = itertools.product(['All', ['COMMERCIAL', 'MULTIFAMILY']], [1500, 900],
+                                    [2014, 2015, 2016, 2017], [12, 5, 1],
+                                    ['All', 'Property Damage Only'], ['All', 'Vehicle Only'])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, 'rollup.db')
+            table_builder.update_table(database, collisions, buildings)
+            conn = sqlite3.connect(database)
+            statements = set()
+            for args in filters:
+                query = CollidiumQuery(*args)
+                expected = pd.read_sql(query.get_qstring(), conn)
+                statement, params = query.get_statement()
+                pd.testing.assert_frame_equal(pd.read_sql(statement, conn, params=params),
+                                              expected)
+                query.set_rollup(True)
+                self.assertIn('collidium_rollup', query.get_qstring())
+                result = pd.read_sql(query.get_qstring(), conn)
+                pd.testing.assert_frame_equal(result, expected, check_exact=False)
+                rollup_statement, params = query.get_statement()
+                pd.testing.assert_frame_equal(pd.read_sql(rollup_statement, conn, params=params),
+                                              result)
+                statements.update([statement, rollup_statement])
+                plan = [row[-1] for row in conn.execute(
+                    'EXPLAIN QUERY PLAN ' + query.get_qstring())]
+                self.assertIn('COVERING INDEX collidium_rollup_idx', plan[0])
+            conn.close()
+            # 192 filter combinations share 8 star schema statements (2 x 2 x 2
+            # list filter shapes) and 8 collidium_rollup statements
+            self.assertEqual(len(statements), 16)
+
+    def test_build_limits(self):
+        """
+        Testing if a database built with a wider radius and window stores
+        its limits, answers queries up to them (from the rollup table too),
+        keeps them on incremental updates, and is rebuilt when it is updated
+        with other limits. The limits are only read from the database again
+        once its file has changed. Query strings and statements return the same
+        rows, also for queries whose limits are not the database's.
+        :param: self
+        :return: pass if the limits and results match, fail otherwise
+        """
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date'])
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            wide = os.path.join(tmp_dir, 'wide.db')
+            default = os.path.join(tmp_dir, 'default.db')
+            table_builder.update_table(wide, collisions, buildings, radius=2500, window=24)
+            table_builder.update_table(default, collisions, buildings)
+            limits = int_func.build_limits(wide)
+            self.assertEqual(limits, {'max_radius': 2500, 'max_duration': 24})
+            with mock.patch.object(int_func, 'generate_connection') as connection:
+                self.assertEqual(int_func.build_limits(wide), limits)
+                self.assertTrue(int_func.has_rollup(wide))
+                connection.assert_not_called()
+            self.assertEqual(int_func.build_limits(default),
+                             {'max_radius': 1500, 'max_duration': 12})
+            for radius, duration in itertools.product([2500, 1500, 900], [24, 12, 5]):
+                query = CollidiumQuery(radius=radius, duration=duration, **limits)
+                expected = int_func.generate_table(query.get_qstring(), wide)
+                query.set_rollup(True)
+                pd.testing.assert_frame_equal(int_func.generate_table(query.get_qstring(), wide),
+                                              expected, check_exact=False)
+                if radius <= 1500 and duration <= 12:
+                    query = CollidiumQuery(radius=radius, duration=duration)
+                    pd.testing.assert_frame_equal(
+                        int_func.generate_table(query.get_qstring(), default), expected)
+                    for rollup in [False, True]:
+                        query = CollidiumQuery(radius=radius, duration=duration, rollup=rollup)
+                        for database in [wide, default]:
+                            result = int_func.generate_table(query.get_qstring(), database)
+                            statement, params = query.get_statement()
+                            pd.testing.assert_frame_equal(result, int_func.generate_table(
+                                statement, database, params))
+                            pd.testing.assert_frame_equal(result, expected, check_exact=False)
+            summary = table_builder.update_table(wide, collisions, buildings)
+            self.assertEqual(summary['inserted'], 0)
+            summary = table_builder.update_table(wide, collisions, buildings, window=12)
+            self.assertEqual(summary['buildings'], buildings.shape[0])
+            self.assertEqual(int_func.build_limits(wide), {'max_radius': 2500,
+                                                           'max_duration': 12})
+            int_func.close_connections()
+
+    def test_exposure(self):
+        """
+        Testing if the during counts of CollidiumQuery queries (from the
+        star schema and collidium_rollup tables) are the during pairs of
+        each building normalized to the duration's window in days over the
+        building period's length in days.
+        :param: self
+        :return: pass if the during counts match, fail otherwise
+        """
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date'])
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        pairs = create_collidium_table(collisions, buildings)
+        pairs['build_days'] = (pairs['b_end_dt'] - pairs['b_start_dt']).dt.days.clip(lower=1)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, 'exposure.db')
+            table_builder.update_table(database, collisions, buildings)
+            conn = sqlite3.connect(database)
+            for duration in [12, 5]:
+                query = CollidiumQuery(base_year=2016, duration=duration)
+                days = query.window_days()
+                counted = pairs[(pairs['base_year'] == 2016) & (pairs['radius'] < 1500) &
+                                (pairs['coll_days_from_build'].abs() <= days)]
+                expected = (counted.groupby('b_id')['coll_during'].sum()*days /
+                            counted.groupby('b_id')['build_days'].first())
+                for rollup in [False, True]:
+                    query.set_rollup(rollup)
+                    result = pd.read_sql(query.get_qstring(), conn).set_index('b_id')['during']
+                    pd.testing.assert_series_equal(result, expected, check_names=False)
+            conn.close()
+
+    def test_star_schema(self):
+        """
+        Testing if each building and collision is stored once, with the pairs
+        holding only their own columns, and if a database with a flat
+        collidium_data table is rebuilt as the star schema by update_table.
+        :param: self
+        :return: pass if the tables and view match, fail otherwise
+        """
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date']).head(30)
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, 'star.db')
+            table_builder.update_table(database, collisions, buildings)
+            conn = sqlite3.connect(database)
+            flat = pd.read_sql('SELECT * FROM collidium_data ORDER BY b_id, c_id', conn)
+            self.assertEqual(list(flat.columns),
+                             [column for column, _ in table_builder.COLLIDIUM_SCHEMA])
+            for table, key in [('buildings', 'b_id'), ('collisions', 'c_id')]:
+                self.assertEqual(conn.execute('SELECT COUNT(*) FROM %s' % table).fetchone()[0],
+                                 flat[key].nunique())
+            self.assertEqual([row[1] for row in conn.execute(
+                'PRAGMA table_info(collidium_pairs)')],
+                             [column for column, _ in table_builder.PAIRS_SCHEMA])
+            # Replace the star schema with a flat table, as in earlier databases
+            with conn:
+                conn.execute('CREATE TABLE flat AS SELECT * FROM collidium_data')
+                for name in ['collidium_data', 'collidium_pairs', 'buildings', 'collisions']:
+                    conn.execute('DROP %s %s' % ('VIEW' if name == 'collidium_data' else 'TABLE',
+                                                 name))
+                conn.execute('ALTER TABLE flat RENAME TO collidium_data')
+            conn.close()
+            summary = table_builder.update_table(database, collisions, buildings)
+            self.assertEqual(summary['buildings'], buildings.shape[0])
+            conn = sqlite3.connect(database)
+            pd.testing.assert_frame_equal(
+                pd.read_sql('SELECT * FROM collidium_data ORDER BY b_id, c_id', conn), flat)
+            conn.close()
+
+    def test_category_codes(self):
+        """
+        Testing if the categorical columns are stored as integer codes, with
+        the CATEGORY_LABELS codes and the next codes for other labels (kept
+        by incremental updates), decoded by the collidium_data view, and
+        filtered on by CollidiumQuery queries.
+        :param: self
+        :return: pass if the codes, labels and results match, fail otherwise
+        """
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date']).head(30)
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        buildings.iloc[0, buildings.columns.get_loc('b_category')] = 'OTHER'
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, 'codes.db')
+            table_builder.update_table(database, collisions, buildings)
+            changed = buildings.copy()
+            changed.iloc[1, changed.columns.get_loc('b_category')] = 'ANOTHER'
+            table_builder.update_table(database, collisions, changed)
+            conn = sqlite3.connect(database)
+            codes = conn.execute("SELECT label, code FROM category_codes "
+                                 "WHERE name = 'b_category' ORDER BY code").fetchall()
+            self.assertEqual(codes, [(label, code) for code, label in enumerate(
+                table_builder.CATEGORY_LABELS['b_category'] + ['OTHER', 'ANOTHER'], 1)])
+            self.assertEqual(conn.execute('SELECT DISTINCT typeof(b_category) FROM buildings '
+                                          'UNION SELECT DISTINCT typeof(c_type) '
+                                          'FROM collidium_pairs').fetchall(), [('integer',)])
+            flat = pd.read_sql('SELECT b_id, b_category, c_type FROM collidium_data', conn)
+            labels = flat.groupby('b_id')['b_category'].first()
+            self.assertEqual(labels[changed['b_id'].iloc[0]], 'OTHER')
+            self.assertEqual(labels[changed['b_id'].iloc[1]], 'ANOTHER')
+            query = CollidiumQuery(b_category=['COMMERCIAL', 'MULTIFAMILY'],
+                                   c_type='Vehicle Only', base_year=2016)
+            result = pd.read_sql(query.get_qstring(), conn)
+            counted = pd.read_sql("SELECT b_id FROM collidium_data WHERE base_year = 2016 "
+                                  "AND b_category IN ('COMMERCIAL', 'MULTIFAMILY') "
+                                  "AND c_type = 'Vehicle Only'", conn)
+            self.assertEqual(sorted(result['b_id']), sorted(counted['b_id'].unique()))
+            self.assertTrue(result.shape[0] > 0)
+            conn.close()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,170 @@
+"""
+COLLIDIUM
+Tile Export Test Module
+
+The test_tile_export.py module uses the unittest package from Python to test
+the tile_export module on a database built from the bundled sample data:
+ - test_bad_zoom: tests that invalid zoom levels raise a ValueError
+ - test_notebook_filters: tests that the notebook's filter combinations
+   are distinct
+ - test_export_tiles: tests that the tiles of every zoom level hold every
+   building and collision count of the query results, and that
+   index.json describes them
+ - test_database_limits: tests that queries are run with the limits of a
+   database built with a wider window
+ - test_stale_tiles: tests that a new export replaces the tiles of an
+   earlier export of the same filter combination
+"""
+import glob
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import pandas as pd
+sys.path.append('seattlecollision/build_data_libraries/')
+sys.path.append('seattlecollision/')
+#pylint: disable=wrong-import-position
+#pylint: disable=import-error
+import table_builder
+import interactions_functionality as int_func
+import tile_export
+from query_class import CollidiumQuery
+
+class TestTileExport(unittest.TestCase):
+    """
+    Using the unit test framework, the tile_export functions are tested on a
+    temporary database.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Builds a temporary Collidium database from the sample data."""
+        buildings = pd.read_csv('seattlecollision/data/buildings.csv', index_col=0,
+                                parse_dates=['b_issue_date', 'b_final_date'])
+        collisions = pd.read_csv('seattlecollision/data/Test_Data_For_Process_Data.csv',
+                                 index_col=0, parse_dates=['c_datetime'],
+                                 dtype={'c_severity_code': str})
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.database = os.path.join(cls.tmp_dir.name, 'Collidium')
+        table_builder.update_table(cls.database, collisions, buildings)
+        cls.wide = os.path.join(cls.tmp_dir.name, 'Collidium_wide')
+        table_builder.update_table(cls.wide, collisions, buildings, window=24)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Closes the pooled connections and removes the database."""
+        int_func.close_connections(cls.database)
+        int_func.close_connections(cls.wide)
+        cls.tmp_dir.cleanup()
+
+    def test_bad_zoom(self):
+        """
+        Tests that a ValueError is raised when min_zoom is above max_zoom.
+
+        Returns:
+            True (bool) if ValueError is raised.
+        """
+        with self.assertRaises(ValueError):
+            tile_export.export_tiles(self.database, self.tmp_dir.name, [], 12, 10)
+
+    def test_notebook_filters(self):
+        """
+        Tests that the notebook filter combinations have distinct keys and
+        include the default query.
+
+        Returns:
+            True (bool) if the keys are distinct.
+        """
+        keys = [query.get_key() for query in tile_export.notebook_filters()]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertIn(CollidiumQuery().get_key(), keys)
+
+    def test_export_tiles(self):
+        """
+        Tests that at each zoom level the exported tiles hold every building
+        and the total collision counts of the query results, and that the
+        highest zoom level has one point per building.
+
+        Returns:
+            True (bool) if the tile totals match the query results.
+        """
+        query = CollidiumQuery(base_year=2015)
+        results = int_func.generate_table(query.get_qstring(), self.database)
+        with tempfile.TemporaryDirectory() as out_dir:
+            summary = tile_export.export_tiles(self.database, out_dir, [query], 11, 14)
+            with open(os.path.join(out_dir, 'index.json')) as index_file:
+                index = json.load(index_file)
+            self.assertEqual((index['min_zoom'], index['max_zoom']), (11, 14))
+            self.assertEqual(index['filters'][0]['id'], tile_export.filter_id(query))
+            tiles = 0
+            for zoom in range(11, 15):
+                paths = glob.glob(os.path.join(out_dir, index['filters'][0]['id'], str(zoom),
+                                               '*', '*.geojson.gz'))
+                tiles += len(paths)
+                features = []
+                for path in paths:
+                    with gzip.open(path, 'rt') as tile:
+                        features += json.load(tile)['features']
+                totals = pd.DataFrame([feature['properties'] for feature in features])
+                self.assertEqual(totals['buildings'].sum(), results.shape[0])
+                for period in ['before', 'during', 'after']:
+                    self.assertAlmostEqual(totals[period].sum(), results[period].sum())
+                if zoom < 14:
+                    self.assertLessEqual(totals.shape[0], results.shape[0])
+                else:
+                    self.assertEqual(sorted(totals['b_id']), sorted(results['b_id']))
+            self.assertEqual(summary, {'filters': 1, 'tiles': tiles})
+
+    def test_database_limits(self):
+        """
+        Tests that on a database built with a 24 month window, 12 month
+        queries (on the raw table, with a radius the rollup table cannot
+        answer) keep their duration filter, and that the notebook filters
+        have the database's limits.
+
+        Returns:
+            True (bool) if the tile totals match the 12 month results.
+        """
+        limits = int_func.build_limits(self.wide)
+        self.assertEqual(limits['max_duration'], 24)
+        self.assertTrue(all(query.max_duration == 24
+                            for query in tile_export.notebook_filters(limits)))
+        query = CollidiumQuery(radius=1450, **limits)
+        results = int_func.generate_table(query.get_qstring(), self.wide)
+        with tempfile.TemporaryDirectory() as out_dir:
+            tile_export.export_tiles(self.wide, out_dir, [CollidiumQuery(radius=1450)], 14, 14)
+            features = []
+            for path in glob.glob(os.path.join(out_dir, '*', '14', '*', '*.geojson.gz')):
+                with gzip.open(path, 'rt') as tile:
+                    features += json.load(tile)['features']
+        totals = pd.DataFrame([feature['properties'] for feature in features])
+        for period in ['before', 'during', 'after']:
+            self.assertAlmostEqual(totals[period].sum(), results[period].sum())
+
+    def test_stale_tiles(self):
+        """
+        Tests that exporting a filter combination again removes the tiles of
+        the earlier export that the new results do not have, and leaves no
+        temporary folder in out_dir.
+
+        Returns:
+            True (bool) if only the new tiles are left.
+        """
+        query = CollidiumQuery(base_year=2015)
+        with tempfile.TemporaryDirectory() as out_dir:
+            tile_export.export_tiles(self.database, out_dir, [query], 12, 12)
+            filter_dir = os.path.join(out_dir, tile_export.filter_id(query))
+            tiles = sorted(glob.glob(os.path.join(filter_dir, '12', '*', '*.geojson.gz')))
+            stale = os.path.join(filter_dir, '12', '0', '0.geojson.gz')
+            os.makedirs(os.path.dirname(stale))
+            shutil.copy(tiles[0], stale)
+            tile_export.export_tiles(self.database, out_dir, [query], 12, 12)
+            self.assertEqual(sorted(glob.glob(os.path.join(filter_dir, '*', '*', '*'))), tiles)
+            self.assertEqual(sorted(os.listdir(out_dir)),
+                             sorted([tile_export.filter_id(query), 'index.json']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,253 @@
+"""
+COLLIDIUM
+Static Tile Export Module
+
+The tile_export module precomputes the before/during/after building marker
+layers of the Collidium maps into static map tiles, so that a lightweight
+web page (or any static file server) can show the maps to many viewers
+with no python in the request path.
+
+For each filter combination (a CollidiumQuery), the query results are
+written as gzip compressed GeoJSON tiles in the usual z/x/y web map
+layout:
+
+    out_dir/<filter id>/<z>/<x>/<y>.geojson.gz
+
+Each tile is a FeatureCollection of points whose properties are the
+before, during and after collision counts and the number of buildings, so
+a page can style any of the three periods from the same tiles. At the
+highest zoom level every building is its own point (with its b_id); at
+lower zoom levels, buildings are binned into a grid of TILE_GRID x
+TILE_GRID cells per tile, with counts summed over each cell, which bounds
+the size of every tile. An index.json file in out_dir lists the filter ids
+and their filter values, the zoom levels and the tile path template.
+
+Each filter's tiles are written to a temporary folder in out_dir that then
+replaces the filter's folder, so tiles of an earlier export that the new
+results no longer cover (e.g. after a rebuild of the database) are removed.
+
+Functions:
+    notebook_filters: returns the filter combinations of the Collidium
+        notebook's interact widgets.
+
+    export_tiles: exports the tiles of a list of filter combinations.
+
+Exceptions (ValueError) are raised if the database path is not valid or the
+zoom levels are invalid.
+
+Usage (from the seattlecollision folder, like the notebook):
+    python tile_export.py [database [out_dir [min_zoom max_zoom]]]
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+#pylint: disable=import-error
+import interactions_functionality as int_func
+from query_class import CollidiumQuery
+
+# Tile size in pixels, and number of binning cells along each side of a tile
+TILE_SIZE = 256
+TILE_GRID = 32
+# Default zoom levels exported
+MIN_ZOOM = 10
+MAX_ZOOM = 15
+
+def notebook_filters(limits=None):
+    """
+    Returns the filter combinations shown by the Collidium notebook's
+    *_interact widgets: each widget's values, with the other filters left at
+    their CollidiumQuery defaults.
+
+    Args:
+        limits: (optional) dict of the max_radius and max_duration
+            CollidiumQuery arguments of the database (see build_limits in
+            the interactions_functionality module), by default the
+            CollidiumQuery defaults
+
+    Returns:
+        list of CollidiumQuery objects with distinct keys
+    """
+    limits = {} if limits is None else limits
+    queries = [CollidiumQuery(b_category=category, **limits)
+               for category in int_func.BUILDING_CATEGORIES]
+    queries += [CollidiumQuery(base_year=year, duration=duration, **limits)
+                for year in int_func.BUILDING_YEARS for duration in range(12, 5, -1)]
+    queries += [CollidiumQuery(c_severity=severity, **limits)
+                for severity in int_func.COLLISION_SEVERITY]
+    queries += [CollidiumQuery(c_type=c_type, **limits) for c_type in int_func.COLLISION_TYPE]
+    queries += [CollidiumQuery(radius=radius, **limits) for radius in range(1500, 700, -100)]
+    distinct = {}
+    for query in queries:
+        distinct.setdefault(query.get_key(), query)
+    return list(distinct.values())
+
+def filter_id(query):
+    """
+    Returns a short, stable directory name for a CollidiumQuery's filters.
+    """
+    return hashlib.sha1(repr(query.get_key()).encode('utf-8')).hexdigest()[:12]
+
+def pixel_coords(lat, long, zoom):
+    """
+    Returns the global web mercator pixel coordinates of points at a zoom level.
+
+    Args:
+        lat, long: numpy arrays of latitudes and longitudes in degrees
+        zoom: (int) zoom level
+
+    Returns:
+        Tuple of (x, y) numpy arrays of pixel coordinates
+    """
+    scale = TILE_SIZE*2**zoom
+    lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x_px = (np.asarray(long) + 180.0)/360.0*scale
+    y_px = (1.0 - np.log(np.tan(lat) + 1.0/np.cos(lat))/np.pi)/2.0*scale
+    return x_px, y_px
+
+def zoom_features(results, zoom, binned):
+    """
+    Returns the features of one zoom level, with the tile of each feature.
+
+    Args:
+        results: query results dataframe (b_id, b_lat, b_long, before,
+            during, after)
+        zoom: (int) zoom level
+        binned: (bool) if True, buildings are binned into TILE_GRID cells
+            per tile side
+
+    Returns:
+        dataframe with columns tile_x, tile_y, b_lat, b_long, before, during,
+        after, buildings (and b_id if not binned)
+    """
+    x_px, y_px = pixel_coords(results['b_lat'].values, results['b_long'].values, zoom)
+    features = results.copy()
+    features['buildings'] = 1
+    if binned:
+        cell = TILE_SIZE/TILE_GRID
+        features['cell_x'] = np.floor(x_px/cell).astype(np.int64)
+        features['cell_y'] = np.floor(y_px/cell).astype(np.int64)
+        grid = features.groupby(['cell_x', 'cell_y'], sort=True)
+        features = grid[['b_lat', 'b_long']].mean()
+        features[['before', 'during', 'after', 'buildings']] = grid[
+            ['before', 'during', 'after', 'buildings']].sum()
+        features = features.reset_index()
+        features['tile_x'] = features['cell_x']//TILE_GRID
+        features['tile_y'] = features['cell_y']//TILE_GRID
+        return features.drop(columns=['cell_x', 'cell_y'])
+    features['tile_x'] = np.floor(x_px/TILE_SIZE).astype(np.int64)
+    features['tile_y'] = np.floor(y_px/TILE_SIZE).astype(np.int64)
+    return features
+
+def tile_geojson(features):
+    """
+    Returns the GeoJSON FeatureCollection text of a tile's features.
+    """
+    properties = [column for column in ['b_id', 'before', 'during', 'after', 'buildings']
+                  if column in features]
+    records = features[properties].astype(object).values.tolist()
+    coords = features[['b_long', 'b_lat']].values.tolist()
+    return json.dumps({'type': 'FeatureCollection',
+                       'features': [{'type': 'Feature',
+                                     'geometry': {'type': 'Point', 'coordinates': coord},
+                                     'properties': dict(zip(properties, record))}
+                                    for coord, record in zip(coords, records)]},
+                      separators=(',', ':'))
+
+def _write_filter_tiles(results, filter_dir, min_zoom, max_zoom):
+    """
+    Writes the tiles of one filter combination's query results to a
+    temporary folder next to filter_dir, which then replaces filter_dir.
+
+    Returns:
+        int number of tile files written
+    """
+    tmp_dir = tempfile.mkdtemp(prefix='.%s.' % os.path.basename(filter_dir),
+                               dir=os.path.dirname(filter_dir))
+    n_tiles = 0
+    try:
+        for zoom in range(min_zoom, max_zoom + 1):
+            features = zoom_features(results, zoom, binned=zoom < max_zoom)
+            for (tile_x, tile_y), tile in features.groupby(['tile_x', 'tile_y']):
+                tile_dir = os.path.join(tmp_dir, str(zoom), str(tile_x))
+                os.makedirs(tile_dir, exist_ok=True)
+                with gzip.open(os.path.join(tile_dir, '%d.geojson.gz' % tile_y), 'wt') as out:
+                    out.write(tile_geojson(tile))
+                n_tiles += 1
+        os.chmod(tmp_dir, 0o755)
+        if os.path.isdir(filter_dir):
+            shutil.rmtree(filter_dir)
+        os.rename(tmp_dir, filter_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return n_tiles
+
+def export_tiles(data_directory, out_dir, queries=None, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """
+    Exports the marker tiles of each filter combination, and an index.json
+    file describing them.
+
+    Args:
+        data_directory: (str) path to the Collidium database
+        out_dir: (str) folder the tiles are written to
+        queries: (optional) list of CollidiumQuery objects, by default
+            notebook_filters(). Their limits are set to the database's (see
+            build_limits in the interactions_functionality module).
+        min_zoom, max_zoom: (int) zoom levels exported. Buildings are binned
+            into grid cells below max_zoom.
+
+    The folder of each filter combination is replaced, so it holds no tiles
+    of earlier exports.
+
+    Returns:
+        dict of the number of filter combinations and tile files written
+
+    Raises:
+        ValueError: If data_directory is not a valid path, the zoom levels
+            are not integers with 0 <= min_zoom <= max_zoom, or a query's
+            radius or duration is above the database's limits.
+    """
+    if not (isinstance(min_zoom, int) and isinstance(max_zoom, int)
+            and 0 <= min_zoom <= max_zoom):
+        raise ValueError("Tile Export: zoom levels should be integers with "
+                         "0 <= min_zoom <= max_zoom.")
+    limits = int_func.build_limits(data_directory)
+    if queries is None:
+        queries = notebook_filters(limits)
+    rollup = int_func.has_rollup(data_directory)
+    os.makedirs(out_dir, exist_ok=True)
+    index = {'tiles': '{filter}/{z}/{x}/{y}.geojson.gz', 'min_zoom': min_zoom,
+             'max_zoom': max_zoom, 'periods': ['before', 'during', 'after'], 'filters': []}
+    n_tiles = 0
+    for query in queries:
+        query.set_rollup(rollup)
+        query.set_limits(**limits)
+        statement, params = query.get_statement()
+        results = int_func.generate_table(statement, data_directory, params)
+        if results.empty:
+            results = pd.DataFrame(columns=['b_id', 'b_lat', 'b_long', 'before', 'during',
+                                            'after'])
+        key = filter_id(query)
+        index['filters'].append({'id': key, 'b_category': query.b_category,
+                                 'radius': query.radius, 'base_year': query.base_year,
+                                 'duration': query.duration, 'c_severity': query.c_severity,
+                                 'c_type': query.c_type, 'buildings': int(results.shape[0])})
+        n_tiles += _write_filter_tiles(results, os.path.join(out_dir, key), min_zoom, max_zoom)
+    with open(os.path.join(out_dir, 'index.json'), 'w') as out:
+        json.dump(index, out, indent=1)
+    print('Tile Export: %d tiles written for %d filter combinations. (Woohoo!)' %
+          (n_tiles, len(queries)))
+    return {'filters': len(queries), 'tiles': n_tiles}
+
+if __name__ == '__main__':
+    ARGS = sys.argv[1:]
+    export_tiles(ARGS[0] if ARGS else 'data/Collidium',
+                 ARGS[1] if len(ARGS) > 1 else 'data/tiles',
+                 min_zoom=int(ARGS[2]) if len(ARGS) > 2 else MIN_ZOOM,
+                 max_zoom=int(ARGS[3]) if len(ARGS) > 3 else MAX_ZOOM)